@@ -0,0 +1,107 @@
+"""
+Measure the CPU time of deriving the task gauges from a synthetic account.
+
+Run with `python -m benchmarks.aggregation_cpu [--tasks N ...]`. Reports the
+time to build the task store from raw items, and compares the single pass
+aggregation engine with the previous approach of walking the tasks once per
+project loop, label count and section count.
+"""
+
+import argparse
+import time
+from collections.abc import Callable
+
+from benchmarks.task_store_memory import synthetic_tasks
+from prometheus_todoist_exporter.aggregate import aggregate_tasks
+from prometheus_todoist_exporter.store import TaskRecord, TaskStore
+
+TODAY = "2025-06-15"
+REPEATS = 3
+
+
+def project_pass(tasks: TaskStore, today: str) -> None:
+    """The per-project loop formerly at the end of collect_metrics()."""
+    projects: dict[str, list[TaskRecord]] = {}
+    for task in tasks:
+        projects.setdefault(task.project_id, []).append(task)
+    for project_tasks in projects.values():
+        priority_counts = {1: 0, 2: 0, 3: 0, 4: 0}
+        with_due_date = recurring = overdue = due_today = 0
+        for task in project_tasks:
+            priority_counts[task.priority] = priority_counts.get(task.priority, 0) + 1
+            if task.due_date:
+                with_due_date += 1
+                if task.is_recurring:
+                    recurring += 1
+                if task.due_date < today:
+                    overdue += 1
+                if task.due_date == today:
+                    due_today += 1
+
+
+def label_pass(tasks: TaskStore) -> None:
+    """The walk formerly done by collect_label_metrics()."""
+    label_counts: dict[str, int] = {}
+    for task in tasks:
+        for label in task.labels:
+            if label not in label_counts:
+                label_counts[label] = 0
+            label_counts[label] += 1
+
+
+def section_pass(tasks: TaskStore) -> None:
+    """The walk formerly done by collect_section_tasks()."""
+    section_counts: dict[str, int] = {}
+    for task in tasks:
+        if task.section_id:
+            if task.section_id not in section_counts:
+                section_counts[task.section_id] = 0
+            section_counts[task.section_id] += 1
+
+
+def separate_passes(tasks: TaskStore, today: str) -> None:
+    """The three task walks the aggregation engine replaced."""
+    project_pass(tasks, today)
+    label_pass(tasks)
+    section_pass(tasks)
+
+
+def cpu_seconds(
+    aggregate: Callable[[TaskStore, str], object], tasks: TaskStore
+) -> float:
+    """Best CPU time of a few aggregation runs."""
+    timings = []
+    for _ in range(REPEATS):
+        start = time.process_time()
+        aggregate(tasks, TODAY)
+        timings.append(time.process_time() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--tasks", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    args = parser.parse_args()
+
+    print(f"{'tasks':>9} {'build':>10} {'separate':>10} {'single':>10} {'speedup':>8}")
+    for count in args.tasks:
+        items = list(synthetic_tasks(count))
+        start = time.process_time()
+        tasks = TaskStore()
+        for item in items:
+            tasks.add_item(item)
+        build = time.process_time() - start
+        del items
+
+        separate = cpu_seconds(separate_passes, tasks)
+        single = cpu_seconds(aggregate_tasks, tasks)
+        print(
+            f"{count:>9} {build * 1000:>8.1f}ms {separate * 1000:>8.1f}ms"
+            f" {single * 1000:>8.1f}ms {separate / single:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
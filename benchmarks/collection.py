@@ -0,0 +1,182 @@
+"""
+End-to-end benchmark of collect_metrics() against a local Todoist stand-in.
+
+Run with `python -m benchmarks.collection [options]`. Every collection cycle
+reports wall time, API calls, bytes transferred and peak RSS, followed by the
+time to build the /metrics payload. Later cycles show the effect of the
+response cache and, with --incremental, of the Sync API path. --async runs
+the cycle with the asyncio engine.
+"""
+
+import argparse
+import asyncio
+import resource
+import sys
+import time
+from http import HTTPStatus
+
+from benchmarks.stand_in import (
+    TODOIST_BASE_URL,
+    StandInAdapter,
+    StandInConfig,
+    TodoistStandIn,
+)
+from prometheus_todoist_exporter.accounts import Account
+from prometheus_todoist_exporter.exporter import (
+    collect_metrics,
+    collect_metrics_async,
+    instrument_account,
+)
+from prometheus_todoist_exporter.families import EXPOSITION
+from prometheus_todoist_exporter.stages import stage_settings_from_env
+
+RENDER_REPEATS = 5
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process."""
+    # Kilobytes on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def benchmark_account(stand_in: TodoistStandIn, args: argparse.Namespace) -> Account:
+    """Create an account whose requests are all sent to the stand-in."""
+    account = Account(
+        name="benchmark",
+        token="benchmark",  # noqa: S106
+        incremental_sync=args.incremental,
+        rate_limit_requests=args.budget,
+        rate_limit_window=args.budget_window,
+        stages=stage_settings_from_env(args.disabled_stages, args.stage_intervals),
+    )
+    account.session.mount(
+        TODOIST_BASE_URL,
+        StandInAdapter(
+            stand_in.base_url,
+            cache=account.cache,
+            pool_maxsize=account.http_pool_size,
+        ),
+    )
+    instrument_account(account)
+    return account
+
+
+def scrape_seconds(compress: bool = False) -> tuple[float, int]:
+    """Best time to build the /metrics payload and the size of the payload."""
+    timings = []
+    for _ in range(RENDER_REPEATS):
+        start = time.perf_counter()
+        payload = EXPOSITION.render(compress=compress)
+        timings.append(time.perf_counter() - start)
+    return min(timings), len(payload.body)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=10_000)
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--completed-tasks", type=int, default=1_000)
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument(
+        "--incremental", action="store_true", help="collect through the Sync API"
+    )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="collect with the asyncio engine",
+    )
+    parser.add_argument(
+        "--disabled-stages", default="", help="comma separated stages to skip"
+    )
+    parser.add_argument(
+        "--stage-intervals",
+        default="",
+        help="comma separated stage=seconds refresh intervals",
+    )
+    parser.add_argument(
+        "--latency-ms", type=float, default=0, help="added to every API response"
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=int,
+        default=0,
+        help="requests the stand-in accepts per window before answering 429",
+    )
+    parser.add_argument("--rate-limit-window", type=float, default=60)
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0,
+        help="share of requests the stand-in answers with 503",
+    )
+    parser.add_argument(
+        "--budget",
+        type=int,
+        default=1_000_000,
+        help="client side request budget per window of the exporter",
+    )
+    parser.add_argument("--budget-window", type=int, default=900)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    config = StandInConfig(
+        tasks=args.tasks,
+        projects=args.projects,
+        completed_tasks=args.completed_tasks,
+        latency=args.latency_ms / 1000,
+        rate_limit_requests=args.rate_limit,
+        rate_limit_window=args.rate_limit_window,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+
+    with TodoistStandIn(config) as stand_in:
+        account = benchmark_account(stand_in, args)
+        print(
+            f"{'cycle':>5} {'wall':>9} {'calls':>6} {'304':>5} {'errors':>6}"
+            f" {'sent':>10} {'received':>10} {'peak RSS':>10}"
+        )
+        for cycle in range(1, args.cycles + 1):
+            stand_in.reset_stats()
+            start = time.perf_counter()
+            if args.use_async:
+                asyncio.run(collect_metrics_async(account))
+            else:
+                collect_metrics(account)
+            wall = time.perf_counter() - start
+
+            stats = stand_in.stats
+            errors = sum(
+                count
+                for status, count in stats.statuses.items()
+                if status == HTTPStatus.TOO_MANY_REQUESTS
+                or status >= HTTPStatus.INTERNAL_SERVER_ERROR
+            )
+            print(
+                f"{cycle:>5} {wall * 1000:>7.0f}ms {stats.total_calls:>6}"
+                f" {stats.statuses[HTTPStatus.NOT_MODIFIED]:>5} {errors:>6}"
+                f" {stats.bytes_received / 1024:>8.0f}kB"
+                f" {stats.bytes_sent / 1024:>8.0f}kB"
+                f" {peak_rss_bytes() / 2**20:>7.0f}MiB"
+            )
+
+    # The first scrape after a publish renders the snapshot, later ones reuse it
+    start = time.perf_counter()
+    EXPOSITION.render()
+    first = time.perf_counter() - start
+    cached, size = scrape_seconds()
+    cached_gzip, size_gzip = scrape_seconds(compress=True)
+    print(
+        f"/metrics first scrape after publish: {first * 1000:.1f}ms, "
+        f"cached: {cached * 1000:.1f}ms for {size / 1024:.0f}kB, "
+        f"gzip: {cached_gzip * 1000:.1f}ms for {size_gzip / 1024:.0f}kB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""
+Local stand-in for the Todoist REST and Sync APIs.
+
+Serves a synthetic account of configurable size over plain HTTP, with
+optional latency, a request rate limit and injected server errors. Every
+request and response byte is counted so benchmarks can report API usage.
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from benchmarks.task_store_memory import synthetic_tasks
+from prometheus_todoist_exporter.cache import CachingAdapter
+
+TODOIST_BASE_URL = "https://api.todoist.com"
+# REST API listings served by the stand-in, optionally filtered by project_id
+REST_RESOURCES = ("projects", "tasks", "sections", "comments", "labels")
+
+
+@dataclass
+class StandInConfig:
+    """Size and behaviour of the simulated Todoist account."""
+
+    tasks: int = 10_000
+    projects: int = 200
+    sections_per_project: int = 5
+    collaborators_per_project: int = 3
+    comments_per_project: int = 5
+    completed_tasks: int = 1_000
+    # Added to every response
+    latency: float = 0.0
+    # Requests allowed per window before answering 429, 0 for no limit
+    rate_limit_requests: int = 0
+    rate_limit_window: float = 60.0
+    # Share of requests answered with 503
+    error_rate: float = 0.0
+    seed: int = 0
+
+
+@dataclass
+class StandInStats:
+    """Requests served by the stand-in since the last reset."""
+
+    calls: Counter = field(default_factory=Counter)
+    statuses: Counter = field(default_factory=Counter)
+    bytes_received: int = 0
+    bytes_sent: int = 0
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+
+def build_account(config: StandInConfig) -> dict[str, list[dict[str, Any]]]:
+    """Generate the resources of a synthetic account."""
+    project_ids = [str(index) for index in range(config.projects)]
+    projects = [
+        {
+            "id": project_id,
+            "name": f"Project {project_id}",
+            "color": "grey",
+            "comment_count": config.comments_per_project,
+            "is_favorite": False,
+            "is_shared": config.collaborators_per_project > 0,
+            "order": int(project_id),
+            "url": f"https://todoist.com/showProject?id={project_id}",
+            "view_style": "list",
+        }
+        for project_id in project_ids
+    ]
+    sections = [
+        {
+            "id": f"{project_id}-{index}",
+            "name": f"Section {index}",
+            "order": index,
+            "project_id": project_id,
+        }
+        for project_id in project_ids
+        for index in range(config.sections_per_project)
+    ]
+    tasks = [
+        {**task, "project_id": str(int(task["project_id"]) % config.projects)}
+        for task in synthetic_tasks(config.tasks, seed=config.seed)
+    ]
+    collaborators = [
+        {
+            "id": str(index),
+            "email": f"user{index}@example.com",
+            "name": f"User {index}",
+        }
+        for index in range(config.collaborators_per_project)
+    ]
+    comments = [
+        {
+            "id": f"{project_id}-{index}",
+            "content": "Comment",
+            "posted_at": "2025-01-01T00:00:00.000000Z",
+            "project_id": project_id,
+            "task_id": None,
+            "attachment": None,
+        }
+        for project_id in project_ids
+        for index in range(config.comments_per_project)
+    ]
+    now = datetime.now(UTC)
+    rng = random.Random(config.seed)  # noqa: S311
+    completed = [
+        {
+            "id": str(index),
+            "task_id": str(index),
+            "project_id": rng.choice(project_ids),
+            "completed_at": (now - timedelta(hours=rng.uniform(0, 24 * 7))).strftime(
+                "%Y-%m-%dT%H:%M:%S.%fZ"
+            ),
+        }
+        for index in range(config.completed_tasks)
+    ]
+    return {
+        "projects": projects,
+        "sections": sections,
+        "tasks": tasks,
+        "collaborators": collaborators,
+        "comments": comments,
+        "completed": completed,
+    }
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Accept bursts of new connections from the exporter's fetch workers
+    request_queue_size = 128
+
+
+class TodoistStandIn:
+    """
+    HTTP server answering the Todoist endpoints the exporter uses.
+
+    REST responses carry an ETag and are answered with 304 Not Modified when
+    the client sends a matching If-None-Match header. Use as a context manager
+    to run the server in a background thread.
+    """
+
+    def __init__(self, config: StandInConfig | None = None) -> None:
+        self.config = config or StandInConfig()
+        self.account = build_account(self.config)
+        self.stats = StandInStats()
+        self._lock = threading.Lock()
+        self._rng = random.Random(self.config.seed)  # noqa: S311
+        self._window_start = time.monotonic()
+        self._window_requests = 0
+        self._server = StandInServer(("127.0.0.1", 0), self._handler_class())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "TodoistStandIn":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.stats = StandInStats()
+
+    def admit(self) -> HTTPStatus | None:
+        """Apply the rate limit and error injection to an incoming request."""
+        config = self.config
+        with self._lock:
+            if config.rate_limit_requests:
+                now = time.monotonic()
+                if now - self._window_start >= config.rate_limit_window:
+                    self._window_start = now
+                    self._window_requests = 0
+                self._window_requests += 1
+                if self._window_requests > config.rate_limit_requests:
+                    return HTTPStatus.TOO_MANY_REQUESTS
+            if config.error_rate and self._rng.random() < config.error_rate:
+                return HTTPStatus.SERVICE_UNAVAILABLE
+        return None
+
+    def record(self, endpoint: str, status: int, received: int, sent: int) -> None:
+        with self._lock:
+            self.stats.calls[endpoint] += 1
+            self.stats.statuses[status] += 1
+            self.stats.bytes_received += received
+            self.stats.bytes_sent += sent
+
+    def rest(self, path: str, query: dict[str, list[str]]) -> object | None:
+        """Body of a REST API GET request, or None for unknown paths."""
+        parts = path.removeprefix("/rest/v2/").split("/")
+        resource = parts[-1]
+        if parts[0] == "projects" and resource == "collaborators":
+            return self.account["collaborators"]
+        if len(parts) != 1 or resource not in REST_RESOURCES:
+            return None
+        resources = self.account.get(resource, [])
+        project_id = query.get("project_id", [None])[0]
+        if project_id is None:
+            return resources
+        return [item for item in resources if item["project_id"] == project_id]
+
+    def sync(self) -> dict[str, Any]:
+        """Body of a Sync API request, always a full sync."""
+        account = self.account
+        return {
+            "full_sync": True,
+            "sync_token": "stand-in",
+            "projects": account["projects"],
+            "items": [
+                {**task, "added_at": task["created_at"]} for task in account["tasks"]
+            ],
+            "sections": account["sections"],
+            "project_notes": account["comments"],
+            "collaborators": [
+                {**user, "full_name": user["name"]} for user in account["collaborators"]
+            ],
+            "collaborator_states": [
+                {"project_id": project["id"], "user_id": user["id"], "state": "active"}
+                for project in account["projects"]
+                for user in account["collaborators"]
+            ],
+        }
+
+    def completed(self, params: dict[str, Any]) -> dict[str, Any]:
+        """Body of a page of the completed tasks endpoint."""
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 30))
+        items = self.account["completed"]
+        if "since" in params:
+            since = datetime.fromisoformat(params["since"]).replace(tzinfo=UTC)
+            items = [
+                item
+                for item in items
+                if datetime.fromisoformat(item["completed_at"]) >= since
+            ]
+        return {"items": items[offset : offset + limit]}
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, avoid delayed ACK stalls
+            disable_nagle_algorithm = True
+
+            def log_message(self, *_args: object) -> None:
+                pass
+
+            def do_GET(self) -> None:  # noqa: N802
+                url = urlsplit(self.path)
+                self._respond(
+                    url.path.rsplit("/", 1)[-1],
+                    lambda: stand_in.rest(url.path, parse_qs(url.query)),
+                    conditional=True,
+                )
+
+            def do_POST(self) -> None:  # noqa: N802
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                if self.path.endswith("/completed/get_all"):
+                    self._respond(
+                        "completed/get_all",
+                        lambda: stand_in.completed(json.loads(body or b"{}")),
+                        received=length,
+                    )
+                elif self.path.endswith("/sync"):
+                    self._respond(
+                        "sync",
+                        stand_in.sync,
+                        received=length,
+                    )
+                else:
+                    self._send(self.path, HTTPStatus.NOT_FOUND, b"", received=length)
+
+            def _respond(
+                self,
+                endpoint: str,
+                build: Callable[[], object | None],
+                conditional: bool = False,
+                received: int = 0,
+            ) -> None:
+                if stand_in.config.latency:
+                    time.sleep(stand_in.config.latency)
+                rejected = stand_in.admit()
+                if rejected:
+                    headers = {}
+                    if rejected == HTTPStatus.TOO_MANY_REQUESTS:
+                        headers["Retry-After"] = "1"
+                    self._send(endpoint, rejected, b"", received, headers)
+                    return
+
+                payload = build()
+                if payload is None:
+                    self._send(endpoint, HTTPStatus.NOT_FOUND, b"", received)
+                    return
+                body = json.dumps(payload).encode()
+                headers = {"Content-Type": "application/json"}
+                if conditional:
+                    etag = f'"{hashlib.sha1(body).hexdigest()}"'  # noqa: S324
+                    headers["ETag"] = etag
+                    if self.headers.get("If-None-Match") == etag:
+                        self._send(
+                            endpoint, HTTPStatus.NOT_MODIFIED, b"", received, headers
+                        )
+                        return
+                self._send(endpoint, HTTPStatus.OK, body, received, headers)
+
+            def _send(
+                self,
+                endpoint: str,
+                status: HTTPStatus,
+                body: bytes,
+                received: int = 0,
+                headers: dict[str, str] | None = None,
+            ) -> None:
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                if status != HTTPStatus.NOT_MODIFIED:
+                    self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+                stand_in.record(endpoint, status, received, len(body))
+
+        return Handler
+
+
+class StandInAdapter(CachingAdapter):
+    """Caching adapter that sends Todoist API requests to a local stand-in."""
+
+    def __init__(self, base_url: str, **kwargs: object) -> None:
+        self.base_url = base_url
+        super().__init__(**kwargs)
+
+    def send(
+        self, request: requests.PreparedRequest, **kwargs: object
+    ) -> requests.Response:
+        if request.url and request.url.startswith(TODOIST_BASE_URL):
+            request.url = self.base_url + request.url.removeprefix(TODOIST_BASE_URL)
+        return super().send(request, **kwargs)
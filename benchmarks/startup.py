@@ -0,0 +1,150 @@
+"""
+Measure the time from starting the exporter process to its first /metrics.
+
+Run with `python -m benchmarks.startup [--runs N ...]`. Every run starts
+`python -m prometheus_todoist_exporter` on a free port and polls until
+/metrics answers, reporting the median and best time over the runs together
+with the time to import the startup path, which serves /metrics, and the
+collection code. Todoist requests of the
+started exporter are sent to an unreachable proxy so no run depends on the
+network. --state-dir restores metrics from a state file written by an
+earlier run and also reports the time until /ready succeeds.
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from http import HTTPStatus
+from http.client import HTTPConnection
+
+from prometheus_todoist_exporter import exporter
+from prometheus_todoist_exporter.accounts import Account
+
+POLL_INTERVAL = 0.001
+STARTUP_TIMEOUT = 30
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def exporter_env(port: int, state_dir: str) -> dict[str, str]:
+    env = {
+        **os.environ,
+        "EXPORTER_PORT": str(port),
+        "TODOIST_API_TOKEN": "benchmark",
+        "STATE_DIR": state_dir,
+        # Fail every Todoist request immediately instead of going to the network
+        "HTTPS_PROXY": "http://127.0.0.1:9",
+        "NO_PROXY": "127.0.0.1,localhost",
+    }
+    env.pop("TODOIST_ACCOUNTS_FILE", None)
+    return env
+
+
+def get_status(port: int, path: str) -> int | None:
+    """Status of a GET request, or None while the server is not listening."""
+    connection = HTTPConnection("127.0.0.1", port, timeout=1)
+    try:
+        connection.request("GET", path)
+        return connection.getresponse().status
+    except OSError:
+        return None
+    finally:
+        connection.close()
+
+
+def wait_for(port: int, path: str, start: float) -> float:
+    """Seconds since start until path answers 200."""
+    while time.perf_counter() - start < STARTUP_TIMEOUT:
+        if get_status(port, path) == HTTPStatus.OK:
+            return time.perf_counter() - start
+        time.sleep(POLL_INTERVAL)
+    message = f"{path} did not answer within {STARTUP_TIMEOUT} seconds"
+    raise TimeoutError(message)
+
+
+def startup_seconds(state_dir: str) -> tuple[float, float | None]:
+    """Seconds until the first /metrics and, with a state dir, until /ready."""
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(  # noqa: S603
+        [sys.executable, "-m", "prometheus_todoist_exporter"],
+        env=exporter_env(port, state_dir),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        metrics = wait_for(port, "/metrics", start)
+        ready = wait_for(port, "/ready", start) if state_dir else None
+    finally:
+        process.terminate()
+        process.wait()
+    return metrics, ready
+
+
+def import_seconds(module: str) -> float:
+    """Seconds a fresh interpreter takes to import a module."""
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; "
+        "print(time.perf_counter() - start)"
+    )
+    output = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code], capture_output=True, check=True, text=True
+    ).stdout
+    return float(output)
+
+
+def write_state(state_dir: str) -> None:
+    """Write a state file for the benchmark account, as a previous run would."""
+    account = Account(name="default", token="benchmark")  # noqa: S106
+    metrics = exporter.MetricSet(exporter.SNAPSHOT_METRICS)
+    metrics.set(exporter.TODOIST_TASKS_TOTAL, 1, project_name="Inbox", project_id="1")
+    exporter.STATE_DIR = state_dir
+    exporter.save_account_state(account, metrics)
+
+
+def describe(label: str, timings: list[float]) -> str:
+    return (
+        f"{label}: median {statistics.median(timings) * 1000:.0f}ms, "
+        f"best {min(timings) * 1000:.0f}ms"
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--state-dir",
+        default="",
+        help="directory to write a state file to and restore it from",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.state_dir:
+        write_state(args.state_dir)
+
+    for module in (
+        "prometheus_todoist_exporter.app",
+        "prometheus_todoist_exporter.exporter",
+    ):
+        imports = [import_seconds(module) for _ in range(args.runs)]
+        print(describe(f"import {module}", imports))
+    runs = [startup_seconds(args.state_dir) for _ in range(args.runs)]
+    print(describe("first /metrics", [metrics for metrics, _ in runs]))
+    if args.state_dir:
+        print(describe("first /ready", [ready for _, ready in runs if ready]))
+
+
+if __name__ == "__main__":
+    main()
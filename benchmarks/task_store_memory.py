@@ -0,0 +1,123 @@
+"""
+Compare the memory held by Todoist task models and by the compact TaskStore.
+
+Run with `python -m benchmarks.task_store_memory [--tasks N]`. Every variant
+runs in a fresh process and reports how much its resident set grew while
+holding the tasks of a synthetic account.
+"""
+
+import argparse
+import gc
+import random
+import resource
+import subprocess
+import sys
+from collections.abc import Iterator
+from typing import Any
+
+from todoist_api_python.models import Task
+
+from prometheus_todoist_exporter.store import TaskStore
+
+PROJECTS = 200
+SECTIONS_PER_PROJECT = 5
+LABELS = [f"label-{index}" for index in range(30)]
+# Share of tasks with a due date, and of those that recur
+DUE_DATE_SHARE = 0.6
+RECURRING_SHARE = 0.1
+
+
+def synthetic_tasks(count: int, seed: int = 0) -> Iterator[dict[str, Any]]:
+    """Yield raw task dicts shaped like REST API responses."""
+    rng = random.Random(seed)  # noqa: S311
+    for index in range(count):
+        project = rng.randrange(PROJECTS)
+        due = None
+        if rng.random() < DUE_DATE_SHARE:
+            due = {
+                "date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                "is_recurring": rng.random() < RECURRING_SHARE,
+                "string": "some day",
+            }
+        yield {
+            "id": str(10_000_000 + index),
+            "assignee_id": None,
+            "assigner_id": None,
+            "comment_count": 0,
+            "is_completed": False,
+            "content": f"Task number {index}",
+            "created_at": "2025-01-01T00:00:00.000000Z",
+            "creator_id": "1000",
+            "description": "",
+            "due": due,
+            "labels": rng.sample(LABELS, rng.randint(0, 3)),
+            "order": index,
+            "parent_id": None,
+            "priority": rng.randint(1, 4),
+            "project_id": str(project),
+            "section_id": f"{project}-{rng.randrange(SECTIONS_PER_PROJECT)}",
+            "url": f"https://todoist.com/showTask?id={index}",
+        }
+
+
+def resident_bytes() -> int:
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        # Peak instead of current RSS, in kilobytes on Linux and bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def hold_tasks(variant: str, count: int) -> int:
+    """Build the tasks of one variant and return the RSS growth in bytes."""
+    gc.collect()
+    before = resident_bytes()
+    if variant == "models":
+        tasks: object = [Task.from_dict(task) for task in synthetic_tasks(count)]
+    else:
+        tasks = TaskStore()
+        for task in synthetic_tasks(count):
+            tasks.add_item(task)
+    gc.collect()
+    grown = resident_bytes() - before
+    del tasks
+    return grown
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--variant", choices=["models", "store"])
+    args = parser.parse_args()
+
+    if args.variant:
+        print(hold_tasks(args.variant, args.tasks))
+        return
+
+    results = {}
+    for variant in ("models", "store"):
+        output = subprocess.run(  # noqa: S603
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.task_store_memory",
+                f"--tasks={args.tasks}",
+                f"--variant={variant}",
+            ],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+        results[variant] = int(output)
+
+    for variant, grown in results.items():
+        print(f"{variant:>6}: {grown / 2**20:8.1f} MiB for {args.tasks} tasks")
+    reduction = 1 - results["store"] / results["models"]
+    print(f"TaskStore uses {reduction:.0%} less memory than Task models")
+
+
+if __name__ == "__main__":
+    main()
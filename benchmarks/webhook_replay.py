@@ -0,0 +1,181 @@
+"""
+Replay Todoist webhook events against a running exporter.
+
+Run with `python -m benchmarks.webhook_replay --secret SECRET [options]`
+against an exporter started with the same WEBHOOK_SECRET and
+INCREMENTAL_SYNC=true. Events are read from a JSON lines file with one
+webhook request body per line, or generated: the projects of the benchmark
+stand-in account, then tasks added to and completed in them. Every event is
+signed the way Todoist signs it and posted to the webhook endpoint. Reports
+the response statuses, the request latency and the time from the last event
+until the exporter published metrics that include it.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+from collections import Counter
+from collections.abc import Iterator
+from datetime import UTC, datetime
+from http import HTTPStatus
+from http.client import HTTPConnection
+from typing import Any
+from urllib.parse import urlsplit
+
+from prometheus_todoist_exporter.webhooks import SIGNATURE_HEADER, sign
+
+PUBLISHED_METRIC = "todoist_metrics_published_timestamp_seconds"
+POLL_INTERVAL = 0.05
+PUBLISH_TIMEOUT = 30
+# Share of generated events completing an open task instead of adding one
+COMPLETE_RATIO = 0.3
+
+
+def webhook_event(name: str, user_id: str, data: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "event_name": name,
+        "user_id": user_id,
+        "event_data": data,
+        "version": "9",
+    }
+
+
+def synthetic_events(
+    count: int, projects: int, user_id: str, seed: int = 0
+) -> Iterator[dict[str, Any]]:
+    """Events adding the stand-in projects, then adding and completing tasks."""
+    for project_id in map(str, range(projects)):
+        yield webhook_event(
+            "project:added",
+            user_id,
+            {"id": project_id, "name": f"Project {project_id}"},
+        )
+    rng = random.Random(seed)  # noqa: S311
+    open_tasks: list[dict[str, Any]] = []
+    for index in range(count):
+        now = datetime.now(UTC).isoformat()
+        if open_tasks and rng.random() < COMPLETE_RATIO:
+            task = open_tasks.pop(rng.randrange(len(open_tasks)))
+            yield webhook_event(
+                "item:completed",
+                user_id,
+                {**task, "checked": True, "completed_at": now},
+            )
+            continue
+        task = {
+            "id": f"replay-{seed}-{index}",
+            "project_id": str(rng.randrange(projects)),
+            "section_id": None,
+            "content": "Replayed task",
+            "priority": rng.randint(1, 4),
+            "labels": [],
+            "due": None,
+            "added_at": now,
+            "checked": False,
+            "is_deleted": False,
+        }
+        open_tasks.append(task)
+        yield webhook_event("item:added", user_id, task)
+
+
+def file_events(path: str) -> Iterator[dict[str, Any]]:
+    """Events read from a JSON lines file."""
+    with open(path) as events:
+        for line in events:
+            if line.strip():
+                yield json.loads(line)
+
+
+def post_event(
+    connection: HTTPConnection, path: str, event: dict[str, Any], secret: str
+) -> tuple[int, float]:
+    """Post a signed event, returning the response status and latency."""
+    body = json.dumps(event).encode()
+    start = time.perf_counter()
+    connection.request(
+        "POST",
+        path,
+        body=body,
+        headers={
+            "Content-Type": "application/json",
+            SIGNATURE_HEADER: sign(secret, body),
+        },
+    )
+    response = connection.getresponse()
+    response.read()
+    return response.status, time.perf_counter() - start
+
+
+def published_at(connection: HTTPConnection, path: str) -> float:
+    """Latest publish time reported by the exporter, 0 if none."""
+    connection.request("GET", path)
+    response = connection.getresponse()
+    latest = 0.0
+    for line in response.read().decode().splitlines():
+        if line.startswith(PUBLISHED_METRIC):
+            latest = max(latest, float(line.rsplit(" ", 1)[1]))
+    return latest
+
+
+def wait_for_publish(connection: HTTPConnection, path: str, after: float) -> float:
+    """Seconds until the exporter published metrics newer than after."""
+    while time.time() - after < PUBLISH_TIMEOUT:
+        if published_at(connection, path) >= after:
+            return time.time() - after
+        time.sleep(POLL_INTERVAL)
+    message = f"No metrics were published within {PUBLISH_TIMEOUT} seconds"
+    raise TimeoutError(message)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:9090")
+    parser.add_argument("--webhook-path", default="/webhooks/todoist")
+    parser.add_argument("--metrics-path", default="/metrics")
+    parser.add_argument("--secret", default=os.environ.get("WEBHOOK_SECRET", ""))
+    parser.add_argument("--events", help="JSON lines file of events to replay")
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--projects", type=int, default=10)
+    parser.add_argument("--user-id", default="1")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if not args.secret:
+        message = "--secret or WEBHOOK_SECRET is required"
+        raise SystemExit(message)
+    events = (
+        file_events(args.events)
+        if args.events
+        else synthetic_events(args.count, args.projects, args.user_id, args.seed)
+    )
+    url = urlsplit(args.url)
+    connection = HTTPConnection(url.hostname, url.port, timeout=10)
+
+    statuses: Counter = Counter()
+    latencies = []
+    for event in events:
+        status, latency = post_event(connection, args.webhook_path, event, args.secret)
+        statuses[status] += 1
+        latencies.append(latency)
+    last_event = time.time()
+    if not latencies:
+        return
+
+    print(f"events: {len(latencies)}, statuses: {dict(statuses)}")
+    print(
+        f"request latency: median {statistics.median(latencies) * 1000:.1f}ms, "
+        f"max {max(latencies) * 1000:.1f}ms"
+    )
+    if statuses[HTTPStatus.OK]:
+        freshness = wait_for_publish(connection, args.metrics_path, last_event)
+        print(f"published {freshness:.2f}s after the last event")
+
+
+if __name__ == "__main__":
+    main()
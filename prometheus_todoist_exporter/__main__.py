@@ -1,6 +1,6 @@
 """Main module entry point."""
 
-from prometheus_todoist_exporter.exporter import main
+from prometheus_todoist_exporter.app import main
 
 if __name__ == "__main__":
     main()
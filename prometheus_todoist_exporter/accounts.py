@@ -0,0 +1,215 @@
+"""Todoist accounts served by the exporter."""
+
+import os
+import threading
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import TYPE_CHECKING, Any
+
+import requests
+import tomllib
+
+from prometheus_todoist_exporter.ages import TaskAges
+from prometheus_todoist_exporter.cache import (
+    SLOW_CHANGING_ENDPOINTS,
+    CachingAdapter,
+    ResponseCache,
+)
+from prometheus_todoist_exporter.history import CompletionHistory
+from prometheus_todoist_exporter.retention import Retention
+from prometheus_todoist_exporter.scheduler import RequestScheduler, TokenBucket
+from prometheus_todoist_exporter.stages import (
+    StageResults,
+    StageSettings,
+    parse_stage_settings,
+)
+from prometheus_todoist_exporter.sync import SyncState
+
+if TYPE_CHECKING:
+    from todoist_api_python.api import TodoistAPI
+
+# Account settings that can be overridden per account in the accounts file
+ACCOUNT_SETTINGS = (
+    "collection_interval",
+    "incremental_sync",
+    "rate_limit_requests",
+    "rate_limit_window",
+    "max_retries",
+    "http_pool_size",
+    "cache_ttl",
+    "cache_max_entries",
+    "max_staleness",
+)
+
+
+def create_session(
+    pool_size: int, cache: ResponseCache, scheduler: RequestScheduler | None = None
+) -> requests.Session:
+    """
+    Create a keep-alive HTTP session with a connection pool of the given size.
+
+    The pool should be at least as large as the number of concurrent requests,
+    otherwise connections are closed and reopened instead of being reused.
+    GET responses are answered from the given cache where possible, and only
+    requests that are actually sent take a token from the scheduler.
+    """
+    session = requests.Session()
+    adapter = CachingAdapter(
+        cache,
+        before_send=scheduler.acquire_sending if scheduler else None,
+        pool_connections=2,
+        pool_maxsize=pool_size,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@dataclass
+class CollectionProgress:
+    """State of an account's collection cycles, read by health checks."""
+
+    # Monotonic start time of the running cycle, None between cycles
+    running_since: float | None = None
+    # Whether metrics were published, or restored from disk, at least once
+    published: bool = False
+
+    def running_for(self, now: float) -> float:
+        """Seconds the current cycle has been running, 0 between cycles."""
+        return 0 if self.running_since is None else now - self.running_since
+
+
+@dataclass
+class Account:
+    """
+    A Todoist account with its own API client and collection settings.
+
+    Every account is collected by an isolated worker. When the exporter serves
+    several accounts, account_label is set and all series and error counters
+    of the account carry an `account` label with its name.
+    """
+
+    name: str
+    token: str
+    collection_interval: int = 60
+    incremental_sync: bool = False
+    rate_limit_requests: int = 450
+    rate_limit_window: int = 900
+    max_retries: int = 3
+    http_pool_size: int = 10
+    cache_ttl: int = 300
+    cache_max_entries: int = 1024
+    max_staleness: int = 3600
+    stages: dict[str, StageSettings] = field(default_factory=dict)
+    account_label: bool = False
+    cache: ResponseCache = field(init=False, repr=False)
+    session: requests.Session = field(init=False, repr=False)
+    scheduler: RequestScheduler = field(init=False, repr=False)
+    sync_state: SyncState | None = field(init=False, repr=False)
+    stage_results: StageResults = field(init=False, repr=False)
+    retention: Retention = field(init=False, repr=False)
+    task_ages: TaskAges = field(init=False, repr=False)
+    # Created by the first collection of completed tasks
+    completions: CompletionHistory | None = field(default=None, init=False, repr=False)
+    progress: CollectionProgress = field(init=False, repr=False)
+    # Whether webhooks keep the sync state fresh between collections
+    webhooks: bool = field(default=False, init=False)
+    # Set when a webhook changed the sync state since it was last published
+    state_changed: threading.Event = field(init=False, repr=False)
+    # Held while metrics are derived and published, by collections and webhooks
+    publish_lock: threading.Lock = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.cache = ResponseCache(
+            self.cache_max_entries,
+            ttls=dict.fromkeys(SLOW_CHANGING_ENDPOINTS, self.cache_ttl),
+        )
+        self.scheduler = RequestScheduler(
+            TokenBucket(
+                capacity=self.rate_limit_requests,
+                refill_rate=self.rate_limit_requests / self.rate_limit_window,
+            ),
+            max_retries=self.max_retries,
+            acquire_on_send=True,
+        )
+        # REST and Sync API requests share one pool of warm connections
+        self.session = create_session(self.http_pool_size, self.cache, self.scheduler)
+        self.sync_state = (
+            SyncState(self.token, scheduler=self.scheduler, session=self.session)
+            if self.incremental_sync
+            else None
+        )
+        self.stage_results = StageResults(self.stages)
+        self.retention = Retention(self.max_staleness)
+        self.task_ages = TaskAges()
+        if self.sync_state:
+            # Task ages follow the item changes of every sync
+            self.sync_state.on_items = self.task_ages.apply_items
+        self.progress = CollectionProgress()
+        self.state_changed = threading.Event()
+        self.publish_lock = threading.Lock()
+
+    @cached_property
+    def api(self) -> "TodoistAPI":
+        """
+        REST API client sharing the account's session, built on first use.
+
+        The client library is imported here rather than at startup, so the
+        metrics server answers before it is loaded.
+        """
+        from todoist_api_python.api import TodoistAPI
+
+        return TodoistAPI(self.token, session=self.session)
+
+    @property
+    def labels(self) -> dict[str, str]:
+        """Labels added to every series reported for this account."""
+        return {"account": self.name} if self.account_label else {}
+
+
+def load_accounts(path: str, defaults: dict[str, Any]) -> list[Account]:
+    """
+    Load accounts from a TOML file.
+
+    Each [[accounts]] table needs a unique name and either a token or
+    token_env, the name of an environment variable holding the token. Any of the
+    ACCOUNT_SETTINGS may be set per account and otherwise fall back to the
+    given defaults. A [accounts.stages.<stage>] table overrides the enabled
+    flag and refresh interval of one collection stage.
+    """
+    with open(path, "rb") as config_file:
+        config = tomllib.load(config_file)
+
+    accounts = []
+    for entry in config.get("accounts", []):
+        # The name keys the published metrics, the account label and state file
+        if any(account.name == entry["name"] for account in accounts):
+            message = f"Account name {entry['name']} is used more than once"
+            raise ValueError(message)
+        settings = {**defaults}
+        settings.update({key: entry[key] for key in ACCOUNT_SETTINGS if key in entry})
+        if "stages" in entry:
+            settings["stages"] = {
+                **settings.get("stages", {}),
+                **parse_stage_settings(entry["stages"]),
+            }
+        accounts.append(
+            Account(
+                name=entry["name"],
+                token=_account_token(entry),
+                account_label=True,
+                **settings,
+            )
+        )
+    return accounts
+
+
+def _account_token(entry: dict[str, Any]) -> str:
+    if "token_env" in entry:
+        token = os.environ.get(entry["token_env"])
+    else:
+        token = entry.get("token")
+    if not token:
+        message = f"No Todoist API token configured for account {entry['name']}"
+        raise ValueError(message)
+    return token
@@ -0,0 +1,219 @@
+"""Task age and completion latency histograms maintained from task changes."""
+
+import bisect
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import accumulate
+from typing import Any
+
+from prometheus_todoist_exporter.metrics import HistogramValue
+from prometheus_todoist_exporter.store import TaskRecord
+
+HOUR = 3600
+DAY = 24 * HOUR
+# Upper bounds in seconds of the age and latency histogram buckets
+AGE_BUCKETS = (
+    HOUR,
+    6 * HOUR,
+    DAY,
+    3 * DAY,
+    7 * DAY,
+    14 * DAY,
+    30 * DAY,
+    90 * DAY,
+    180 * DAY,
+    365 * DAY,
+)
+# Closed tasks remembered until their completion is reported
+MAX_CLOSED_TASKS = 10000
+
+
+def parse_time(value: str | None) -> float | None:
+    """Unix time of an ISO 8601 timestamp from the API, None if missing."""
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+@dataclass(frozen=True, slots=True)
+class TrackedTask:
+    """The fields of an open task its age and completion latency depend on."""
+
+    project_id: str
+    created: float
+    is_recurring: bool
+
+
+class TaskAges:
+    """
+    Ages of the open tasks and completion latencies of the closed ones.
+
+    Open tasks are kept per project as a sorted list of creation times with
+    a running sum, so the age histogram of a project is read with one binary
+    search per bucket instead of a pass over its tasks. Tasks are added,
+    moved and closed one change at a time. A task completed after it was
+    closed, such as one that disappeared from the task list before its
+    completion was fetched, is remembered for MAX_CLOSED_TASKS closures.
+
+    Completion latency is the time from creating a task to completing it,
+    observed once per task into cumulative per-project counts. Completions
+    of recurring tasks do not close them and are not observed.
+    """
+
+    def __init__(
+        self,
+        buckets: tuple[float, ...] = AGE_BUCKETS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.buckets = buckets
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._open: dict[str, TrackedTask] = {}
+        self._closed: dict[str, TrackedTask] = {}
+        # Sorted creation times of the open tasks and their sum, by project
+        self._created: dict[str, list[float]] = {}
+        self._created_sum: dict[str, float] = {}
+        # Latencies per bucket, not cumulative, and their sum, by project
+        self._latency: dict[str, list[int]] = {}
+        self._latency_sum: dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._open)
+
+    def replace(self, tasks: Iterable[TaskRecord]) -> None:
+        """Track exactly the given open tasks, as listed by the REST API."""
+        with self._lock:
+            listed = set()
+            for task in tasks:
+                listed.add(task.id)
+                self._track(
+                    task.id, task.project_id, task.created_at, task.is_recurring
+                )
+            for task_id in self._open.keys() - listed:
+                self._close(task_id)
+
+    def apply_items(self, items: Iterable[dict[str, Any]], full: bool = False) -> None:
+        """
+        Apply items changed according to the Sync API.
+
+        Deleted items are closed and checked ones completed. With full the
+        items are all open tasks, so every other tracked task is closed.
+        """
+        with self._lock:
+            listed = set()
+            for item in items:
+                task_id = item["id"]
+                listed.add(task_id)
+                if item.get("is_deleted"):
+                    self._close(task_id)
+                elif item.get("checked"):
+                    self._close(task_id)
+                    # Items completed just now may not carry their completion time
+                    completed = parse_time(item.get("completed_at")) or self._clock()
+                    self._complete(task_id, completed)
+                else:
+                    due = item.get("due")
+                    self._track(
+                        task_id,
+                        item["project_id"],
+                        item.get("added_at"),
+                        bool(due and due.get("is_recurring")),
+                    )
+            if full:
+                for task_id in self._open.keys() - listed:
+                    self._close(task_id)
+
+    def record_completions(self, items: Iterable[dict[str, Any]]) -> None:
+        """Observe the latency of completed items from the Sync API."""
+        with self._lock:
+            for item in items:
+                task_id = item.get("task_id")
+                if task_id:
+                    self._complete(task_id, parse_time(item.get("completed_at")))
+
+    def age(self, project_id: str, now: float | None = None) -> HistogramValue:
+        """Histogram of the ages in seconds of the open tasks of a project."""
+        now = self._clock() if now is None else now
+        with self._lock:
+            created = self._created.get(project_id, [])
+            total = len(created)
+            counts = [
+                total - bisect.bisect_left(created, now - bound)
+                for bound in self.buckets
+            ]
+            age_sum = total * now - self._created_sum.get(project_id, 0)
+        return HistogramValue((*counts, total), age_sum)
+
+    def latency(self, project_id: str) -> HistogramValue:
+        """Histogram of the completion latencies in seconds of a project."""
+        with self._lock:
+            counts = self._latency.get(project_id) or [0] * (len(self.buckets) + 1)
+            return HistogramValue(
+                tuple(accumulate(counts)), self._latency_sum.get(project_id, 0)
+            )
+
+    def _track(
+        self,
+        task_id: str,
+        project_id: str,
+        created_at: str | None,
+        is_recurring: bool,
+    ) -> None:
+        known = self._open.get(task_id)
+        if (
+            known is not None
+            and known.project_id == project_id
+            and known.is_recurring == is_recurring
+        ):
+            return
+        created = parse_time(created_at)
+        if created is None:
+            if known is None:
+                return
+            created = known.created
+        self._remove(task_id)
+        self._closed.pop(task_id, None)
+        task = TrackedTask(project_id, created, is_recurring)
+        self._open[task_id] = task
+        bisect.insort(self._created.setdefault(project_id, []), created)
+        self._created_sum[project_id] = self._created_sum.get(project_id, 0) + created
+
+    def _remove(self, task_id: str) -> TrackedTask | None:
+        task = self._open.pop(task_id, None)
+        if task is None:
+            return None
+        created = self._created[task.project_id]
+        del created[bisect.bisect_left(created, task.created)]
+        if created:
+            self._created_sum[task.project_id] -= task.created
+        else:
+            del self._created[task.project_id]
+            del self._created_sum[task.project_id]
+        return task
+
+    def _close(self, task_id: str) -> None:
+        task = self._remove(task_id)
+        if task is None:
+            return
+        self._closed[task_id] = task
+        if len(self._closed) > MAX_CLOSED_TASKS:
+            del self._closed[next(iter(self._closed))]
+
+    def _complete(self, task_id: str, completed: float | None) -> None:
+        task = self._closed.pop(task_id, None)
+        if task is None:
+            task = self._open.get(task_id)
+            if task is None or task.is_recurring:
+                return
+            self._remove(task_id)
+        if completed is None or task.is_recurring:
+            return
+        latency = max(completed - task.created, 0)
+        counts = self._latency.setdefault(
+            task.project_id, [0] * (len(self.buckets) + 1)
+        )
+        counts[bisect.bisect_left(self.buckets, latency)] += 1
+        self._latency_sum[task.project_id] = (
+            self._latency_sum.get(task.project_id, 0) + latency
+        )
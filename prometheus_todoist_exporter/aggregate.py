@@ -0,0 +1,96 @@
+"""Single-pass aggregation of task counts for every task-derived gauge."""
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+from prometheus_todoist_exporter.store import TaskRecord
+
+# Task priorities always reported per project, even when no task has them
+PRIORITIES = (1, 2, 3, 4)
+
+# Position of a due date relative to today
+_OVERDUE = -1
+_DUE_TODAY = 0
+_UPCOMING = 1
+
+
+@dataclass(slots=True)
+class ProjectCounts:
+    """Task counts of a single project."""
+
+    total: int = 0
+    overdue: int = 0
+    due_today: int = 0
+    with_due_date: int = 0
+    recurring: int = 0
+    priorities: dict[int, int] = field(
+        default_factory=lambda: dict.fromkeys(PRIORITIES, 0)
+    )
+
+
+@dataclass
+class TaskCounts:
+    """Counts of one collection cycle for every dimension the gauges report."""
+
+    projects: dict[str, ProjectCounts] = field(default_factory=dict)
+    labels: dict[str, int] = field(default_factory=dict)
+    sections: dict[str, int] = field(default_factory=dict)
+
+    def project(self, project_id: str) -> ProjectCounts:
+        """Counts of a project, all zero if it has no tasks."""
+        return self.projects.get(project_id) or ProjectCounts()
+
+
+def _due_state(due_date: str, today: str) -> int:
+    if due_date < today:
+        return _OVERDUE
+    if due_date == today:
+        return _DUE_TODAY
+    return _UPCOMING
+
+
+def aggregate_tasks(tasks: Iterable[TaskRecord], today: str) -> TaskCounts:
+    """
+    Count tasks per project, priority, due state, label and section.
+
+    Tasks are walked once. Due dates are compared with today once per
+    distinct date, and tasks sharing a label tuple are counted per tuple and
+    only expanded to single labels at the end.
+    """
+    projects: dict[str, ProjectCounts] = {}
+    sections: dict[str, int] = {}
+    label_sets: dict[tuple[str, ...], int] = {}
+    due_states: dict[str, int] = {}
+
+    for task in tasks:
+        counts = projects.get(task.project_id)
+        if counts is None:
+            counts = projects[task.project_id] = ProjectCounts()
+        counts.total += 1
+        priorities = counts.priorities
+        priorities[task.priority] = priorities.get(task.priority, 0) + 1
+
+        due_date = task.due_date
+        if due_date:
+            counts.with_due_date += 1
+            if task.is_recurring:
+                counts.recurring += 1
+            state = due_states.get(due_date)
+            if state is None:
+                state = due_states[due_date] = _due_state(due_date, today)
+            if state == _OVERDUE:
+                counts.overdue += 1
+            elif state == _DUE_TODAY:
+                counts.due_today += 1
+
+        if task.labels:
+            label_sets[task.labels] = label_sets.get(task.labels, 0) + 1
+        if task.section_id:
+            sections[task.section_id] = sections.get(task.section_id, 0) + 1
+
+    labels: dict[str, int] = {}
+    for label_set, count in label_sets.items():
+        for label in label_set:
+            labels[label] = labels.get(label, 0) + count
+
+    return TaskCounts(projects=projects, labels=labels, sections=sections)
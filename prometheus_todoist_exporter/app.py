@@ -0,0 +1,151 @@
+"""Startup of the exporter process."""
+
+import json
+import os
+import threading
+from collections.abc import Mapping
+from http import HTTPStatus
+from types import ModuleType
+from typing import TYPE_CHECKING
+
+from prometheus_todoist_exporter.families import EXPOSITION, TODOIST_WEBHOOK_EVENTS
+from prometheus_todoist_exporter.server import MetricsServer, start_metrics_server
+from prometheus_todoist_exporter.webhooks import (
+    EVENT_CHANGES,
+    SIGNATURE_HEADER,
+    verify_signature,
+)
+
+if TYPE_CHECKING:
+    from prometheus_todoist_exporter.accounts import Account
+
+EXPORTER_PORT = int(os.environ.get("EXPORTER_PORT", "9090"))
+METRICS_PATH = os.environ.get("METRICS_PATH", "/metrics")
+# Seconds before an idle or slow client connection is closed
+HTTP_REQUEST_TIMEOUT = float(os.environ.get("HTTP_REQUEST_TIMEOUT", "10"))
+# Client secret of the Todoist app signing webhook requests, empty to disable
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET", "")
+WEBHOOK_PATH = os.environ.get("WEBHOOK_PATH", "/webhooks/todoist")
+
+
+class Exporter:
+    """
+    The exporter process: the metrics server and the collection of accounts.
+
+    Startup is ordered for a fast first scrape. The server only needs the
+    metric families, so it starts before the collection code, requests and
+    the Todoist client are imported, and /ready fails until every account
+    has published. Accounts are configured from the environment unless
+    given, and each account builds its API client on first use. With a
+    webhook secret, signed webhook events are received at webhook_path.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        accounts: list["Account"] | None = None,
+        port: int = EXPORTER_PORT,
+        metrics_path: str = METRICS_PATH,
+        timeout: float = HTTP_REQUEST_TIMEOUT,
+        addr: str = "0.0.0.0",  # noqa: S104
+        webhook_secret: str = WEBHOOK_SECRET,
+        webhook_path: str = WEBHOOK_PATH,
+    ) -> None:
+        self.port = port
+        self.metrics_path = metrics_path
+        self.timeout = timeout
+        self.addr = addr
+        self.webhook_secret = webhook_secret
+        self.webhook_path = webhook_path
+        self.server: MetricsServer | None = None
+        # None until the accounts are configured
+        self._accounts = accounts
+
+    @property
+    def accounts(self) -> list["Account"]:
+        """The collected accounts, configured from the environment on first use."""
+        if self._accounts is None:
+            self._accounts = collection().configured_accounts()
+        return self._accounts
+
+    def is_healthy(self) -> bool:
+        return self._accounts is None or collection().is_healthy(self._accounts)
+
+    def is_ready(self) -> bool:
+        return self._accounts is not None and collection().is_ready(self._accounts)
+
+    def receive_webhook(self, body: bytes, headers: Mapping[str, str]) -> HTTPStatus:
+        """
+        Verify a webhook request and apply its event to the account it is for.
+
+        Requests arriving before the accounts are configured are answered
+        with 503, so Todoist delivers them again later.
+        """
+        if not verify_signature(
+            self.webhook_secret, body, headers.get(SIGNATURE_HEADER)
+        ):
+            TODOIST_WEBHOOK_EVENTS.labels(event="", result="rejected").inc()
+            return HTTPStatus.UNAUTHORIZED
+        try:
+            event = json.loads(body)
+        except ValueError:
+            event = None
+        if not isinstance(event, dict):
+            TODOIST_WEBHOOK_EVENTS.labels(event="", result="rejected").inc()
+            return HTTPStatus.BAD_REQUEST
+        if self._accounts is None:
+            return HTTPStatus.SERVICE_UNAVAILABLE
+
+        applied = collection().receive_webhook(self._accounts, event)
+        name = event.get("event_name")
+        TODOIST_WEBHOOK_EVENTS.labels(
+            event=name if isinstance(name, str) and name in EVENT_CHANGES else "other",
+            result="applied" if applied else "ignored",
+        ).inc()
+        return HTTPStatus.OK
+
+    def serve(self) -> MetricsServer:
+        """Start the metrics and health endpoints if they are not running yet."""
+        if self.server is None:
+            self.server = start_metrics_server(
+                self.port,
+                EXPOSITION,
+                metrics_path=self.metrics_path,
+                healthy=self.is_healthy,
+                ready=self.is_ready,
+                timeout=self.timeout,
+                addr=self.addr,
+                webhook=self.receive_webhook if self.webhook_secret else None,
+                webhook_path=self.webhook_path,
+            )
+        return self.server
+
+    def start(self) -> None:
+        """Serve, then configure the accounts and start collecting them."""
+        self.serve()
+        print(
+            f"Todoist Prometheus exporter started on port {self.port} "
+            f"with metrics at {self.metrics_path}"
+        )
+        if self.webhook_secret:
+            print(f"Receiving Todoist webhooks at {self.webhook_path}")
+        collection().start_collection(self.accounts, webhooks=bool(self.webhook_secret))
+
+    def stop(self) -> None:
+        """Stop serving. Collection threads end with the process."""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def collection() -> ModuleType:
+    """The collection module, imported on first use rather than at startup."""
+    from prometheus_todoist_exporter import exporter
+
+    return exporter
+
+
+def main() -> None:
+    """Main function to run the exporter."""
+    Exporter().start()
+    threading.Event().wait()
@@ -0,0 +1,238 @@
+"""Conditional response caching for slow-changing Todoist resources."""
+
+import base64
+import io
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, replace
+from http import HTTPStatus
+from typing import Any
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# REST API resources that rarely change and are served from cache within a TTL
+SLOW_CHANGING_ENDPOINTS = ("projects", "sections", "collaborators", "labels")
+# Resources whose responses hold comment text or contact details, which the
+# metrics only count, so they are never written to disk
+UNPERSISTED_ENDPOINTS = ("comments", "collaborators")
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """Body and validators of a successful GET response."""
+
+    status_code: int
+    headers: CaseInsensitiveDict
+    content: bytes
+    encoding: str | None
+    stored_at: float
+
+    @property
+    def etag(self) -> str | None:
+        return self.headers.get("ETag")
+
+    @property
+    def last_modified(self) -> str | None:
+        return self.headers.get("Last-Modified")
+
+
+def endpoint_name(url: str) -> str:
+    """Name of the REST resource a URL points to, such as `collaborators`."""
+    return urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1]
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache of GET responses keyed by URL.
+
+    Responses of endpoints with a TTL are served without a request while they
+    are younger than the TTL. Older responses, and responses of endpoints
+    without a TTL, are revalidated with If-None-Match and If-Modified-Since
+    when the API sent an ETag or Last-Modified header.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttls: dict[str, float] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        on_lookup: Callable[[str, str], None] | None = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttls = ttls or {}
+        self._clock = clock
+        self.on_lookup = on_lookup
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, url: str) -> CachedResponse | None:
+        """Return the cached response of a URL and mark it as recently used."""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def put(self, url: str, entry: CachedResponse) -> None:
+        """Store a response, evicting the least recently used ones if full."""
+        with self._lock:
+            self._entries[url] = entry
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def is_fresh(self, url: str, entry: CachedResponse) -> bool:
+        """Whether an entry may be served without asking the API."""
+        ttl = self.ttls.get(endpoint_name(url), 0)
+        return self._clock() - entry.stored_at < ttl
+
+    def store(self, url: str, response: requests.Response) -> None:
+        """Cache a successful response if it can ever be reused."""
+        cacheable = self.ttls.get(endpoint_name(url), 0) > 0 or (
+            "ETag" in response.headers or "Last-Modified" in response.headers
+        )
+        if not cacheable or self.max_entries <= 0:
+            return
+        self.put(
+            url,
+            CachedResponse(
+                status_code=response.status_code,
+                headers=CaseInsensitiveDict(response.headers),
+                content=response.content,
+                encoding=response.encoding,
+                stored_at=self._clock(),
+            ),
+        )
+
+    def revalidated(self, url: str, entry: CachedResponse) -> None:
+        """Restart the TTL of an entry the API reported as not modified."""
+        self.put(url, replace(entry, stored_at=self._clock()))
+
+    def dump(self) -> list[dict[str, Any]]:
+        """
+        Plain data copy of the entries that can be revalidated.
+
+        Entries without an ETag or Last-Modified header are left out, since
+        after a restart they would be downloaded again anyway, and so are
+        responses of UNPERSISTED_ENDPOINTS.
+        """
+        with self._lock:
+            entries = list(self._entries.items())
+        return [
+            {
+                "url": url,
+                "status_code": entry.status_code,
+                "headers": dict(entry.headers),
+                "content": base64.b64encode(entry.content).decode(),
+                "encoding": entry.encoding,
+            }
+            for url, entry in entries
+            if (entry.etag or entry.last_modified)
+            and endpoint_name(url) not in UNPERSISTED_ENDPOINTS
+        ]
+
+    def restore(self, entries: list[dict[str, Any]]) -> None:
+        """
+        Load entries written by dump().
+
+        Restored entries are treated as expired, so they are revalidated with
+        the API before their first use instead of being served blindly.
+        """
+        for entry in entries:
+            self.put(
+                entry["url"],
+                CachedResponse(
+                    status_code=entry["status_code"],
+                    headers=CaseInsensitiveDict(entry["headers"]),
+                    content=base64.b64decode(entry["content"]),
+                    encoding=entry["encoding"],
+                    stored_at=float("-inf"),
+                ),
+            )
+
+    def record(self, url: str, result: str) -> None:
+        if self.on_lookup:
+            self.on_lookup(endpoint_name(url), result)
+
+
+class CachingAdapter(HTTPAdapter):
+    """
+    Transport adapter answering GET requests from a ResponseCache.
+
+    Every lookup is reported as `hit` when served from cache without a
+    request, `revalidated` when the API answered 304 Not Modified and `miss`
+    when the full response was downloaded. Responses built from the cache
+    have their `from_cache` attribute set. before_send is called before
+    every request that goes to the network, such as to take a rate limit
+    token, and not for responses served from cache.
+    """
+
+    def __init__(
+        self,
+        cache: ResponseCache,
+        before_send: Callable[[], None] | None = None,
+        **kwargs: object,
+    ) -> None:
+        self.cache = cache
+        self.before_send = before_send
+        super().__init__(**kwargs)
+
+    def send(
+        self, request: requests.PreparedRequest, **kwargs: object
+    ) -> requests.Response:
+        if request.method != "GET" or not request.url:
+            return self._send(request, **kwargs)
+
+        url = request.url
+        entry = self.cache.get(url)
+        if entry is not None and self.cache.is_fresh(url, entry):
+            self.cache.record(url, "hit")
+            return self._cached_response(request, entry)
+
+        if entry is not None:
+            if entry.etag:
+                request.headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                request.headers["If-Modified-Since"] = entry.last_modified
+
+        response = self._send(request, **kwargs)
+        if entry is not None and response.status_code == HTTPStatus.NOT_MODIFIED:
+            # Drain the empty body so the connection goes back to the pool
+            response.content  # noqa: B018
+            self.cache.revalidated(url, entry)
+            self.cache.record(url, "revalidated")
+            return self._cached_response(request, entry)
+
+        self.cache.record(url, "miss")
+        if response.status_code == HTTPStatus.OK:
+            self.cache.store(url, response)
+        return response
+
+    def _send(
+        self, request: requests.PreparedRequest, **kwargs: object
+    ) -> requests.Response:
+        if self.before_send:
+            self.before_send()
+        return super().send(request, **kwargs)
+
+    def _cached_response(
+        self, request: requests.PreparedRequest, entry: CachedResponse
+    ) -> requests.Response:
+        response = requests.Response()
+        response.status_code = entry.status_code
+        response.headers = CaseInsensitiveDict(entry.headers)
+        response.raw = io.BytesIO(entry.content)
+        response.encoding = entry.encoding
+        response.url = request.url or ""
+        response.request = request
+        response.reason = HTTPStatus(entry.status_code).phrase
+        response.from_cache = True
+        return response
@@ -0,0 +1,104 @@
+"""Bounded label cardinality for metric families with free-text label values."""
+
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+from prometheus_todoist_exporter.metrics import MetricSet, MetricSpec
+
+# Label value of the series that dropped values are summed into
+OTHER = "other"
+
+
+def compile_pattern(pattern: str) -> re.Pattern[str] | None:
+    """Compile an allow or deny list regex, or None for an empty pattern."""
+    return re.compile(pattern) if pattern else None
+
+
+@dataclass(frozen=True)
+class DimensionLimit:
+    """
+    Which values of a label dimension, such as projects, get their own series.
+
+    Values whose name matches deny, or does not match allow, are dropped.
+    Patterns must match the whole name. Of the remaining values only the
+    top_k with the largest weight are kept, the others are summed into one
+    `other` value. A top_k of 0 keeps every allowed value.
+    """
+
+    top_k: int = 0
+    allow: re.Pattern[str] | None = None
+    deny: re.Pattern[str] | None = None
+
+    @property
+    def is_unbounded(self) -> bool:
+        return not self.top_k and self.allow is None and self.deny is None
+
+    def is_allowed(self, name: str) -> bool:
+        if self.allow is not None and not self.allow.fullmatch(name):
+            return False
+        return self.deny is None or not self.deny.fullmatch(name)
+
+    def select(self, weights: dict[tuple[str, ...], float]) -> set[tuple[str, ...]]:
+        """
+        Values that keep their own series.
+
+        Values are keyed by their label values with the name first, and ties
+        in weight are broken by the label values so the selection is stable.
+        """
+        allowed = [value for value in weights if self.is_allowed(value[0])]
+        if not self.top_k or len(allowed) <= self.top_k:
+            return set(allowed)
+        ranked = sorted(allowed, key=lambda value: (-weights[value], value))
+        return set(ranked[: self.top_k])
+
+
+def limit_dimension(  # noqa: PLR0913
+    metrics: MetricSet,
+    spec: MetricSpec,
+    labelnames: tuple[str, ...],
+    limit: DimensionLimit,
+    kept: set[tuple[str, ...]],
+    dropped: Counter,
+) -> None:
+    """
+    Apply a dimension limit to one family of a metric set.
+
+    labelnames are the labels identifying a value of the dimension, name
+    first. Series of kept values are unchanged, series of disallowed values
+    are removed and the rest are summed into series labelled `other`. The
+    number of affected series is added to dropped per family and reason.
+    """
+    positions = [spec.labelnames.index(name) for name in labelnames]
+    values: dict[tuple[str, ...], float] = {}
+    for key, value in metrics.series(spec).items():
+        dimension_value = tuple(key[position] for position in positions)
+        if dimension_value in kept:
+            values[key] = values.get(key, 0) + value
+            continue
+        if not limit.is_allowed(dimension_value[0]):
+            dropped[spec.name, "denied"] += 1
+            continue
+        dropped[spec.name, "other"] += 1
+        other_key = list(key)
+        for position in positions:
+            other_key[position] = OTHER
+        other_key = tuple(other_key)
+        values[other_key] = values.get(other_key, 0) + value
+    metrics.replace_series(spec, values)
+
+
+def cap_series(
+    metrics: MetricSet, spec: MetricSpec, max_series: int, dropped: Counter
+) -> None:
+    """
+    Keep only the max_series series of a family with the largest values.
+
+    Histogram series are ranked by their total count.
+    """
+    series = metrics.series(spec)
+    if len(series) <= max_series:
+        return
+    ranked = sorted(series.items(), key=lambda item: (-float(item[1]), item[0]))
+    metrics.replace_series(spec, dict(ranked[:max_series]))
+    dropped[spec.name, "max_series"] += len(series) - max_series
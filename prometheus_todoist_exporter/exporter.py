@@ -1,117 +1,326 @@
+import asyncio
+import collections
 import os
+import threading
 import time
-from datetime import UTC, datetime, timedelta
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from functools import partial
 from http import HTTPStatus
-from typing import Any
+from typing import TYPE_CHECKING, Any, TypeVar
 
 import requests
-from prometheus_client import Counter, Gauge, start_http_server
-from todoist_api_python.api import TodoistAPI
+from prometheus_client import Counter, Gauge
+
+from prometheus_todoist_exporter.accounts import Account, load_accounts
+from prometheus_todoist_exporter.ages import TaskAges
+from prometheus_todoist_exporter.aggregate import TaskCounts, aggregate_tasks
+from prometheus_todoist_exporter.app import main
+from prometheus_todoist_exporter.cache import endpoint_name
+from prometheus_todoist_exporter.cardinality import (
+    DimensionLimit,
+    cap_series,
+    compile_pattern,
+    limit_dimension,
+)
+from prometheus_todoist_exporter.families import (
+    COLLECTOR,
+    LABEL_METRICS,
+    PROJECT_METRICS,
+    SECTION_METRICS,
+    SNAPSHOT_METRICS,
+    TODOIST_API_BUDGET_REMAINING,
+    TODOIST_API_CACHE_ENTRIES,
+    TODOIST_API_CACHE_LOOKUPS,
+    TODOIST_API_ERRORS,
+    TODOIST_API_REQUEST_DURATION,
+    TODOIST_API_RESPONSE_SIZE,
+    TODOIST_API_THROTTLE_SECONDS,
+    TODOIST_COLLECTED_ITEMS,
+    TODOIST_COLLECTION_STAGE_DURATION,
+    TODOIST_COLLECTION_STAGE_LAST_SUCCESS,
+    TODOIST_COMMENTS_TOTAL,
+    TODOIST_DATA_AGE,
+    TODOIST_DROPPED_SERIES,
+    TODOIST_LABEL_TASKS,
+    TODOIST_METRICS_PUBLISHED_TIMESTAMP,
+    TODOIST_METRICS_STALE,
+    TODOIST_PRIORITY_TASKS,
+    TODOIST_PROJECT_COLLABORATORS,
+    TODOIST_RECURRING_TASKS,
+    TODOIST_SCRAPE_DURATION,
+    TODOIST_SECTION_TASKS,
+    TODOIST_SECTIONS_TOTAL,
+    TODOIST_SYNC_API_COMPLETED_TASKS,
+    TODOIST_TASK_AGE,
+    TODOIST_TASK_COMPLETION_LATENCY,
+    TODOIST_TASKS_COMPLETED_HOURS,
+    TODOIST_TASKS_COMPLETED_RATE,
+    TODOIST_TASKS_COMPLETED_TODAY,
+    TODOIST_TASKS_COMPLETED_WEEK,
+    TODOIST_TASKS_COMPLETED_WINDOW,
+    TODOIST_TASKS_DUE_TODAY,
+    TODOIST_TASKS_OVERDUE,
+    TODOIST_TASKS_TOTAL,
+    TODOIST_TASKS_WITH_DUE_DATE,
+)
+from prometheus_todoist_exporter.history import (
+    DAY_SECONDS,
+    CompletionHistory,
+    parse_duration,
+    rolling,
+    since_midnight,
+)
+from prometheus_todoist_exporter.metrics import (
+    CoalescingRefresh,
+    MetricSet,
+    MetricSpec,
+)
+from prometheus_todoist_exporter.persistence import load_state, save_state
+from prometheus_todoist_exporter.retention import Failure
+from prometheus_todoist_exporter.scheduler import Priority
+from prometheus_todoist_exporter.stages import stage_settings_from_env
+from prometheus_todoist_exporter.store import TaskStore
+from prometheus_todoist_exporter.webhooks import event_delta
+
+if TYPE_CHECKING:
+    from todoist_api_python.models import Section
+
+T = TypeVar("T")
+MetricT = TypeVar("MetricT", Counter, Gauge)
 
 # Configuration from environment variables
 TODOIST_API_TOKEN = os.environ.get("TODOIST_API_TOKEN")
-EXPORTER_PORT = int(os.environ.get("EXPORTER_PORT", "9090"))
-METRICS_PATH = os.environ.get("METRICS_PATH", "/metrics")
+TODOIST_ACCOUNTS_FILE = os.environ.get("TODOIST_ACCOUNTS_FILE")
 COLLECTION_INTERVAL = int(os.environ.get("COLLECTION_INTERVAL", "60"))
 COMPLETED_TASKS_DAYS = int(os.environ.get("COMPLETED_TASKS_DAYS", "7"))
 COMPLETED_TASKS_HOURS = int(os.environ.get("COMPLETED_TASKS_HOURS", "24"))
-
-# Initialize the Todoist API client
-api = TodoistAPI(TODOIST_API_TOKEN) if TODOIST_API_TOKEN else None
-
-# Define metrics
-TODOIST_TASKS_TOTAL = Gauge(
-    "todoist_tasks_total",
-    "Total number of active tasks",
-    ["project_name", "project_id"],
-)
-TODOIST_TASKS_OVERDUE = Gauge(
-    "todoist_tasks_overdue", "Number of overdue tasks", ["project_name", "project_id"]
-)
-TODOIST_TASKS_DUE_TODAY = Gauge(
-    "todoist_tasks_due_today",
-    "Number of tasks due today",
-    ["project_name", "project_id"],
-)
-TODOIST_PROJECT_COLLABORATORS = Gauge(
-    "todoist_project_collaborators",
-    "Number of collaborators per project",
-    ["project_name", "project_id"],
-)
-TODOIST_SECTIONS_TOTAL = Gauge(
-    "todoist_sections_total",
-    "Number of sections per project",
-    ["project_name", "project_id"],
-)
-TODOIST_COMMENTS_TOTAL = Gauge(
-    "todoist_comments_total",
-    "Number of comments",
-    ["project_name", "project_id"],
-)
-TODOIST_PRIORITY_TASKS = Gauge(
-    "todoist_priority_tasks",
-    "Number of tasks by priority",
-    ["project_name", "project_id", "priority"],
-)
-TODOIST_API_ERRORS = Counter(
-    "todoist_api_errors", "Number of API errors encountered", ["endpoint"]
-)
-TODOIST_SCRAPE_DURATION = Gauge(
-    "todoist_scrape_duration_seconds", "Time taken to collect Todoist metrics"
-)
-# New metrics for completed tasks in time spans (these will be manually tracked)
-TODOIST_TASKS_COMPLETED_TODAY = Gauge(
-    "todoist_tasks_completed_today",
-    "Number of tasks completed today (estimated)",
-    ["project_name", "project_id"],
+# Sliding windows of completed task counts and hourly completion rates
+COMPLETED_TASKS_WINDOWS = {
+    window.strip(): parse_duration(window)
+    for window in os.environ.get("COMPLETED_TASKS_WINDOWS", "1h,24h,7d,30d").split(",")
+    if window.strip()
+}
+# Width of the time buckets completions are counted in
+COMPLETION_BUCKET_SECONDS = 300
+INCREMENTAL_SYNC = os.environ.get("INCREMENTAL_SYNC", "false").lower() == "true"
+ASYNC_COLLECTION = os.environ.get("ASYNC_COLLECTION", "false").lower() == "true"
+# Optional collection stages to skip, and refresh intervals as stage=seconds pairs
+DISABLED_STAGES = os.environ.get("DISABLED_STAGES", "")
+STAGE_INTERVALS = os.environ.get("STAGE_INTERVALS", "")
+# Cardinality limits: top K values keep their own series, the rest become `other`
+PROJECT_LIMIT = DimensionLimit(
+    top_k=int(os.environ.get("TOP_PROJECTS", "0")),
+    allow=compile_pattern(os.environ.get("PROJECT_ALLOW_REGEX", "")),
+    deny=compile_pattern(os.environ.get("PROJECT_DENY_REGEX", "")),
 )
-TODOIST_TASKS_COMPLETED_WEEK = Gauge(
-    "todoist_tasks_completed_week",
-    "Number of tasks completed in the last N days (estimated)",
-    ["project_name", "project_id", "days"],
+LABEL_LIMIT = DimensionLimit(
+    top_k=int(os.environ.get("TOP_LABELS", "0")),
+    allow=compile_pattern(os.environ.get("LABEL_ALLOW_REGEX", "")),
+    deny=compile_pattern(os.environ.get("LABEL_DENY_REGEX", "")),
 )
-TODOIST_TASKS_COMPLETED_HOURS = Gauge(
-    "todoist_tasks_completed_hours",
-    "Number of tasks completed in the last N hours (estimated)",
-    ["project_name", "project_id", "hours"],
+SECTION_LIMIT = DimensionLimit(
+    top_k=int(os.environ.get("TOP_SECTIONS", "0")),
+    allow=compile_pattern(os.environ.get("SECTION_ALLOW_REGEX", "")),
+    deny=compile_pattern(os.environ.get("SECTION_DENY_REGEX", "")),
 )
-# New metrics for section-specific tasks
-TODOIST_SECTION_TASKS = Gauge(
-    "todoist_section_tasks",
-    "Number of tasks in a section",
-    ["project_name", "project_id", "section_name", "section_id"],
-)
-# New metrics for labels
-TODOIST_LABEL_TASKS = Gauge(
-    "todoist_label_tasks",
-    "Number of tasks with a specific label",
-    ["label_name"],
-)
-# New metric for tasks with due dates
-TODOIST_TASKS_WITH_DUE_DATE = Gauge(
-    "todoist_tasks_with_due_date",
-    "Number of tasks with a due date",
-    ["project_name", "project_id"],
-)
-# New metric for recurring tasks
-TODOIST_RECURRING_TASKS = Gauge(
-    "todoist_recurring_tasks",
-    "Number of recurring tasks",
-    ["project_name", "project_id"],
-)
-# New metric for task activity
-TODOIST_SYNC_API_COMPLETED_TASKS = Gauge(
-    "todoist_sync_api_completed_tasks",
-    "Number of tasks completed via Sync API",
-    ["project_name", "project_id", "timeframe"],
+MAX_SERIES_PER_FAMILY = int(os.environ.get("MAX_SERIES_PER_FAMILY", "0"))
+FETCH_WORKERS = int(os.environ.get("FETCH_WORKERS", "8"))
+API_RATE_LIMIT_REQUESTS = int(os.environ.get("API_RATE_LIMIT_REQUESTS", "450"))
+API_RATE_LIMIT_WINDOW = int(os.environ.get("API_RATE_LIMIT_WINDOW", "900"))
+API_MAX_RETRIES = int(os.environ.get("API_MAX_RETRIES", "3"))
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", str(max(10, FETCH_WORKERS))))
+API_CACHE_TTL = int(os.environ.get("API_CACHE_TTL", "300"))
+API_CACHE_MAX_ENTRIES = int(os.environ.get("API_CACHE_MAX_ENTRIES", "1024"))
+COLLECT_ON_SCRAPE = os.environ.get("COLLECT_ON_SCRAPE", "false").lower() == "true"
+SCRAPE_CACHE_TTL = int(os.environ.get("SCRAPE_CACHE_TTL", str(COLLECTION_INTERVAL)))
+# Seconds a collection cycle may run before /healthz reports the exporter stuck
+COLLECTION_STALL_TIMEOUT = int(
+    os.environ.get("COLLECTION_STALL_TIMEOUT", str(max(600, 10 * COLLECTION_INTERVAL)))
 )
+# Directory the last published metrics and sync state are persisted to
+STATE_DIR = os.environ.get("STATE_DIR", "")
+# Seconds the last good series of a family are served while its refresh fails
+MAX_DATA_STALENESS = int(os.environ.get("MAX_DATA_STALENESS", "3600"))
+# Seconds between collections of accounts kept fresh by webhooks, 0 for ten
+# times the collection interval
+WEBHOOK_RECONCILE_INTERVAL = int(os.environ.get("WEBHOOK_RECONCILE_INTERVAL", "0"))
+# Seconds webhook changes are gathered for before they are published together
+WEBHOOK_PUBLISH_DELAY = float(os.environ.get("WEBHOOK_PUBLISH_DELAY", "1"))
+
+# Maximum page size allowed by the completed tasks endpoint
+COMPLETED_TASKS_PAGE_SIZE = 200
+# Stages of one account that the asyncio engine runs at the same time
+CONCURRENT_STAGES = 5
+
+
+@dataclass
+class TodoistSnapshot:
+    """
+    Todoist data fetched once per collection cycle.
+
+    Every metric derivation step reads from the same snapshot, so each cycle
+    lists tasks exactly once and all counts are computed from consistent data.
+    """
+
+    projects: dict[str, dict[str, Any]] = field(default_factory=dict)
+    tasks: TaskStore = field(default_factory=TaskStore)
+    sections: list["Section"] = field(default_factory=list)
+    # None when completed tasks were not collected
+    completions: CompletionHistory | None = None
+    # Stages that failed, with the projects that failed or None for all of them
+    failures: dict[str, Failure] = field(default_factory=dict)
+
+
+# Endpoint and collection stage of the request or step running in this thread
+CURRENT_ENDPOINT: ContextVar[str | None] = ContextVar("endpoint", default=None)
+CURRENT_STAGE: ContextVar["CollectionStage | None"] = ContextVar("stage", default=None)
+
+
+class CollectionStage:
+    """
+    Context manager timing one stage of an account's collection cycle.
+
+    API errors recorded while the stage runs mark it as failed. A stage that
+    finishes without errors updates its last success timestamp.
+    """
+
+    def __init__(self, account: Account, name: str) -> None:
+        self.account = account
+        self.name = name
+        self.failed = False
+
+    def __enter__(self) -> "CollectionStage":
+        self._token = CURRENT_STAGE.set(self)
+        self._start = time.perf_counter()
+        return self
 
+    def __exit__(self, exc_type: type[BaseException] | None, *_: object) -> None:
+        labels = {"stage": self.name, **self.account.labels}
+        TODOIST_COLLECTION_STAGE_DURATION.labels(**labels).observe(
+            time.perf_counter() - self._start
+        )
+        CURRENT_STAGE.reset(self._token)
+        if exc_type is None and not self.failed:
+            TODOIST_COLLECTION_STAGE_LAST_SUCCESS.labels(**labels).set_to_current_time()
+
+
+def record_api_error(account: Account, endpoint: str) -> None:
+    """Count an API error and mark the running collection stage as failed."""
+    TODOIST_API_ERRORS.labels(endpoint=endpoint, **account.labels).inc()
+    stage = CURRENT_STAGE.get()
+    if stage:
+        stage.failed = True
+
+
+def account_metric(metric: MetricT, account: Account) -> MetricT:
+    """Return the child of a metric that only has the account label."""
+    return metric.labels(**account.labels) if account.labels else metric
+
+
+def instrument_account(account: Account) -> None:
+    """Expose the rate limit budget, throttle time, cache use, sizes and data age."""
+    account_metric(TODOIST_API_BUDGET_REMAINING, account).set_function(
+        lambda: account.scheduler.bucket.remaining
+    )
+    account.scheduler.on_throttle = account_metric(
+        TODOIST_API_THROTTLE_SECONDS, account
+    ).inc
+    account_metric(TODOIST_API_CACHE_ENTRIES, account).set_function(
+        lambda: len(account.cache)
+    )
+
+    def record_lookup(endpoint: str, result: str) -> None:
+        TODOIST_API_CACHE_LOOKUPS.labels(
+            endpoint=endpoint, result=result, **account.labels
+        ).inc()
+
+    account.cache.on_lookup = record_lookup
+
+    def record_response_size(response: requests.Response, **_: object) -> None:
+        # Responses answered by the cache were not transferred again
+        if getattr(response, "from_cache", False):
+            return
+        endpoint = CURRENT_ENDPOINT.get() or endpoint_name(response.url)
+        TODOIST_API_RESPONSE_SIZE.labels(endpoint=endpoint, **account.labels).observe(
+            len(response.content)
+        )
+
+    account.session.hooks["response"].append(record_response_size)
+
+    for spec in enabled_metrics(account):
+        TODOIST_DATA_AGE.labels(family=spec.name, **account.labels).set_function(
+            partial(account.retention.age, spec.name)
+        )
 
-def collect_projects() -> dict[str, dict[str, Any]]:
+
+def api_request(
+    account: Account,
+    endpoint: str,
+    request: Callable[[], T],
+    priority: Priority = Priority.HIGH,
+) -> T:
+    """Send a request through the account's scheduler and record its latency."""
+
+    def timed_request() -> T:
+        token = CURRENT_ENDPOINT.set(endpoint)
+        try:
+            with TODOIST_API_REQUEST_DURATION.labels(
+                endpoint=endpoint, **account.labels
+            ).time():
+                return request()
+        finally:
+            CURRENT_ENDPOINT.reset(token)
+
+    return account.scheduler.call(timed_request, priority)
+
+
+def fetch_per_project(
+    account: Account,
+    projects_dict: dict[str, dict[str, Any]],
+    endpoint: str,
+    fetch: Callable[..., list[Any]],
+    executor: ThreadPoolExecutor | None = None,
+) -> dict[str, list[Any]]:
+    """
+    Call an API method once per project using a bounded pool of workers.
+
+    Returns the results keyed by project ID. Projects whose request failed are
+    left out and counted in TODOIST_API_ERRORS under the given endpoint. An
+    executor shared by concurrent calls bounds their requests together.
+    """
+
+    def timed_fetch(project_id: str) -> list[Any]:
+        return api_request(
+            account, endpoint, partial(fetch, project_id=project_id), Priority.LOW
+        )
+
+    results = {}
+    pool = executor or ThreadPoolExecutor(max_workers=FETCH_WORKERS)
+    with nullcontext(pool) if executor else pool:
+        futures = {
+            pool.submit(timed_fetch, project_id): project_id
+            for project_id in projects_dict
+        }
+        for future in as_completed(futures):
+            project_id = futures[future]
+            try:
+                results[project_id] = future.result()
+            except Exception as error:
+                print(f"Error fetching {endpoint} for project {project_id}: {error}")
+                record_api_error(account, endpoint)
+    return results
+
+
+def collect_projects(account: Account) -> dict[str, dict[str, Any]]:
     """Collect projects and return a dict mapping project_id to project details."""
     projects_dict = {}
     try:
-        projects = api.get_projects()
+        projects = api_request(account, "get_projects", account.api.get_projects)
         for project in projects:
             projects_dict[project.id] = {
                 "id": project.id,
@@ -123,353 +332,1078 @@ def collect_projects() -> dict[str, dict[str, Any]]:
             }
     except Exception as error:
         print(f"Error fetching projects: {error}")
-        TODOIST_API_ERRORS.labels(endpoint="get_projects").inc()
+        record_api_error(account, "get_projects")
     return projects_dict
 
 
-def collect_tasks(projects_dict: dict[str, dict[str, Any]]) -> None:
-    """Collect tasks and organize them by project."""
+def fetch_tasks(account: Account) -> TaskStore:
+    """Fetch all active tasks into a compact store and track their ages."""
+    store = TaskStore()
     try:
-        tasks = api.get_tasks()
-        for task in tasks:
-            project_id = task.project_id
-            if project_id in projects_dict:
-                projects_dict[project_id]["tasks"].append(task)
+        for task in api_request(account, "get_tasks", account.api.get_tasks):
+            store.add_task(task)
     except Exception as error:
         print(f"Error fetching tasks: {error}")
-        TODOIST_API_ERRORS.labels(endpoint="get_tasks").inc()
+        record_api_error(account, "get_tasks")
+        return TaskStore()
+    account.task_ages.replace(store)
+    return store
 
 
-def collect_collaborators(projects_dict: dict[str, dict[str, Any]]) -> None:
-    """Collect collaborators for each project."""
+def attach_tasks(projects_dict: dict[str, dict[str, Any]], store: TaskStore) -> None:
+    """Point every project at the records of its tasks."""
     for project_id, project_data in projects_dict.items():
-        try:
-            collaborators = api.get_collaborators(project_id=project_id)
-            project_data["collaborators"] = collaborators
-        except Exception as error:
-            print(f"Error fetching collaborators for project {project_id}: {error}")
-            TODOIST_API_ERRORS.labels(endpoint="get_collaborators").inc()
+        project_data["tasks"] = store.project_tasks(project_id)
+
+
+def collect_tasks(
+    account: Account, projects_dict: dict[str, dict[str, Any]]
+) -> TaskStore:
+    """Collect tasks into a compact store and attach them to their projects."""
+    store = fetch_tasks(account)
+    attach_tasks(projects_dict, store)
+    return store
+
+
+def fetch_collaborators(
+    account: Account,
+    projects_dict: dict[str, dict[str, Any]],
+    executor: ThreadPoolExecutor | None = None,
+) -> dict[str, list[Any]]:
+    """Fetch the collaborators of every project."""
+    return fetch_per_project(
+        account,
+        projects_dict,
+        "get_collaborators",
+        account.api.get_collaborators,
+        executor,
+    )
 
 
-def collect_sections(projects_dict: dict[str, dict[str, Any]]) -> None:
-    """Collect sections for each project."""
+def collect_collaborators(
+    account: Account,
+    projects_dict: dict[str, dict[str, Any]],
+    executor: ThreadPoolExecutor | None = None,
+) -> None:
+    """Collect collaborators for each project."""
+    results = fetch_collaborators(account, projects_dict, executor)
+    for project_id, collaborators in results.items():
+        projects_dict[project_id]["collaborators"] = collaborators
+
+
+def fetch_sections(account: Account) -> list["Section"]:
+    """Fetch the sections of all projects."""
     try:
-        all_sections = api.get_sections()
-        for section in all_sections:
-            project_id = section.project_id
-            if project_id in projects_dict:
-                projects_dict[project_id]["sections"].append(section)
+        return api_request(account, "get_sections", account.api.get_sections)
     except Exception as error:
         print(f"Error fetching sections: {error}")
-        TODOIST_API_ERRORS.labels(endpoint="get_sections").inc()
+        record_api_error(account, "get_sections")
+        return []
+
+
+def attach_sections(
+    projects_dict: dict[str, dict[str, Any]], sections: list["Section"]
+) -> None:
+    """Add every section to the project it belongs to."""
+    for section in sections:
+        project_id = section.project_id
+        if project_id in projects_dict:
+            projects_dict[project_id]["sections"].append(section)
+
+
+def collect_sections(
+    account: Account, projects_dict: dict[str, dict[str, Any]]
+) -> list["Section"]:
+    """Collect sections for each project and return the full section list."""
+    all_sections = fetch_sections(account)
+    attach_sections(projects_dict, all_sections)
+    return all_sections
+
+
+def fetch_comments(
+    account: Account,
+    projects_dict: dict[str, dict[str, Any]],
+    executor: ThreadPoolExecutor | None = None,
+) -> dict[str, list[Any]]:
+    """Fetch the comments of every project."""
+    return fetch_per_project(
+        account, projects_dict, "get_comments", account.api.get_comments, executor
+    )
 
 
-def collect_comments(projects_dict: dict[str, dict[str, Any]]) -> None:
+def collect_comments(
+    account: Account,
+    projects_dict: dict[str, dict[str, Any]],
+    executor: ThreadPoolExecutor | None = None,
+) -> None:
     """Collect comments for each project."""
+    results = fetch_comments(account, projects_dict, executor)
+    for project_id, project_comments in results.items():
+        projects_dict[project_id]["comments"] = project_comments
+
+
+def fetch_completed_items(
+    account: Account, since: datetime
+) -> list[dict[str, Any]] | None:
+    """
+    Fetch every task completed since the given time from the Sync API.
+
+    Follows the offset pagination of completed/get_all until a short page is
+    returned. Returns None when any page fails, so that truncated results are
+    never reported as counts.
+    """
+    items = []
+    offset = 0
+    while True:
+        params = {
+            "since": since.strftime("%Y-%m-%dT%H:%M:%S"),
+            "limit": COMPLETED_TASKS_PAGE_SIZE,
+            "offset": offset,
+        }
+
+        response = api_request(
+            account,
+            "sync_completed_tasks",
+            partial(
+                account.session.post,
+                "https://api.todoist.com/sync/v9/completed/get_all",
+                headers={"Authorization": f"Bearer {account.token}"},
+                json=params,
+                timeout=60,
+            ),
+        )
+
+        if response.status_code != HTTPStatus.OK:
+            print(
+                f"Error fetching completed tasks from Sync API: {response.status_code}"
+            )
+            record_api_error(account, "sync_completed_tasks")
+            return None
+
+        page = response.json().get("items", [])
+        items.extend(page)
+        if len(page) < COMPLETED_TASKS_PAGE_SIZE:
+            return items
+        offset += len(page)
+
+
+def completion_history(account: Account) -> CompletionHistory:
+    """
+    The completion history of an account, created on first use.
+
+    Besides the sliding COMPLETED_TASKS_WINDOWS it counts the timeframes of
+    the original metrics: today, the last COMPLETED_TASKS_DAYS days since
+    midnight and the last COMPLETED_TASKS_HOURS hours.
+    """
+    if account.completions is None:
+        windows = {
+            "today": since_midnight(),
+            f"{COMPLETED_TASKS_DAYS}_days": since_midnight(COMPLETED_TASKS_DAYS),
+            f"{COMPLETED_TASKS_HOURS}_hours": rolling(COMPLETED_TASKS_HOURS * 3600),
+        }
+        sliding = {window: parse_duration(window) for window in COMPLETED_TASKS_WINDOWS}
+        windows.update(
+            (window, rolling(seconds)) for window, seconds in sliding.items()
+        )
+        span = max(
+            (COMPLETED_TASKS_DAYS + 1) * DAY_SECONDS,
+            COMPLETED_TASKS_HOURS * 3600,
+            *sliding.values(),
+        )
+        account.completions = CompletionHistory(
+            windows, span, bucket_seconds=COMPLETION_BUCKET_SECONDS
+        )
+    return account.completions
+
+
+def fetch_completed_tasks(account: Account) -> CompletionHistory | None:
+    """
+    Record the tasks completed since the last collection in the history.
+
+    The first collection fetches the whole span of the history, later ones
+    only the completions after its high water mark.
+    """
+    history = completion_history(account)
+    try:
+        items = fetch_completed_items(account, history.fetch_since())
+    except Exception as error:
+        print(f"Error fetching completed tasks from Sync API: {error}")
+        record_api_error(account, "sync_completed_tasks")
+        return None
+    if items is None:
+        return None
+    account.task_ages.record_completions(items)
+    TODOIST_COLLECTED_ITEMS.labels(resource="completed_tasks", **account.labels).set(
+        history.record(items)
+    )
+    return history
+
+
+def count_completed_tasks(
+    projects_dict: dict[str, dict[str, Any]],
+    history: CompletionHistory,
+    metrics: MetricSet,
+) -> None:
+    """Read the completed tasks of every window per project and set the metrics."""
+    history.advance()
+    timeframes = {
+        "today": (TODOIST_TASKS_COMPLETED_TODAY, {}),
+        f"{COMPLETED_TASKS_DAYS}_days": (
+            TODOIST_TASKS_COMPLETED_WEEK,
+            {"days": str(COMPLETED_TASKS_DAYS)},
+        ),
+        f"{COMPLETED_TASKS_HOURS}_hours": (
+            TODOIST_TASKS_COMPLETED_HOURS,
+            {"hours": str(COMPLETED_TASKS_HOURS)},
+        ),
+    }
+
     for project_id, project_data in projects_dict.items():
-        try:
-            project_comments = api.get_comments(project_id=project_id)
-            project_data["comments"] = project_comments
-        except Exception as error:
-            print(f"Error fetching comments for project {project_id}: {error}")
-            TODOIST_API_ERRORS.labels(endpoint="get_comments").inc()
+        labels = {"project_name": project_data["name"], "project_id": project_id}
+        for timeframe, (spec, extra_labels) in timeframes.items():
+            count = history.count(timeframe, project_id)
+            metrics.set(
+                TODOIST_SYNC_API_COMPLETED_TASKS, count, timeframe=timeframe, **labels
+            )
+            # Also update the traditional metrics for backward compatibility
+            metrics.set(spec, count, **extra_labels, **labels)
+        for window in COMPLETED_TASKS_WINDOWS:
+            metrics.set(
+                TODOIST_TASKS_COMPLETED_WINDOW,
+                history.count(window, project_id),
+                window=window,
+                **labels,
+            )
 
+    # Rates cover completions in every project, including unknown ones
+    for window, seconds in COMPLETED_TASKS_WINDOWS.items():
+        metrics.set(
+            TODOIST_TASKS_COMPLETED_RATE,
+            sum(history.counts(window).values()) * 3600 / seconds,
+            window=window,
+        )
 
-def collect_completed_tasks_sync_api(projects_dict: dict[str, dict[str, Any]]) -> None:
+
+def collect_completed_tasks_sync_api(
+    account: Account, projects_dict: dict[str, dict[str, Any]], metrics: MetricSet
+) -> None:
     """
     Collect completed tasks using the Sync API directly.
 
     The REST API does not support completed tasks, so we use the Sync API directly.
     """
-    if not TODOIST_API_TOKEN:
-        return
+    # Fetch new completions into the history and count every window from it
+    history = fetch_completed_tasks(account)
+    if history is not None:
+        count_completed_tasks(projects_dict, history, metrics)
 
-    now = datetime.now(UTC)
-    today_start = datetime(now.year, now.month, now.day, tzinfo=UTC)
-    week_start = today_start - timedelta(days=COMPLETED_TASKS_DAYS)
-    hours_start = now - timedelta(hours=COMPLETED_TASKS_HOURS)
 
-    # Format dates for API calls
-    since_timestamps = {
-        "today": today_start.strftime("%Y-%m-%dT%H:%M:%S"),
-        f"{COMPLETED_TASKS_DAYS}_days": week_start.strftime("%Y-%m-%dT%H:%M:%S"),
-        f"{COMPLETED_TASKS_HOURS}_hours": hours_start.strftime("%Y-%m-%dT%H:%M:%S"),
-    }
+def collect_task_histograms(
+    projects_dict: dict[str, dict[str, Any]], ages: TaskAges, metrics: MetricSet
+) -> None:
+    """Set the task age and completion latency histograms of every project."""
+    now = time.time()
+    for project_id, project_data in projects_dict.items():
+        labels = {"project_name": project_data["name"], "project_id": project_id}
+        metrics.set(TODOIST_TASK_AGE, ages.age(project_id, now), **labels)
+        metrics.set(TODOIST_TASK_COMPLETION_LATENCY, ages.latency(project_id), **labels)
 
-    # Initialize counters for each project and timeframe
-    completed_counts = {
-        project_id: dict.fromkeys(since_timestamps.keys(), 0)
-        for project_id in projects_dict
-    }
 
-    # Map project name to ID for quick lookup
-    project_names = {
-        project_id: data["name"] for project_id, data in projects_dict.items()
-    }
+def collect_label_metrics(counts: TaskCounts, metrics: MetricSet) -> None:
+    """Collect metrics for tasks with labels."""
+    for label, count in counts.labels.items():
+        metrics.set(TODOIST_LABEL_TASKS, count, label_name=label)
+
+
+def collect_section_tasks(
+    projects_dict: dict[str, dict[str, Any]], counts: TaskCounts, metrics: MetricSet
+) -> None:
+    """Collect metrics for tasks in each section."""
+    for project_id, project_data in projects_dict.items():
+        for section in project_data["sections"]:
+            count = counts.sections.get(section.id)
+            if count:
+                metrics.set(
+                    TODOIST_SECTION_TASKS,
+                    count,
+                    project_name=project_data["name"],
+                    project_id=project_id,
+                    section_name=section.name,
+                    section_id=section.id,
+                )
+
 
+def collect_project_metrics(
+    projects_dict: dict[str, dict[str, Any]], counts: TaskCounts, metrics: MetricSet
+) -> None:
+    """Collect task, collaborator, section and comment metrics per project."""
+    for project_id, project_data in projects_dict.items():
+        labels = {"project_name": project_data["name"], "project_id": project_id}
+        project_counts = counts.project(project_id)
+
+        metrics.set(TODOIST_TASKS_TOTAL, project_counts.total, **labels)
+        for priority, count in project_counts.priorities.items():
+            metrics.set(TODOIST_PRIORITY_TASKS, count, priority=str(priority), **labels)
+        metrics.set(TODOIST_TASKS_OVERDUE, project_counts.overdue, **labels)
+        metrics.set(TODOIST_TASKS_DUE_TODAY, project_counts.due_today, **labels)
+        metrics.set(TODOIST_TASKS_WITH_DUE_DATE, project_counts.with_due_date, **labels)
+        metrics.set(TODOIST_RECURRING_TASKS, project_counts.recurring, **labels)
+
+        metrics.set(
+            TODOIST_PROJECT_COLLABORATORS, len(project_data["collaborators"]), **labels
+        )
+        metrics.set(TODOIST_SECTIONS_TOTAL, len(project_data["sections"]), **labels)
+        metrics.set(TODOIST_COMMENTS_TOTAL, len(project_data["comments"]), **labels)
+
+
+def collect_snapshot_incremental(account: Account) -> TodoistSnapshot | None:
+    """
+    Update the account's local Sync API state and build a snapshot from it.
+
+    When the sync fails after an earlier one succeeded, the snapshot is built
+    from the last synced state and every stage the sync replaces is marked
+    as failed, so its families age and are bounded by MAX_DATA_STALENESS.
+    """
+    sync_state = account.sync_state
+    failures: dict[str, Failure] = {}
     try:
-        # Use Sync API directly since REST API doesn't support completed tasks
-        for timeframe, since in since_timestamps.items():
-            params = {
-                "since": since,
-                "limit": 200,  # Maximum allowed by the API
-            }
+        with TODOIST_API_REQUEST_DURATION.labels(
+            endpoint="sync", **account.labels
+        ).time():
+            sync_state.sync()
+    except Exception as error:
+        print(f"Error running incremental sync for account {account.name}: {error}")
+        record_api_error(account, "sync")
+        if not sync_state.is_synced:
+            return None
+        failures = {stage.name: None for stage in STAGES if stage.in_sync}
+
+    projects_dict, tasks, sections = sync_state.build_projects()
+    if not projects_dict:
+        return None
+    return TodoistSnapshot(
+        projects=projects_dict, tasks=tasks, sections=sections, failures=failures
+    )
 
-            response = requests.post(
-                "https://api.todoist.com/sync/v9/completed/get_all",
-                headers={"Authorization": f"Bearer {TODOIST_API_TOKEN}"},
-                json=params,
-                timeout=60,
+
+def apply_per_project(resource: str) -> Callable[[TodoistSnapshot, dict], None]:
+    """Build a Stage.apply storing per-project results under a project key."""
+
+    def apply(snapshot: TodoistSnapshot, results: dict[str, list[Any]]) -> None:
+        for project_id, values in results.items():
+            if project_id in snapshot.projects:
+                snapshot.projects[project_id][resource] = values
+
+    return apply
+
+
+def apply_tasks(snapshot: TodoistSnapshot, store: TaskStore) -> None:
+    snapshot.tasks = store
+    attach_tasks(snapshot.projects, store)
+
+
+def apply_sections(snapshot: TodoistSnapshot, sections: list["Section"]) -> None:
+    snapshot.sections = sections
+    attach_sections(snapshot.projects, sections)
+
+
+def apply_completions(snapshot: TodoistSnapshot, history: CompletionHistory) -> None:
+    snapshot.completions = history
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    An optional stage of a collection cycle and the metric families it feeds.
+
+    fetch(account, projects_dict, executor) downloads the data of the stage
+    and apply(snapshot, result) adds it to the snapshot of the cycle. Stages
+    whose fetch() reads the projects run once projects are known. When a
+    stage is disabled its families are not exported.
+    """
+
+    name: str
+    fetch: Callable[..., Any]
+    apply: Callable[[TodoistSnapshot, Any], None]
+    families: tuple[MetricSpec, ...]
+    needs_projects: bool = False
+    # Whether the Sync API already returns the data of the stage
+    in_sync: bool = True
+
+
+STAGES = (
+    Stage(
+        "tasks",
+        lambda account, _projects, _executor: fetch_tasks(account),
+        apply_tasks,
+        families=(
+            TODOIST_TASKS_TOTAL,
+            TODOIST_TASKS_OVERDUE,
+            TODOIST_TASKS_DUE_TODAY,
+            TODOIST_PRIORITY_TASKS,
+            TODOIST_TASKS_WITH_DUE_DATE,
+            TODOIST_RECURRING_TASKS,
+            TODOIST_LABEL_TASKS,
+            TODOIST_SECTION_TASKS,
+            TODOIST_TASK_AGE,
+        ),
+    ),
+    Stage(
+        "collaborators",
+        fetch_collaborators,
+        apply_per_project("collaborators"),
+        families=(TODOIST_PROJECT_COLLABORATORS,),
+        needs_projects=True,
+    ),
+    Stage(
+        "sections",
+        lambda account, _projects, _executor: fetch_sections(account),
+        apply_sections,
+        families=(TODOIST_SECTIONS_TOTAL, TODOIST_SECTION_TASKS),
+    ),
+    Stage(
+        "comments",
+        fetch_comments,
+        apply_per_project("comments"),
+        families=(TODOIST_COMMENTS_TOTAL,),
+        needs_projects=True,
+    ),
+    Stage(
+        "completed_tasks",
+        lambda account, _projects, _executor: fetch_completed_tasks(account),
+        apply_completions,
+        families=(
+            TODOIST_TASKS_COMPLETED_TODAY,
+            TODOIST_TASKS_COMPLETED_WEEK,
+            TODOIST_TASKS_COMPLETED_HOURS,
+            TODOIST_SYNC_API_COMPLETED_TASKS,
+            TODOIST_TASKS_COMPLETED_WINDOW,
+            TODOIST_TASKS_COMPLETED_RATE,
+            TODOIST_TASK_COMPLETION_LATENCY,
+        ),
+        in_sync=False,
+    ),
+)
+
+
+def enabled_metrics(account: Account) -> tuple[MetricSpec, ...]:
+    """Snapshot metric families not fed by a disabled stage of the account."""
+    disabled = {
+        family
+        for stage in STAGES
+        if not account.stage_results.is_enabled(stage.name)
+        for family in stage.families
+    }
+    return tuple(spec for spec in SNAPSHOT_METRICS if spec not in disabled)
+
+
+def run_collection_stage(
+    account: Account,
+    stage: Stage,
+    projects_dict: dict[str, dict[str, Any]],
+    executor: ThreadPoolExecutor | None = None,
+) -> tuple[Any | None, bool]:
+    """
+    Fetch the data of a stage, or None if the stage is disabled.
+
+    Returns the data together with whether any request of the stage failed.
+    Within the refresh interval of the stage, its last successful result is
+    returned without sending any requests.
+    """
+    results = account.stage_results
+    if not results.is_enabled(stage.name):
+        return None, False
+    result = results.fresh(stage.name)
+    if result is not None:
+        return result, False
+    with CollectionStage(account, stage.name) as running:
+        result = stage.fetch(account, projects_dict, executor)
+    # Partial results of a failed stage are used once but never reused
+    if not running.failed:
+        results.store(stage.name, result)
+    return result, running.failed
+
+
+def apply_stage(
+    snapshot: TodoistSnapshot, stage: Stage, result: object, failed: bool
+) -> None:
+    """Add the result of a stage to a snapshot and record whether it failed."""
+    if result is not None:
+        stage.apply(snapshot, result)
+    if failed:
+        # Per-project stages only leave out the projects whose request failed
+        snapshot.failures[stage.name] = (
+            set(snapshot.projects) - set(result) if stage.needs_projects else None
+        )
+
+
+def collect_stages(
+    account: Account,
+    snapshot: TodoistSnapshot,
+    stages: tuple[Stage, ...],
+) -> None:
+    """Run stages one after another and apply their results to the snapshot."""
+    for stage in stages:
+        result, failed = run_collection_stage(account, stage, snapshot.projects)
+        apply_stage(snapshot, stage, result, failed)
+
+
+def collect_snapshot(account: Account) -> TodoistSnapshot | None:
+    """Fetch all Todoist data needed for one collection cycle of an account."""
+    if account.sync_state:
+        with CollectionStage(account, "sync"):
+            snapshot = collect_snapshot_incremental(account)
+        if snapshot is not None:
+            collect_stages(
+                account, snapshot, tuple(stage for stage in STAGES if not stage.in_sync)
             )
+        return snapshot
 
-            if response.status_code == HTTPStatus.OK:
-                completed_data = response.json()
-                for item in completed_data.get("items", []):
-                    project_id = item.get("project_id")
-                    if project_id and project_id in completed_counts:
-                        completed_counts[project_id][timeframe] += 1
-            else:
-                print(
-                    f"Error fetching completed tasks from Sync API: "
-                    f"{response.status_code}"
-                )
-                TODOIST_API_ERRORS.labels(endpoint="sync_completed_tasks").inc()
-
-        # Set metrics for each project and timeframe
-        for project_id, timeframes in completed_counts.items():
-            project_name = project_names.get(project_id, "unknown")
-            for timeframe, count in timeframes.items():
-                TODOIST_SYNC_API_COMPLETED_TASKS.labels(
-                    project_name=project_name,
-                    project_id=project_id,
-                    timeframe=timeframe,
-                ).set(count)
-
-                # Also update the traditional metrics for backward compatibility
-                if timeframe == "today":
-                    TODOIST_TASKS_COMPLETED_TODAY.labels(
-                        project_name=project_name, project_id=project_id
-                    ).set(count)
-                elif timeframe == f"{COMPLETED_TASKS_DAYS}_days":
-                    TODOIST_TASKS_COMPLETED_WEEK.labels(
-                        project_name=project_name,
-                        project_id=project_id,
-                        days=str(COMPLETED_TASKS_DAYS),
-                    ).set(count)
-                elif timeframe == f"{COMPLETED_TASKS_HOURS}_hours":
-                    TODOIST_TASKS_COMPLETED_HOURS.labels(
-                        project_name=project_name,
-                        project_id=project_id,
-                        hours=str(COMPLETED_TASKS_HOURS),
-                    ).set(count)
+    with CollectionStage(account, "projects"):
+        projects_dict = collect_projects(account)
+    if not projects_dict:
+        return None
 
-    except Exception as error:
-        print(f"Error fetching completed tasks from Sync API: {error}")
-        TODOIST_API_ERRORS.labels(endpoint="sync_completed_tasks").inc()
+    snapshot = TodoistSnapshot(projects=projects_dict)
+    collect_stages(account, snapshot, STAGES)
+    return snapshot
 
 
-def collect_label_metrics() -> None:
-    """Collect metrics for tasks with labels."""
-    try:
-        # Reset metrics
-        TODOIST_LABEL_TASKS.clear()
+def limit_cardinality(
+    projects_dict: dict[str, dict[str, Any]], counts: TaskCounts, metrics: MetricSet
+) -> None:
+    """
+    Bound the number of series of families labelled by free-text names.
 
-        # Get all tasks
-        tasks = api.get_tasks()
+    Sections and labels are ranked by their task counts and projects by their
+    total tasks. Series that are dropped or summed into `other` are reported
+    in TODOIST_DROPPED_SERIES.
+    """
+    dropped: collections.Counter = collections.Counter()
+    dimensions = []
+    if not SECTION_LIMIT.is_unbounded:
+        weights = {
+            (section.name, section.id): counts.sections.get(section.id, 0)
+            for project_data in projects_dict.values()
+            for section in project_data["sections"]
+        }
+        dimensions.append(
+            (SECTION_METRICS, ("section_name", "section_id"), SECTION_LIMIT, weights)
+        )
+    if not LABEL_LIMIT.is_unbounded:
+        weights = {(label,): count for label, count in counts.labels.items()}
+        dimensions.append((LABEL_METRICS, ("label_name",), LABEL_LIMIT, weights))
+    if not PROJECT_LIMIT.is_unbounded:
+        weights = {
+            (project_data["name"], project_id): counts.project(project_id).total
+            for project_id, project_data in projects_dict.items()
+        }
+        dimensions.append(
+            (PROJECT_METRICS, ("project_name", "project_id"), PROJECT_LIMIT, weights)
+        )
 
-        # Count tasks per label
-        label_counts = {}
-        for task in tasks:
-            for label in task.labels:
-                if label not in label_counts:
-                    label_counts[label] = 0
-                label_counts[label] += 1
+    for specs, labelnames, limit, weights in dimensions:
+        kept = limit.select(weights)
+        for spec in specs:
+            limit_dimension(metrics, spec, labelnames, limit, kept, dropped)
+    if MAX_SERIES_PER_FAMILY:
+        for spec in SNAPSHOT_METRICS:
+            cap_series(metrics, spec, MAX_SERIES_PER_FAMILY, dropped)
+
+    for (family, reason), count in dropped.items():
+        metrics.set(TODOIST_DROPPED_SERIES, count, family=family, reason=reason)
+
+
+def record_collected_items(account: Account, snapshot: TodoistSnapshot) -> None:
+    """Report how many items of each resource the cycle processed."""
+    projects = snapshot.projects.values()
+    counts = {
+        "projects": len(snapshot.projects),
+        "tasks": len(snapshot.tasks),
+        "sections": len(snapshot.sections),
+        "collaborators": sum(len(project["collaborators"]) for project in projects),
+        "comments": sum(len(project["comments"]) for project in projects),
+    }
+    for resource, count in counts.items():
+        TODOIST_COLLECTED_ITEMS.labels(resource=resource, **account.labels).set(count)
+
+
+def family_failures(failures: dict[str, Failure]) -> dict[MetricSpec, Failure]:
+    """Failed projects of every family fed by a failed stage, None for all."""
+    families: dict[MetricSpec, Failure] = {}
+    for stage in STAGES:
+        if stage.name not in failures:
+            continue
+        failed = failures[stage.name]
+        for family in stage.families:
+            known = families.get(family, set())
+            families[family] = (
+                None if failed is None or known is None else known | failed
+            )
+    return families
 
-        # Set metrics for each label
-        for label, count in label_counts.items():
-            TODOIST_LABEL_TASKS.labels(label_name=label).set(count)
 
-    except Exception as error:
-        print(f"Error collecting label metrics: {error}")
-        TODOIST_API_ERRORS.labels(endpoint="get_label_metrics").inc()
+def publish_snapshot(
+    account: Account, snapshot: TodoistSnapshot, metrics: MetricSet
+) -> None:
+    """
+    Derive the task metrics of a snapshot, then publish and persist the set.
 
+    Collections and webhook updates of an account publish one at a time.
+    """
+    with account.publish_lock:
+        record_collected_items(account, snapshot)
+        projects_dict = snapshot.projects
+
+        # Count every task-derived dimension in a single pass over the tasks
+        with CollectionStage(account, "aggregation"):
+            today = datetime.now(UTC).strftime("%Y-%m-%d")
+            counts = aggregate_tasks(snapshot.tasks, today)
+            if snapshot.completions is not None:
+                count_completed_tasks(projects_dict, snapshot.completions, metrics)
+            collect_label_metrics(counts, metrics)
+            collect_section_tasks(projects_dict, counts, metrics)
+            collect_project_metrics(projects_dict, counts, metrics)
+            collect_task_histograms(projects_dict, account.task_ages, metrics)
+            limit_cardinality(projects_dict, counts, metrics)
+            # Keep the last good series of families whose refresh failed
+            account.retention.retain(
+                COLLECTOR.published(account.name),
+                metrics,
+                family_failures(snapshot.failures),
+            )
 
-def collect_section_tasks(projects_dict: dict[str, dict[str, Any]]) -> None:
-    """Collect metrics for tasks in each section."""
+        # Publishing renders the metric families served to scrapes
+        with CollectionStage(account, "publish"):
+            COLLECTOR.publish(metrics, source=account.name)
+            account.progress.published = True
+            account_metric(TODOIST_METRICS_STALE, account).set(0)
+            account_metric(
+                TODOIST_METRICS_PUBLISHED_TIMESTAMP, account
+            ).set_to_current_time()
+
+        if STATE_DIR:
+            with CollectionStage(account, "persist") as stage:
+                try:
+                    save_account_state(account, metrics)
+                except OSError as error:
+                    print(f"Error saving state of account {account.name}: {error}")
+                    stage.failed = True
+
+
+def publish_retained(account: Account) -> None:
+    """
+    Republish the last good metrics of an account whose collection failed.
+
+    Every family counts as failed, so its series are dropped once they are
+    older than MAX_DATA_STALENESS instead of being served forever.
+    """
+    with account.publish_lock:
+        previous = COLLECTOR.published(account.name)
+        if previous is None:
+            return
+        metrics = MetricSet(enabled_metrics(account), const_labels=account.labels)
+        account.retention.retain(previous, metrics, dict.fromkeys(metrics.specs))
+        COLLECTOR.publish(metrics, source=account.name)
+
+
+@contextmanager
+def track_cycle(account: Account) -> Iterator[None]:
+    """Mark a collection cycle of an account as running for health checks."""
+    account.progress.running_since = time.monotonic()
     try:
-        # Reset metrics
-        TODOIST_SECTION_TASKS.clear()
-
-        # Get all tasks
-        tasks = api.get_tasks()
-
-        # Build section lookup dict
-        sections_by_id = {}
-        for project_id, project_data in projects_dict.items():
-            for section in project_data["sections"]:
-                sections_by_id[section.id] = {
-                    "project_id": project_id,
-                    "project_name": project_data["name"],
-                    "section_name": section.name,
-                }
-
-        # Count tasks per section
-        section_counts = {}
-        for task in tasks:
-            if task.section_id and task.section_id in sections_by_id:
-                if task.section_id not in section_counts:
-                    section_counts[task.section_id] = 0
-                section_counts[task.section_id] += 1
-
-        # Set metrics for each section
-        for section_id, count in section_counts.items():
-            section_info = sections_by_id[section_id]
-            TODOIST_SECTION_TASKS.labels(
-                project_name=section_info["project_name"],
-                project_id=section_info["project_id"],
-                section_name=section_info["section_name"],
-                section_id=section_id,
-            ).set(count)
+        yield
+    finally:
+        account.progress.running_since = None
 
-    except Exception as error:
-        print(f"Error collecting section task metrics: {error}")
-        TODOIST_API_ERRORS.labels(endpoint="get_section_tasks").inc()
 
+def collect_metrics(account: Account) -> None:
+    """
+    Collect all Todoist metrics of an account and publish them once complete.
 
-def collect_metrics() -> None:
-    """Collect and expose all Todoist metrics."""
-    with TODOIST_SCRAPE_DURATION.time():
-        if not api:
-            print("Error: No Todoist API token provided")
+    Values are built in a fresh MetricSet and only replace the published
+    metrics at the end of the cycle, so scrapes never see a partial state.
+    If no data could be fetched the previously published metrics are kept
+    until they are older than MAX_DATA_STALENESS.
+    """
+    with track_cycle(account), account_metric(TODOIST_SCRAPE_DURATION, account).time():
+        # Collect data from Todoist API
+        snapshot = collect_snapshot(account)
+        if snapshot is None:
+            publish_retained(account)
             return
 
-        # Reset metrics
-        TODOIST_TASKS_TOTAL.clear()
-        TODOIST_TASKS_OVERDUE.clear()
-        TODOIST_TASKS_DUE_TODAY.clear()
-        TODOIST_PROJECT_COLLABORATORS.clear()
-        TODOIST_SECTIONS_TOTAL.clear()
-        TODOIST_COMMENTS_TOTAL.clear()
-        TODOIST_PRIORITY_TASKS.clear()
-        TODOIST_TASKS_COMPLETED_TODAY.clear()
-        TODOIST_TASKS_COMPLETED_WEEK.clear()
-        TODOIST_TASKS_COMPLETED_HOURS.clear()
-        TODOIST_TASKS_WITH_DUE_DATE.clear()
-        TODOIST_RECURRING_TASKS.clear()
-        TODOIST_SYNC_API_COMPLETED_TASKS.clear()
+        metrics = MetricSet(enabled_metrics(account), const_labels=account.labels)
+        publish_snapshot(account, snapshot, metrics)
 
-        # Collect data from Todoist API
-        projects_dict = collect_projects()
-        if not projects_dict:
+
+async def run_stage(
+    account: Account, name: str, function: Callable[..., T], *args: object
+) -> T:
+    """Run a blocking collection stage in a worker thread of the event loop."""
+
+    def stage() -> T:
+        with CollectionStage(account, name):
+            return function(*args)
+
+    return await asyncio.to_thread(stage)
+
+
+async def collect_stages_async(
+    account: Account,
+    snapshot: TodoistSnapshot,
+    stages: list[Stage],
+    executor: ThreadPoolExecutor,
+) -> list[tuple[Any | None, bool]]:
+    """Run stages in parallel worker threads and return their results."""
+    return await asyncio.gather(
+        *(
+            asyncio.to_thread(
+                run_collection_stage, account, stage, snapshot.projects, executor
+            )
+            for stage in stages
+        )
+    )
+
+
+async def collect_snapshot_async(account: Account) -> TodoistSnapshot | None:
+    """
+    Fetch the data of one collection cycle with independent stages in parallel.
+
+    Stages that do not depend on projects, such as tasks and sections, run
+    while projects are fetched. Once projects are known, the per-project
+    stages for collaborators and comments run together, sharing a pool of
+    FETCH_WORKERS for their requests. Every request still passes through the
+    account's scheduler and response cache.
+    """
+    snapshot = TodoistSnapshot()
+    if account.sync_state:
+        independent = [stage for stage in STAGES if not stage.in_sync]
+        dependent = []
+    else:
+        independent = [stage for stage in STAGES if not stage.needs_projects]
+        dependent = [stage for stage in STAGES if stage.needs_projects]
+
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+        pending = asyncio.create_task(
+            collect_stages_async(account, snapshot, independent, executor)
+        )
+        if account.sync_state:
+            synced = await run_stage(
+                account, "sync", collect_snapshot_incremental, account
+            )
+            if synced is not None:
+                snapshot = synced
+        else:
+            snapshot.projects = await run_stage(
+                account, "projects", collect_projects, account
+            )
+        dependent_results = []
+        if snapshot.projects:
+            dependent_results = await collect_stages_async(
+                account, snapshot, dependent, executor
+            )
+        independent_results = await pending
+
+    if not snapshot.projects:
+        return None
+    for stage, (result, failed) in zip(
+        independent + dependent, independent_results + dependent_results, strict=True
+    ):
+        apply_stage(snapshot, stage, result, failed)
+    return snapshot
+
+
+async def collect_metrics_async(account: Account) -> None:
+    """Asyncio counterpart of collect_metrics(), publishing the same metrics."""
+    with track_cycle(account), account_metric(TODOIST_SCRAPE_DURATION, account).time():
+        snapshot = await collect_snapshot_async(account)
+        if snapshot is None:
+            await asyncio.to_thread(publish_retained, account)
             return
+        metrics = MetricSet(enabled_metrics(account), const_labels=account.labels)
+        await asyncio.to_thread(publish_snapshot, account, snapshot, metrics)
 
-        collect_tasks(projects_dict)
-        collect_collaborators(projects_dict)
-        collect_sections(projects_dict)
-        collect_comments(projects_dict)
-        collect_completed_tasks_sync_api(projects_dict)
-        collect_label_metrics()
-        collect_section_tasks(projects_dict)
-
-        # Calculate metrics from collected data
-        today = datetime.now(UTC).strftime("%Y-%m-%d")
-
-        for project_id, project_data in projects_dict.items():
-            project_name = project_data["name"]
-
-            # Task metrics
-            tasks = project_data["tasks"]
-            TODOIST_TASKS_TOTAL.labels(
-                project_name=project_name, project_id=project_id
-            ).set(len(tasks))
-
-            # Priority metrics
-            priority_counts = {1: 0, 2: 0, 3: 0, 4: 0}
-            overdue_count = 0
-            due_today_count = 0
-            with_due_date_count = 0
-            recurring_count = 0
-
-            for task in tasks:
-                # Count by priority
-                priority = task.priority
-                priority_counts[priority] = priority_counts.get(priority, 0) + 1
-
-                # Check for tasks with due dates
-                if task.due:
-                    with_due_date_count += 1
-
-                    # Check for recurring tasks
-                    if task.due.is_recurring:
-                        recurring_count += 1
-
-                    # Check for overdue tasks
-                    if task.due.date and task.due.date < today:
-                        overdue_count += 1
-
-                    # Check for tasks due today
-                    if task.due.date and task.due.date == today:
-                        due_today_count += 1
-
-            # Set priority metrics
-            for priority, count in priority_counts.items():
-                TODOIST_PRIORITY_TASKS.labels(
-                    project_name=project_name,
-                    project_id=project_id,
-                    priority=str(priority),
-                ).set(count)
-
-            # Set other metrics
-            TODOIST_TASKS_OVERDUE.labels(
-                project_name=project_name, project_id=project_id
-            ).set(overdue_count)
-
-            TODOIST_TASKS_DUE_TODAY.labels(
-                project_name=project_name, project_id=project_id
-            ).set(due_today_count)
-
-            TODOIST_PROJECT_COLLABORATORS.labels(
-                project_name=project_name, project_id=project_id
-            ).set(len(project_data["collaborators"]))
-
-            TODOIST_SECTIONS_TOTAL.labels(
-                project_name=project_name, project_id=project_id
-            ).set(len(project_data["sections"]))
-
-            TODOIST_COMMENTS_TOTAL.labels(
-                project_name=project_name, project_id=project_id
-            ).set(len(project_data["comments"]))
-
-            # Set due date and recurring task metrics
-            TODOIST_TASKS_WITH_DUE_DATE.labels(
-                project_name=project_name, project_id=project_id
-            ).set(with_due_date_count)
-
-            TODOIST_RECURRING_TASKS.labels(
-                project_name=project_name, project_id=project_id
-            ).set(recurring_count)
-
-
-def main() -> None:
-    """Main function to run the exporter."""
-    # Start up the server to expose the metrics.
-    start_http_server(EXPORTER_PORT)
-    print(
-        f"Todoist Prometheus exporter started on port {EXPORTER_PORT} "
-        f"with metrics at {METRICS_PATH}"
+
+def state_path(account: Account) -> str:
+    """File the state of an account is persisted to."""
+    return os.path.join(STATE_DIR, f"{account.name}.state")
+
+
+def save_account_state(account: Account, metrics: MetricSet) -> None:
+    """Persist the published metrics, sync state, cache and completion history."""
+    state = {
+        "saved_at": time.time(),
+        "metrics": metrics.to_dict(),
+        "cache": account.cache.dump(),
+    }
+    if account.incremental_sync:
+        state["sync"] = account.sync_state.dump()
+    if account.completions is not None:
+        state["completions"] = account.completions.dump()
+    save_state(state_path(account), state)
+
+
+def restore_account_state(account: Account) -> bool:
+    """
+    Serve the metrics persisted by a previous run until the first collection.
+
+    The restored metrics are marked as stale. The sync token and cached
+    responses are restored as well, so the first collection after a restart
+    is incremental instead of a full download.
+    """
+    state = load_state(state_path(account))
+    if state is None:
+        return False
+
+    metrics = MetricSet.from_dict(SNAPSHOT_METRICS, state.get("metrics", {}))
+    metrics.const_labels = account.labels
+    COLLECTOR.publish(metrics, source=account.name)
+    account.progress.published = True
+    account_metric(TODOIST_METRICS_STALE, account).set(1)
+    account_metric(TODOIST_METRICS_PUBLISHED_TIMESTAMP, account).set(
+        state.get("saved_at", 0)
+    )
+    account.retention.mark_refreshed(
+        (spec.name for spec in SNAPSHOT_METRICS), state.get("saved_at", 0)
     )
+    account.cache.restore(state.get("cache", []))
+    if account.incremental_sync and "sync" in state:
+        account.sync_state.restore(state["sync"])
+        account.task_ages.apply_items(account.sync_state.items.values(), full=True)
+    if "completions" in state:
+        completion_history(account).restore(state["completions"])
+    print(f"Restored state of account {account.name} from {state_path(account)}")
+    return True
+
+
+def configured_accounts() -> list[Account]:
+    """Build the accounts to collect from TODOIST_ACCOUNTS_FILE or the token."""
+    defaults = {
+        "collection_interval": COLLECTION_INTERVAL,
+        "incremental_sync": INCREMENTAL_SYNC,
+        "rate_limit_requests": API_RATE_LIMIT_REQUESTS,
+        "rate_limit_window": API_RATE_LIMIT_WINDOW,
+        "max_retries": API_MAX_RETRIES,
+        "http_pool_size": HTTP_POOL_SIZE,
+        "cache_ttl": API_CACHE_TTL,
+        "cache_max_entries": API_CACHE_MAX_ENTRIES,
+        "max_staleness": MAX_DATA_STALENESS,
+        "stages": stage_settings_from_env(DISABLED_STAGES, STAGE_INTERVALS),
+    }
+    if TODOIST_ACCOUNTS_FILE:
+        accounts = load_accounts(TODOIST_ACCOUNTS_FILE, defaults)
+    elif TODOIST_API_TOKEN:
+        accounts = [Account(name="default", token=TODOIST_API_TOKEN, **defaults)]
+    else:
+        accounts = []
+
+    for account in accounts:
+        instrument_account(account)
+    return accounts
+
+
+def collection_delay(account: Account) -> int:
+    """Seconds between collections, longer while webhooks keep the state fresh."""
+    if not account.webhooks:
+        return account.collection_interval
+    return WEBHOOK_RECONCILE_INTERVAL or 10 * account.collection_interval
 
-    if not TODOIST_API_TOKEN:
+
+def run_account_worker(account: Account) -> None:
+    """Collect the metrics of one account on its own schedule."""
+    while True:
+        try:
+            collect_metrics(account)
+        except Exception as error:
+            # Keep the worker alive, an unhandled error would stop this account
+            print(f"Error collecting metrics for account {account.name}: {error}")
         print(
-            "Warning: TODOIST_API_TOKEN environment variable is not set. "
-            "Exporter will not collect metrics."
+            f"Metrics collected for account {account.name}. "
+            f"Next collection in {collection_delay(account)} seconds."
         )
+        time.sleep(collection_delay(account))
 
-    # Collect metrics on a schedule
+
+def run_collection_async(account: Account) -> None:
+    """Run one asyncio collection cycle of an account from a blocking caller."""
+    asyncio.run(collect_metrics_async(account))
+
+
+async def run_account_async(account: Account) -> None:
+    """Collect the metrics of one account on its own schedule in the event loop."""
     while True:
-        collect_metrics()
-        print(f"Metrics collected. Next collection in {COLLECTION_INTERVAL} seconds.")
-        time.sleep(COLLECTION_INTERVAL)
+        try:
+            await collect_metrics_async(account)
+        except Exception as error:
+            # Keep collecting the other accounts sharing the event loop
+            print(f"Error collecting metrics for account {account.name}: {error}")
+        print(
+            f"Metrics collected for account {account.name}. "
+            f"Next collection in {collection_delay(account)} seconds."
+        )
+        await asyncio.sleep(collection_delay(account))
+
+
+async def run_accounts_async(accounts: list[Account]) -> None:
+    """Collect every account concurrently on a single event loop."""
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(
+            max_workers=CONCURRENT_STAGES * max(1, len(accounts)),
+            thread_name_prefix="collector",
+        )
+    )
+    await asyncio.gather(*(run_account_async(account) for account in accounts))
+
+
+def webhook_account(accounts: list[Account], event: dict[str, Any]) -> Account | None:
+    """The account a webhook event was sent for, matched by its user ID."""
+    candidates = [account for account in accounts if account.webhooks]
+    user_id = str(event.get("user_id", ""))
+    for account in candidates:
+        if account.sync_state.user_id == user_id:
+            return account
+    # A single account takes events before a sync told its user ID
+    if len(candidates) == 1 and candidates[0].sync_state.user_id is None:
+        return candidates[0]
+    return None
+
+
+def receive_webhook(accounts: list[Account], event: dict[str, Any]) -> bool:
+    """
+    Apply a verified webhook event to the sync state of its account.
+
+    Returns whether the event was applied. Events of unknown accounts and of
+    resources the exporter does not keep are ignored. The change is
+    published by the account's webhook publisher.
+    """
+    account = webhook_account(accounts, event)
+    delta = event_delta(event)
+    if account is None or delta is None:
+        return False
+    account.sync_state.apply(delta)
+    account.state_changed.set()
+    return True
+
+
+def publish_local_state(account: Account) -> None:
+    """Publish the metrics of an account's sync state without any request."""
+    projects_dict, tasks, sections = account.sync_state.build_projects()
+    if not projects_dict:
+        return
+    snapshot = TodoistSnapshot(
+        projects=projects_dict,
+        tasks=tasks,
+        sections=sections,
+        completions=account.completions,
+    )
+    metrics = MetricSet(enabled_metrics(account), const_labels=account.labels)
+    publish_snapshot(account, snapshot, metrics)
+
+
+def run_webhook_publisher(account: Account) -> None:
+    """Publish the changes webhooks make to an account's state as they arrive."""
+    while True:
+        account.state_changed.wait()
+        # Events arriving within the delay are published together
+        time.sleep(WEBHOOK_PUBLISH_DELAY)
+        account.state_changed.clear()
+        try:
+            publish_local_state(account)
+        except Exception as error:
+            print(
+                f"Error publishing webhook changes of account {account.name}: {error}"
+            )
+
+
+def is_healthy(accounts: list[Account]) -> bool:
+    """Whether no collection cycle has been running for too long."""
+    now = time.monotonic()
+    return all(
+        account.progress.running_for(now) < COLLECTION_STALL_TIMEOUT
+        for account in accounts
+    )
+
+
+def is_ready(accounts: list[Account]) -> bool:
+    """
+    Whether every account has metrics to serve.
+
+    With COLLECT_ON_SCRAPE nothing is published until a scrape arrives, and
+    a scrape routed through a Service only arrives once the exporter is
+    ready, so the exporter is ready as soon as it serves requests.
+    """
+    return COLLECT_ON_SCRAPE or all(account.progress.published for account in accounts)
+
+
+def start_webhooks(accounts: list[Account]) -> None:
+    """Keep the accounts fresh from webhooks, polling them less often."""
+    for account in accounts:
+        if account.sync_state is None:
+            print(f"Webhooks need incremental sync, account {account.name} is polled")
+            continue
+        account.webhooks = True
+        threading.Thread(
+            target=run_webhook_publisher,
+            args=(account,),
+            name=f"webhooks-{account.name}",
+            daemon=True,
+        ).start()
+
+
+def start_collection(accounts: list[Account], webhooks: bool = False) -> None:
+    """
+    Restore the accounts' state and start collecting them in the background.
+
+    With webhooks, accounts collected through the Sync API are also updated
+    from webhook events and collected every WEBHOOK_RECONCILE_INTERVAL.
+    """
+    if not accounts:
+        print(
+            "Warning: neither TODOIST_API_TOKEN nor TODOIST_ACCOUNTS_FILE is set. "
+            "Exporter will not collect metrics."
+        )
+    if STATE_DIR:
+        for account in accounts:
+            restore_account_state(account)
+    if webhooks:
+        start_webhooks(accounts)
+
+    if COLLECT_ON_SCRAPE:
+        # Collect only when a scrape finds the published metrics older than the TTL
+        refreshes = [
+            CoalescingRefresh(
+                partial(run_collection_async, account)
+                if ASYNC_COLLECTION
+                else partial(collect_metrics, account),
+                SCRAPE_CACHE_TTL,
+            )
+            for account in accounts
+        ]
+
+        def refresh_accounts() -> None:
+            for refresh in refreshes:
+                refresh()
+
+        COLLECTOR.before_collect = refresh_accounts
+        print(f"Collecting on scrape with a cache TTL of {SCRAPE_CACHE_TTL} seconds.")
+    elif ASYNC_COLLECTION:
+        print("Collecting with the asyncio engine.")
+        threading.Thread(
+            target=asyncio.run,
+            args=(run_accounts_async(accounts),),
+            name="collector",
+            daemon=True,
+        ).start()
+    else:
+        # Collect every account on its own schedule in an isolated worker
+        for account in accounts:
+            threading.Thread(
+                target=run_account_worker,
+                args=(account,),
+                name=f"collector-{account.name}",
+                daemon=True,
+            ).start()
 
 
 if __name__ == "__main__":
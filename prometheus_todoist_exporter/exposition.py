@@ -0,0 +1,131 @@
+"""Pre-rendered, compressed /metrics payloads."""
+
+import gzip
+import hashlib
+import threading
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from prometheus_client import CollectorRegistry
+from prometheus_client import exposition as text_format
+from prometheus_client.metrics_core import Metric
+from prometheus_client.openmetrics import exposition as openmetrics_format
+
+from prometheus_todoist_exporter.metrics import SnapshotCollector
+
+OPENMETRICS_EOF = b"# EOF\n"
+
+
+@dataclass(frozen=True)
+class RenderedSnapshot:
+    """Families of one published snapshot, rendered in every served variant."""
+
+    generation: int
+    # Keyed by (openmetrics, gzip)
+    bodies: dict[tuple[bool, bool], bytes]
+    digest: str
+
+
+@dataclass(frozen=True)
+class Payload:
+    """A rendered /metrics response body and its headers."""
+
+    body: bytes
+    content_type: str
+    content_encoding: str | None
+    etag: str
+
+
+class _Families:
+    """Registry stand-in that collects a fixed sequence of metric families."""
+
+    def __init__(self, families: Iterable[Metric]) -> None:
+        self._families = families
+
+    def collect(self) -> Iterable[Metric]:
+        return self._families
+
+
+def _compress(data: bytes, level: int) -> bytes:
+    # mtime=0 keeps the pre-rendered output deterministic
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+class Exposition:
+    """
+    Renders the /metrics payload from a snapshot collector and a registry.
+
+    The snapshot collector holds almost all series and only changes when a
+    collection cycle publishes, so its families are rendered once per publish
+    in the text and OpenMetrics formats, each also gzipped. Only the small
+    registry of live metrics, such as request counters, is rendered per
+    scrape and appended, as a separate gzip member for compressed responses.
+
+    The ETag covers the whole body: the digest of the rendered snapshot and
+    a hash of the live part, so a 304 response never hides a changed value.
+    """
+
+    def __init__(
+        self,
+        snapshot: SnapshotCollector,
+        registry: CollectorRegistry,
+        compress_level: int = 6,
+    ) -> None:
+        self.snapshot = snapshot
+        self.registry = registry
+        self.compress_level = compress_level
+        self._rendered: RenderedSnapshot | None = None
+        self._lock = threading.Lock()
+
+    def rendered_snapshot(self) -> RenderedSnapshot:
+        """The rendered snapshot families, re-rendered after a publish."""
+        generation, families = self.snapshot.families()
+        rendered = self._rendered
+        if rendered is not None and rendered.generation == generation:
+            return rendered
+        with self._lock:
+            rendered = self._rendered
+            if rendered is None or rendered.generation != generation:
+                rendered = self._render_snapshot(generation, families)
+                self._rendered = rendered
+        return rendered
+
+    def _render_snapshot(
+        self, generation: int, families: tuple[Metric, ...]
+    ) -> RenderedSnapshot:
+        text = text_format.generate_latest(_Families(families))
+        openmetrics = openmetrics_format.generate_latest(_Families(families))
+        openmetrics = openmetrics.removesuffix(OPENMETRICS_EOF)
+        bodies = {}
+        for is_openmetrics, body in ((False, text), (True, openmetrics)):
+            bodies[is_openmetrics, False] = body
+            bodies[is_openmetrics, True] = _compress(body, self.compress_level)
+        return RenderedSnapshot(
+            generation=generation,
+            bodies=bodies,
+            digest=hashlib.sha256(text).hexdigest()[:16],
+        )
+
+    def render(self, openmetrics: bool = False, compress: bool = False) -> Payload:
+        """Build the payload of one scrape in the requested variant."""
+        self.snapshot.refresh()
+        rendered = self.rendered_snapshot()
+        if openmetrics:
+            live = openmetrics_format.generate_latest(self.registry)
+            content_type = openmetrics_format.CONTENT_TYPE_LATEST
+        else:
+            live = text_format.generate_latest(self.registry)
+            content_type = text_format.CONTENT_TYPE_LATEST
+
+        variant = ("om" if openmetrics else "text") + ("-gzip" if compress else "")
+        live_digest = hashlib.sha256(live).hexdigest()[:16]
+        etag = f'"{rendered.digest}-{live_digest}-{variant}"'
+        if compress:
+            # Concatenated gzip members decompress to the concatenated bodies
+            live = _compress(live, 1)
+        return Payload(
+            body=rendered.bodies[openmetrics, compress] + live,
+            content_type=content_type,
+            content_encoding="gzip" if compress else None,
+            etag=etag,
+        )
@@ -0,0 +1,238 @@
+"""
+Metric families served by the exporter.
+
+Gauges computed from Todoist data are declared as MetricSpecs and published
+per collection cycle through COLLECTOR, the exporter's own instrumentation
+is registered in the default registry. This module only depends on
+prometheus_client, so the metrics server can start before the API clients
+and the collection code are imported.
+"""
+
+import os
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+
+from prometheus_todoist_exporter.ages import AGE_BUCKETS
+from prometheus_todoist_exporter.exposition import Exposition
+from prometheus_todoist_exporter.metrics import MetricSpec, SnapshotCollector
+
+# Series of every account carry an account label when serving several accounts
+ACCOUNT_LABEL_NAMES = ["account"] if os.environ.get("TODOIST_ACCOUNTS_FILE") else []
+
+# Define metrics, gauges computed from Todoist data are published per cycle
+TODOIST_TASKS_TOTAL = MetricSpec(
+    "todoist_tasks_total",
+    "Total number of active tasks",
+    ("project_name", "project_id"),
+)
+TODOIST_TASKS_OVERDUE = MetricSpec(
+    "todoist_tasks_overdue", "Number of overdue tasks", ("project_name", "project_id")
+)
+TODOIST_TASKS_DUE_TODAY = MetricSpec(
+    "todoist_tasks_due_today",
+    "Number of tasks due today",
+    ("project_name", "project_id"),
+)
+TODOIST_PROJECT_COLLABORATORS = MetricSpec(
+    "todoist_project_collaborators",
+    "Number of collaborators per project",
+    ("project_name", "project_id"),
+)
+TODOIST_SECTIONS_TOTAL = MetricSpec(
+    "todoist_sections_total",
+    "Number of sections per project",
+    ("project_name", "project_id"),
+)
+TODOIST_COMMENTS_TOTAL = MetricSpec(
+    "todoist_comments_total",
+    "Number of comments",
+    ("project_name", "project_id"),
+)
+TODOIST_PRIORITY_TASKS = MetricSpec(
+    "todoist_priority_tasks",
+    "Number of tasks by priority",
+    ("project_name", "project_id", "priority"),
+)
+TODOIST_API_ERRORS = Counter(
+    "todoist_api_errors",
+    "Number of API errors encountered",
+    [*ACCOUNT_LABEL_NAMES, "endpoint"],
+)
+TODOIST_API_REQUEST_DURATION = Histogram(
+    "todoist_api_request_duration_seconds",
+    "Latency of Todoist API requests",
+    [*ACCOUNT_LABEL_NAMES, "endpoint"],
+)
+TODOIST_API_BUDGET_REMAINING = Gauge(
+    "todoist_api_budget_remaining",
+    "Number of requests left in the API rate limit budget",
+    ACCOUNT_LABEL_NAMES,
+)
+TODOIST_API_THROTTLE_SECONDS = Counter(
+    "todoist_api_throttle_seconds",
+    "Time spent waiting for the API rate limit budget or backing off",
+    ACCOUNT_LABEL_NAMES,
+)
+TODOIST_API_CACHE_LOOKUPS = Counter(
+    "todoist_api_cache_lookups",
+    "API responses looked up in the response cache, by result",
+    [*ACCOUNT_LABEL_NAMES, "endpoint", "result"],
+)
+TODOIST_API_CACHE_ENTRIES = Gauge(
+    "todoist_api_cache_entries",
+    "Number of API responses held in the response cache",
+    ACCOUNT_LABEL_NAMES,
+)
+TODOIST_API_RESPONSE_SIZE = Histogram(
+    "todoist_api_response_size_bytes",
+    "Size of Todoist API response bodies received over the network",
+    [*ACCOUNT_LABEL_NAMES, "endpoint"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216),
+)
+TODOIST_COLLECTION_STAGE_DURATION = Histogram(
+    "todoist_collection_stage_duration_seconds",
+    "Time taken by each stage of a collection cycle",
+    [*ACCOUNT_LABEL_NAMES, "stage"],
+)
+TODOIST_COLLECTION_STAGE_LAST_SUCCESS = Gauge(
+    "todoist_collection_stage_last_success_timestamp_seconds",
+    "Unix time of the last collection stage that completed without errors",
+    [*ACCOUNT_LABEL_NAMES, "stage"],
+)
+TODOIST_COLLECTED_ITEMS = Gauge(
+    "todoist_collected_items",
+    "Number of items processed in the last collection cycle",
+    [*ACCOUNT_LABEL_NAMES, "resource"],
+)
+TODOIST_METRICS_STALE = Gauge(
+    "todoist_metrics_stale",
+    "Whether the served metrics were restored from disk and not yet refreshed",
+    ACCOUNT_LABEL_NAMES,
+)
+TODOIST_METRICS_PUBLISHED_TIMESTAMP = Gauge(
+    "todoist_metrics_published_timestamp_seconds",
+    "Unix time at which the served metrics were collected",
+    ACCOUNT_LABEL_NAMES,
+)
+TODOIST_DATA_AGE = Gauge(
+    "todoist_data_age_seconds",
+    "Seconds since the oldest data served for a metric family was refreshed",
+    [*ACCOUNT_LABEL_NAMES, "family"],
+)
+TODOIST_WEBHOOK_EVENTS = Counter(
+    "todoist_webhook_events",
+    "Webhook events received, by event name and whether they were applied",
+    ["event", "result"],
+)
+TODOIST_SCRAPE_DURATION = Gauge(
+    "todoist_scrape_duration_seconds",
+    "Time taken to collect Todoist metrics",
+    ACCOUNT_LABEL_NAMES,
+)
+# New metrics for completed tasks in time spans (these will be manually tracked)
+TODOIST_TASKS_COMPLETED_TODAY = MetricSpec(
+    "todoist_tasks_completed_today",
+    "Number of tasks completed today (estimated)",
+    ("project_name", "project_id"),
+)
+TODOIST_TASKS_COMPLETED_WEEK = MetricSpec(
+    "todoist_tasks_completed_week",
+    "Number of tasks completed in the last N days (estimated)",
+    ("project_name", "project_id", "days"),
+)
+TODOIST_TASKS_COMPLETED_HOURS = MetricSpec(
+    "todoist_tasks_completed_hours",
+    "Number of tasks completed in the last N hours (estimated)",
+    ("project_name", "project_id", "hours"),
+)
+# New metrics for section-specific tasks
+TODOIST_SECTION_TASKS = MetricSpec(
+    "todoist_section_tasks",
+    "Number of tasks in a section",
+    ("project_name", "project_id", "section_name", "section_id"),
+)
+# New metrics for labels
+TODOIST_LABEL_TASKS = MetricSpec(
+    "todoist_label_tasks",
+    "Number of tasks with a specific label",
+    ("label_name",),
+)
+# New metric for tasks with due dates
+TODOIST_TASKS_WITH_DUE_DATE = MetricSpec(
+    "todoist_tasks_with_due_date",
+    "Number of tasks with a due date",
+    ("project_name", "project_id"),
+)
+# New metric for recurring tasks
+TODOIST_RECURRING_TASKS = MetricSpec(
+    "todoist_recurring_tasks",
+    "Number of recurring tasks",
+    ("project_name", "project_id"),
+)
+# New metric for task activity
+TODOIST_SYNC_API_COMPLETED_TASKS = MetricSpec(
+    "todoist_sync_api_completed_tasks",
+    "Number of tasks completed via Sync API",
+    ("project_name", "project_id", "timeframe"),
+)
+TODOIST_TASKS_COMPLETED_WINDOW = MetricSpec(
+    "todoist_tasks_completed_window",
+    "Number of tasks completed in a sliding window",
+    ("project_name", "project_id", "window"),
+)
+TODOIST_TASKS_COMPLETED_RATE = MetricSpec(
+    "todoist_tasks_completed_per_hour",
+    "Average number of tasks completed per hour over a sliding window",
+    ("window",),
+)
+TODOIST_TASK_AGE = MetricSpec(
+    "todoist_task_age_seconds",
+    "Time since open tasks were created",
+    ("project_name", "project_id"),
+    buckets=AGE_BUCKETS,
+)
+TODOIST_TASK_COMPLETION_LATENCY = MetricSpec(
+    "todoist_task_completion_latency_seconds",
+    "Time from creating tasks to completing them, since the exporter started",
+    ("project_name", "project_id"),
+    buckets=AGE_BUCKETS,
+)
+
+TODOIST_DROPPED_SERIES = MetricSpec(
+    "todoist_metric_series_dropped",
+    "Number of series not exported individually due to cardinality limits",
+    ("family", "reason"),
+)
+
+# Gauge families rendered by the snapshot collector
+SNAPSHOT_METRICS = (
+    TODOIST_TASKS_TOTAL,
+    TODOIST_TASKS_OVERDUE,
+    TODOIST_TASKS_DUE_TODAY,
+    TODOIST_PROJECT_COLLABORATORS,
+    TODOIST_SECTIONS_TOTAL,
+    TODOIST_COMMENTS_TOTAL,
+    TODOIST_PRIORITY_TASKS,
+    TODOIST_TASKS_COMPLETED_TODAY,
+    TODOIST_TASKS_COMPLETED_WEEK,
+    TODOIST_TASKS_COMPLETED_HOURS,
+    TODOIST_SECTION_TASKS,
+    TODOIST_LABEL_TASKS,
+    TODOIST_TASKS_WITH_DUE_DATE,
+    TODOIST_RECURRING_TASKS,
+    TODOIST_SYNC_API_COMPLETED_TASKS,
+    TODOIST_TASKS_COMPLETED_WINDOW,
+    TODOIST_TASKS_COMPLETED_RATE,
+    TODOIST_TASK_AGE,
+    TODOIST_TASK_COMPLETION_LATENCY,
+    TODOIST_DROPPED_SERIES,
+)
+# Families with one series or more per project, label or section
+PROJECT_METRICS = tuple(
+    spec for spec in SNAPSHOT_METRICS if "project_id" in spec.labelnames
+)
+LABEL_METRICS = (TODOIST_LABEL_TASKS,)
+SECTION_METRICS = (TODOIST_SECTION_TASKS,)
+COLLECTOR = SnapshotCollector(SNAPSHOT_METRICS)
+# Snapshot families are rendered once per publish, the registry per scrape
+EXPOSITION = Exposition(COLLECTOR, REGISTRY)
@@ -0,0 +1,202 @@
+"""Time-bucketed history of task completions with sliding window counts."""
+
+import math
+import re
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable, Iterable
+from datetime import UTC, datetime
+from typing import Any
+
+DAY_SECONDS = 86400
+DURATION_UNITS = {"m": 60, "h": 3600, "d": DAY_SECONDS}
+
+# Start of a window given the current Unix time
+WindowStart = Callable[[float], float]
+
+
+def rolling(seconds: float) -> WindowStart:
+    """A window covering the given number of seconds up to now."""
+    return lambda now: now - seconds
+
+
+def since_midnight(days: int = 0) -> WindowStart:
+    """A window from UTC midnight the given number of days ago up to now."""
+    return lambda now: (now // DAY_SECONDS - days) * DAY_SECONDS
+
+
+def parse_duration(duration: str) -> int:
+    """Seconds of a duration such as 30m, 24h or 7d."""
+    match = re.fullmatch(r"(\d+)([mhd])", duration.strip())
+    if not match:
+        message = f"Invalid duration {duration!r}, expected a number and m, h or d"
+        raise ValueError(message)
+    return int(match[1]) * DURATION_UNITS[match[2]]
+
+
+def completion_key(item: dict[str, Any]) -> str:
+    """Identity of a completion, to skip it when fetched again."""
+    return str(item.get("id") or f"{item.get('task_id')}@{item.get('completed_at')}")
+
+
+class CompletionHistory:
+    """
+    Ring buffer of task completions per project in fixed width time buckets.
+
+    Every window, such as the last 24 hours or today, keeps a running count
+    per project. A completion is added to the windows it falls into when it
+    is recorded, and a bucket is subtracted once the start of a window moves
+    past it, so reading a window costs a lookup however long it is. Windows
+    count whole buckets, so the start of a rolling window is rounded down to
+    the bucket width. span is the longest a window can reach back, and
+    completions older than that are not kept.
+
+    high_water is the latest completion time recorded, so each collection
+    only needs the completions since then. Completions in the same second
+    as high_water are remembered to skip them when they are fetched again.
+    Completions may be recorded and windows read from different threads.
+    """
+
+    def __init__(
+        self,
+        windows: dict[str, WindowStart],
+        span: float,
+        bucket_seconds: int = 300,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.windows = windows
+        self.bucket_seconds = bucket_seconds
+        self.size = math.ceil(span / bucket_seconds) + 1
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Bucket number held by each slot of the ring and its counts per project
+        self._buckets: list[int | None] = [None] * self.size
+        self._counts: list[Counter] = [Counter() for _ in range(self.size)]
+        # First bucket of each window and its running counts per project
+        self._first: dict[str, int] = {}
+        self._sums: dict[str, Counter] = {name: Counter() for name in windows}
+        self.high_water: float | None = None
+        self._recent: set[str] = set()
+        self.advance()
+
+    def fetch_since(self) -> datetime:
+        """Time to fetch completions from: the high water mark, or the span."""
+        with self._lock:
+            high_water = self.high_water
+        if high_water is None:
+            since = self._clock() - (self.size - 1) * self.bucket_seconds
+        else:
+            since = math.floor(high_water)
+        return datetime.fromtimestamp(since, UTC)
+
+    def count(self, window: str, project_id: str) -> int:
+        """Completions of a project within a window."""
+        with self._lock:
+            return self._sums[window][project_id]
+
+    def counts(self, window: str) -> dict[str, int]:
+        """Completions per project within a window."""
+        with self._lock:
+            return dict(self._sums[window])
+
+    def advance(self, now: float | None = None) -> None:
+        """Move every window up to now, dropping the buckets it leaves behind."""
+        now = self._clock() if now is None else now
+        with self._lock:
+            self._advance(now)
+
+    def _advance(self, now: float) -> None:
+        for name, start in self.windows.items():
+            first = int(start(now) // self.bucket_seconds)
+            previous = self._first.get(name, first)
+            if first - previous >= self.size:
+                self._sums[name] = Counter()
+            else:
+                for bucket in range(previous, first):
+                    slot = bucket % self.size
+                    if self._buckets[slot] == bucket:
+                        self._sums[name].subtract(self._counts[slot])
+                # Keep only positive counts
+                self._sums[name] = +self._sums[name]
+            self._first[name] = max(first, previous)
+
+    def record(self, items: Iterable[dict[str, Any]]) -> int:
+        """
+        Add completed items from the Sync API, returning how many were new.
+
+        Items already recorded in an earlier call and items older than the
+        span are skipped.
+        """
+        now = self._clock()
+        with self._lock:
+            self._advance(now)
+            return self._record(items, int(now // self.bucket_seconds))
+
+    def _record(self, items: Iterable[dict[str, Any]], current: int) -> int:
+        recorded = []
+        for item in items:
+            project_id = item.get("project_id")
+            completed_at = item.get("completed_at")
+            if not project_id or not completed_at:
+                continue
+            key = completion_key(item)
+            if key in self._recent:
+                continue
+            completed = datetime.fromisoformat(completed_at).timestamp()
+            # Completions from a clock running ahead count in the current bucket
+            bucket = min(int(completed // self.bucket_seconds), current)
+            if bucket <= current - self.size:
+                continue
+            self._add(bucket, project_id)
+            recorded.append((completed, key))
+
+        if recorded:
+            latest = max(completed for completed, _ in recorded)
+            if self.high_water is None or latest > self.high_water:
+                self.high_water = latest
+                self._recent = set()
+            self._recent.update(
+                key
+                for completed, key in recorded
+                if completed >= math.floor(self.high_water)
+            )
+        return len(recorded)
+
+    def _add(self, bucket: int, project_id: str, count: int = 1) -> None:
+        slot = bucket % self.size
+        if self._buckets[slot] != bucket:
+            # The bucket previously in this slot is older than every window
+            self._buckets[slot] = bucket
+            self._counts[slot] = Counter()
+        self._counts[slot][project_id] += count
+        for name, first in self._first.items():
+            if bucket >= first:
+                self._sums[name][project_id] += count
+
+    def dump(self) -> dict[str, Any]:
+        """Plain data representation of the history, for persisting it."""
+        with self._lock:
+            return {
+                "bucket_seconds": self.bucket_seconds,
+                "high_water": self.high_water,
+                "recent": sorted(self._recent),
+                "buckets": [
+                    [bucket, dict(counts)]
+                    for bucket, counts in zip(self._buckets, self._counts, strict=True)
+                    if bucket is not None and counts
+                ],
+            }
+
+    def restore(self, data: dict[str, Any]) -> None:
+        """Load completions from dump() output, unless the bucket width changed."""
+        if data.get("bucket_seconds") != self.bucket_seconds:
+            return
+        current = int(self._clock() // self.bucket_seconds)
+        with self._lock:
+            for bucket, counts in data.get("buckets", []):
+                if current - self.size < bucket <= current:
+                    for project_id, count in counts.items():
+                        self._add(bucket, project_id, count)
+            self.high_water = data.get("high_water")
+            self._recent = set(data.get("recent", []))
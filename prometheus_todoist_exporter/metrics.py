@@ -0,0 +1,270 @@
+"""Off-registry metric building and atomic publication."""
+
+import threading
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from operator import add
+from typing import Any
+
+from prometheus_client.core import GaugeMetricFamily, HistogramMetricFamily
+from prometheus_client.metrics_core import Metric
+from prometheus_client.registry import Collector
+from prometheus_client.utils import floatToGoString
+
+
+@dataclass(frozen=True)
+class MetricSpec:
+    """
+    Name, help text and label names of a family built each cycle.
+
+    Families are gauges, or histograms when bucket upper bounds are given.
+    """
+
+    name: str
+    documentation: str
+    labelnames: tuple[str, ...] = ()
+    buckets: tuple[float, ...] = ()
+
+
+@dataclass(frozen=True)
+class HistogramValue:
+    """
+    Value of one histogram series.
+
+    counts are the cumulative counts of every bucket, the last one for +Inf.
+    Values add up bucket by bucket, so series can be summed like gauges, and
+    convert to their total count where a single number is needed.
+    """
+
+    counts: tuple[float, ...]
+    sum: float
+
+    def __add__(self, other: object) -> "HistogramValue":
+        if not isinstance(other, HistogramValue):
+            return NotImplemented
+        return HistogramValue(
+            tuple(map(add, self.counts, other.counts)), self.sum + other.sum
+        )
+
+    def __radd__(self, other: object) -> "HistogramValue":
+        # Lets sum() and dict.get(key, 0) + value start from zero
+        return self if other == 0 else NotImplemented
+
+    def __float__(self) -> float:
+        return float(self.counts[-1])
+
+
+def _family(spec: MetricSpec, label_names: tuple[str, ...] | list[str]) -> Metric:
+    if spec.buckets:
+        return HistogramMetricFamily(spec.name, spec.documentation, labels=label_names)
+    return GaugeMetricFamily(spec.name, spec.documentation, labels=label_names)
+
+
+def _bucket_samples(spec: MetricSpec, value: HistogramValue) -> list[tuple[str, float]]:
+    bounds = [*map(floatToGoString, spec.buckets), "+Inf"]
+    return list(zip(bounds, value.counts, strict=True))
+
+
+class MetricSet:
+    """
+    Gauge values computed during a single collection cycle.
+
+    Values are written while the cycle runs and are not visible to scrapes
+    until the whole set is handed to SnapshotCollector.publish(). Constant
+    labels are prepended to every series in the set. Values of families
+    outside the set's specs are dropped, so families can be left out of a set.
+    """
+
+    def __init__(
+        self,
+        specs: tuple[MetricSpec, ...],
+        const_labels: dict[str, str] | None = None,
+    ) -> None:
+        self.specs = specs
+        self.const_labels = const_labels or {}
+        self._values: dict[MetricSpec, dict[tuple[str, ...], float]] = {
+            spec: {} for spec in specs
+        }
+
+    def set(
+        self, spec: MetricSpec, value: float | HistogramValue, **labels: str
+    ) -> None:
+        """Set the value of one series."""
+        values = self._values.get(spec)
+        if values is not None:
+            values[tuple(labels[name] for name in spec.labelnames)] = value
+
+    def get(self, spec: MetricSpec, **labels: str) -> float | None:
+        """Return the value of one series, or None if it was never set."""
+        key = tuple(labels[name] for name in spec.labelnames)
+        return self._values.get(spec, {}).get(key)
+
+    def series(self, spec: MetricSpec) -> dict[tuple[str, ...], float]:
+        """Values of a family keyed by label values, without constant labels."""
+        return dict(self._values.get(spec, {}))
+
+    def replace_series(
+        self, spec: MetricSpec, values: dict[tuple[str, ...], float]
+    ) -> None:
+        """Replace all series of a family that is part of the set."""
+        if spec in self._values:
+            self._values[spec] = values
+
+    def label_names(self, spec: MetricSpec) -> tuple[str, ...]:
+        """Label names of a family, including the constant labels."""
+        return (*self.const_labels, *spec.labelnames)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Plain data representation of the set, for persisting it."""
+        return {
+            "const_labels": self.const_labels,
+            "values": {
+                spec.name: [
+                    [
+                        list(key),
+                        [list(value.counts), value.sum]
+                        if isinstance(value, HistogramValue)
+                        else value,
+                    ]
+                    for key, value in values.items()
+                ]
+                for spec, values in self._values.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(
+        cls, specs: tuple[MetricSpec, ...], data: dict[str, Any]
+    ) -> "MetricSet":
+        """Rebuild a set from to_dict() output, skipping unknown families."""
+        metrics = cls(specs, const_labels=data.get("const_labels"))
+        values = data.get("values", {})
+        for spec in specs:
+            for key, value in values.get(spec.name, []):
+                if len(key) != len(spec.labelnames):
+                    continue
+                if spec.buckets:
+                    counts, total = value
+                    if len(counts) != len(spec.buckets) + 1:
+                        continue
+                    value = HistogramValue(tuple(counts), total)  # noqa: PLW2901
+                metrics._values[spec][tuple(key)] = value
+        return metrics
+
+    def samples(self, spec: MetricSpec) -> Iterator[tuple[tuple[str, ...], float]]:
+        """Yield the label values and value of every series of a family."""
+        const_values = tuple(self.const_labels.values())
+        for key, value in self._values.get(spec, {}).items():
+            yield (*const_values, *key), value
+
+
+class SnapshotCollector(Collector):
+    """
+    Collector that serves the last fully computed MetricSet of each source.
+
+    publish() renders the sets once and swaps them in with a single reference
+    assignment, so a scrape sees either the previous cycle or the new one and
+    never a partially built state. Every source, such as a Todoist account,
+    publishes independently.
+    """
+
+    def __init__(
+        self,
+        specs: tuple[MetricSpec, ...],
+        before_collect: Callable[[], None] | None = None,
+    ) -> None:
+        self.specs = specs
+        self.before_collect = before_collect
+        self._publish_lock = threading.Lock()
+        self._published: tuple[dict[str, MetricSet], tuple[Metric, ...], int]
+        self._published = ({}, self._render({}), 0)
+
+    def published(self, source: str = "") -> MetricSet | None:
+        """The currently published metric set of a source."""
+        return self._published[0].get(source)
+
+    def publish(self, metrics: MetricSet, source: str = "") -> None:
+        """Replace the published metrics of a source with a completed set."""
+        with self._publish_lock:
+            metric_sets = {**self._published[0], source: metrics}
+            generation = self._published[2] + 1
+            self._published = (metric_sets, self._render(metric_sets), generation)
+
+    def families(self) -> tuple[int, tuple[Metric, ...]]:
+        """
+        The rendered families of all sources and their generation.
+
+        The generation increases with every publish, so callers can cache
+        anything derived from the families until it changes.
+        """
+        _, families, generation = self._published
+        return generation, families
+
+    def refresh(self) -> None:
+        """Run the before_collect hook, as a scrape would."""
+        if self.before_collect:
+            self.before_collect()
+
+    def _render(self, metric_sets: dict[str, MetricSet]) -> tuple[Metric, ...]:
+        families = []
+        for spec in self.specs:
+            label_names = spec.labelnames
+            if metric_sets:
+                label_names = next(iter(metric_sets.values())).label_names(spec)
+            family = _family(spec, label_names)
+            for metrics in metric_sets.values():
+                for key, value in metrics.samples(spec):
+                    if spec.buckets:
+                        family.add_metric(
+                            key,
+                            buckets=_bucket_samples(spec, value),
+                            sum_value=value.sum,
+                        )
+                    else:
+                        family.add_metric(key, value)
+            families.append(family)
+        return tuple(families)
+
+    def describe(self) -> Iterator[Metric]:
+        for spec in self.specs:
+            yield _family(spec, spec.labelnames)
+
+    def collect(self) -> Iterator[Metric]:
+        self.refresh()
+        return iter(self._published[1])
+
+
+class CoalescingRefresh:
+    """
+    Run a refresh function on demand, at most once per TTL.
+
+    Callers arriving while a refresh is in flight wait for it to finish and
+    reuse its result instead of starting another one.
+    """
+
+    def __init__(self, refresh: Callable[[], None], ttl: float) -> None:
+        self.refresh = refresh
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._refreshed_at: float | None = None
+
+    def is_fresh(self) -> bool:
+        """Whether the last refresh finished less than ttl seconds ago."""
+        return (
+            self._refreshed_at is not None
+            and time.monotonic() - self._refreshed_at < self.ttl
+        )
+
+    def __call__(self) -> None:
+        """Refresh if the cached data is older than the TTL."""
+        if self.is_fresh():
+            return
+        with self._lock:
+            # Another caller may have refreshed while we waited for the lock
+            if self.is_fresh():
+                return
+            try:
+                self.refresh()
+            finally:
+                self._refreshed_at = time.monotonic()
@@ -0,0 +1,55 @@
+"""Atomic on-disk persistence of exporter state between restarts."""
+
+import json
+import os
+import tempfile
+import zlib
+from typing import Any
+
+# File header identifying the format, bumped on incompatible changes
+STATE_MAGIC = b"TODOIST-EXPORTER-STATE/1\n"
+
+
+def save_state(path: str, state: dict[str, Any]) -> None:
+    """
+    Write state to a file atomically.
+
+    The state is written as compressed JSON to a temporary file in the same
+    directory, flushed to disk and then renamed over the target, so readers
+    and crashes never observe a partially written file.
+    """
+    payload = STATE_MAGIC + zlib.compress(
+        json.dumps(state, separators=(",", ":")).encode()
+    )
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".state-")
+    try:
+        with os.fdopen(fd, "wb") as state_file:
+            state_file.write(payload)
+            state_file.flush()
+            os.fsync(state_file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def load_state(path: str) -> dict[str, Any] | None:
+    """Read state written by save_state(), or None if missing or unreadable."""
+    try:
+        with open(path, "rb") as state_file:
+            payload = state_file.read()
+    except FileNotFoundError:
+        return None
+    except OSError as error:
+        print(f"Ignoring unreadable state file {path}: {error}")
+        return None
+    if not payload.startswith(STATE_MAGIC):
+        print(f"Ignoring state file {path} in an unknown format")
+        return None
+    try:
+        return json.loads(zlib.decompress(payload[len(STATE_MAGIC) :]))
+    except (zlib.error, ValueError) as error:
+        print(f"Ignoring unreadable state file {path}: {error}")
+        return None
@@ -0,0 +1,143 @@
+"""Last known good series of metric families whose refresh failed."""
+
+import math
+import threading
+import time
+from collections.abc import Callable, Iterable
+
+from prometheus_todoist_exporter.metrics import MetricSet, MetricSpec
+
+# Projects whose data failed to refresh, or None if the whole family failed
+Failure = set[str] | None
+
+
+class Retention:
+    """
+    Refresh times of metric families, bounding how long old series are served.
+
+    When a family is refreshed without errors its new series are published
+    as they are. When its refresh fails, the previously published series are
+    kept instead, either all of them or only those of the projects whose
+    requests failed, so transient errors do not make series disappear. Series
+    last refreshed more than max_staleness seconds ago are dropped.
+    """
+
+    def __init__(
+        self, max_staleness: float, clock: Callable[[], float] = time.time
+    ) -> None:
+        self.max_staleness = max_staleness
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Last refresh of every project of a family, by family name
+        self._refreshed: dict[str, float] = {}
+        # Projects that failed to refresh since then, by family name and project
+        self._project_refreshed: dict[tuple[str, str], float] = {}
+
+    def refreshed_at(self, family: str, project_id: str | None = None) -> float | None:
+        """Time the data of a family, or one of its projects, was last refreshed."""
+        refreshed = self._project_refreshed.get((family, project_id or ""))
+        return self._refreshed.get(family) if refreshed is None else refreshed
+
+    def age(self, family: str) -> float:
+        """Seconds since the oldest data served for a family was refreshed."""
+        with self._lock:
+            times = [
+                refreshed
+                for (name, _), refreshed in self._project_refreshed.items()
+                if name == family
+            ]
+            if family in self._refreshed:
+                times.append(self._refreshed[family])
+        return self._clock() - min(times) if times else math.nan
+
+    def mark_refreshed(self, families: Iterable[str], refreshed: float) -> None:
+        """Record families as refreshed at a time, such as when state was saved."""
+        with self._lock:
+            for family in families:
+                self._refreshed[family] = refreshed
+
+    def retain(
+        self,
+        previous: MetricSet | None,
+        metrics: MetricSet,
+        failures: dict[MetricSpec, Failure],
+    ) -> None:
+        """
+        Replace the series of failed families in a new set with previous ones.
+
+        failures maps families to the projects that failed to refresh, or to
+        None when the whole family failed. Other families of the set count as
+        refreshed now.
+        """
+        now = self._clock()
+        with self._lock:
+            for spec in metrics.specs:
+                if spec not in failures:
+                    self._refreshed[spec.name] = now
+                    self._forget_projects(spec.name, keep=set())
+                    continue
+                failed = failures[spec]
+                if failed is None:
+                    # Values computed without the failed data are never served
+                    metrics.replace_series(
+                        spec, self._fresh_series(previous, spec, None, now)
+                    )
+                    continue
+                self._retain_projects(previous, metrics, spec, failed, now)
+
+    def _retain_projects(
+        self,
+        previous: MetricSet | None,
+        metrics: MetricSet,
+        spec: MetricSpec,
+        failed: set[str],
+        now: float,
+    ) -> None:
+        # Failed projects keep their last refresh, all others are refreshed now
+        for project_id in failed:
+            refreshed = self.refreshed_at(spec.name, project_id)
+            if refreshed is not None:
+                self._project_refreshed[spec.name, project_id] = refreshed
+        self._forget_projects(spec.name, keep=failed)
+        self._refreshed[spec.name] = now
+        if "project_id" not in spec.labelnames:
+            return
+
+        position = spec.labelnames.index("project_id")
+        values = {
+            key: value
+            for key, value in metrics.series(spec).items()
+            if key[position] not in failed
+        }
+        values.update(self._fresh_series(previous, spec, failed, now))
+        metrics.replace_series(spec, values)
+
+    def _fresh_series(
+        self,
+        previous: MetricSet | None,
+        spec: MetricSpec,
+        projects: set[str] | None,
+        now: float,
+    ) -> dict[tuple[str, ...], float]:
+        """Previous series of the given projects, or all, within max_staleness."""
+        if previous is None:
+            return {}
+        position = (
+            spec.labelnames.index("project_id")
+            if "project_id" in spec.labelnames
+            else None
+        )
+        kept = {}
+        for key, value in previous.series(spec).items():
+            project_id = None if position is None else key[position]
+            if projects is not None and project_id not in projects:
+                continue
+            refreshed = self.refreshed_at(spec.name, project_id)
+            if refreshed is not None and now - refreshed <= self.max_staleness:
+                kept[key] = value
+        return kept
+
+    def _forget_projects(self, family: str, keep: set[str]) -> None:
+        for name, project_id in list(self._project_refreshed):
+            if name == family and project_id not in keep:
+                del self._project_refreshed[name, project_id]
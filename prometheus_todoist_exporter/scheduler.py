@@ -0,0 +1,186 @@
+"""Rate-limit-aware scheduling of Todoist API requests."""
+
+import random
+import threading
+import time
+from collections.abc import Callable
+from contextvars import ContextVar
+from enum import IntEnum
+from http import HTTPStatus
+from typing import TypeVar
+
+import requests
+
+T = TypeVar("T")
+
+# Share of the budget that only high priority requests may use
+LOW_PRIORITY_RESERVE = 0.2
+# Upper bound of a single backoff delay in seconds
+MAX_BACKOFF = 60.0
+
+# Priority of the request call() runs in this thread, while the transport
+# takes its token right before sending it
+SENDING: ContextVar["Priority | None"] = ContextVar("sending", default=None)
+
+
+class Priority(IntEnum):
+    """Request priority when the request budget is running low."""
+
+    # Cheap requests every metric depends on, such as listing tasks
+    HIGH = 0
+    # Per-project fan-out requests, such as comments and collaborators
+    LOW = 1
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at a constant rate."""
+
+    def __init__(
+        self,
+        capacity: float,
+        refill_rate: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_rate)
+        self._updated = now
+
+    @property
+    def remaining(self) -> float:
+        """Number of tokens currently available."""
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def try_acquire(self, reserve: float = 0) -> float:
+        """
+        Take one token if more than `reserve` tokens remain afterwards.
+
+        Returns 0 when a token was taken, otherwise the number of seconds
+        until enough tokens will have been refilled.
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens - 1 >= reserve:
+                self._tokens -= 1
+                return 0.0
+            return (reserve + 1 - self._tokens) / self.refill_rate
+
+    def drain(self) -> None:
+        """Drop all tokens, used when the API reports the limit as exceeded."""
+        with self._lock:
+            self._refill()
+            self._tokens = 0
+
+
+class RequestScheduler:
+    """
+    Central gate every Todoist request of an account goes through.
+
+    Requests take a token from the account's budget before they are sent.
+    Low priority requests leave a reserve of the budget for high priority
+    ones. Requests rejected with 429 or a 5xx status are retried with
+    exponential backoff and jitter, honoring the Retry-After header.
+
+    With acquire_on_send the token is not taken by call() but by the
+    transport calling acquire_sending() for every HTTP request it actually
+    sends, so responses served from a cache cost no budget.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        bucket: TokenBucket,
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+        sleep: Callable[[float], None] = time.sleep,
+        on_throttle: Callable[[float], None] | None = None,
+        acquire_on_send: bool = False,
+    ) -> None:
+        self.bucket = bucket
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self._sleep = sleep
+        self.on_throttle = on_throttle
+        self.acquire_on_send = acquire_on_send
+
+    def _throttle(self, seconds: float) -> None:
+        if self.on_throttle:
+            self.on_throttle(seconds)
+        self._sleep(seconds)
+
+    def acquire(self, priority: Priority = Priority.HIGH) -> None:
+        """Block until the budget allows a request of the given priority."""
+        reserve = self.bucket.capacity * LOW_PRIORITY_RESERVE if priority else 0
+        while wait := self.bucket.try_acquire(reserve):
+            self._throttle(wait)
+
+    def acquire_sending(self) -> None:
+        """Take the token of the request call() is sending in this thread."""
+        priority = SENDING.get()
+        if priority is not None:
+            self.acquire(priority)
+
+    def call(
+        self,
+        request: Callable[[], T],
+        priority: Priority = Priority.HIGH,
+    ) -> T:
+        """
+        Run a request within the budget, retrying rate-limited and server errors.
+
+        The request may either raise requests.HTTPError or return a
+        requests.Response. After the last retry the final error is raised or
+        the final response is returned.
+        """
+        attempt = 0
+        while True:
+            try:
+                result = self._send(request, priority)
+            except requests.HTTPError as error:
+                if attempt >= self.max_retries or not _is_retryable(error.response):
+                    raise
+                response = error.response
+            else:
+                if attempt >= self.max_retries or not _is_retryable(result):
+                    return result
+                response = result
+
+            if response.status_code == HTTPStatus.TOO_MANY_REQUESTS:
+                self.bucket.drain()
+            self._throttle(self._backoff(attempt, response))
+            attempt += 1
+
+    def _send(self, request: Callable[[], T], priority: Priority) -> T:
+        if not self.acquire_on_send:
+            self.acquire(priority)
+            return request()
+        token = SENDING.set(priority)
+        try:
+            return request()
+        finally:
+            SENDING.reset(token)
+
+    def _backoff(self, attempt: int, response: requests.Response) -> float:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        delay = min(MAX_BACKOFF, self.backoff_base * 2**attempt)
+        return random.uniform(0, delay)  # noqa: S311
+
+
+def _is_retryable(response: object) -> bool:
+    if not isinstance(response, requests.Response):
+        return False
+    return (
+        response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+        or response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR
+    )
@@ -0,0 +1,182 @@
+"""HTTP server exposing the metrics payload and health endpoints."""
+
+import html
+import threading
+from collections.abc import Callable, Mapping
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from prometheus_todoist_exporter.exposition import Exposition
+
+# Largest request body accepted, in bytes
+MAX_REQUEST_BODY = 1024 * 1024
+# Receives the body and headers of a webhook request and returns its status
+WebhookReceiver = Callable[[bytes, Mapping[str, str]], HTTPStatus]
+
+
+def accepts_openmetrics(accept: str) -> bool:
+    """Whether an Accept header asks for the OpenMetrics text format."""
+    return any(
+        media_range.split(";")[0].strip() == "application/openmetrics-text"
+        for media_range in accept.split(",")
+    )
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows a gzip response."""
+    return any(
+        coding.split(";")[0].strip() == "gzip" for coding in accept_encoding.split(",")
+    )
+
+
+def _always() -> bool:
+    return True
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Routes requests to the metrics, health and readiness endpoints.
+
+    The metrics endpoint serves the exposition in the format and encoding the
+    client accepts. Responses carry an ETag, and a request whose If-None-Match
+    matches it is answered with 304 Not Modified and no body. /healthz and
+    /ready answer 200 or 503 from the given checks without rendering
+    anything. When a webhook receiver is set, POST requests to webhook_path
+    are passed to it. Connections idle for longer than timeout are closed.
+    """
+
+    exposition: Exposition
+    metrics_path: str = "/metrics"
+    healthy: Callable[[], bool] = staticmethod(_always)
+    ready: Callable[[], bool] = staticmethod(_always)
+    webhook_path: str = "/webhooks/todoist"
+    webhook: WebhookReceiver | None = None
+    timeout: float | None = 10
+
+    def log_message(self, *_args: object) -> None:
+        pass
+
+    def do_GET(self) -> None:  # noqa: N802
+        self.route()
+
+    def do_HEAD(self) -> None:  # noqa: N802
+        self.route(include_body=False)
+
+    def do_POST(self) -> None:  # noqa: N802
+        if self.webhook is None or urlsplit(self.path).path != self.webhook_path:
+            self.send_text(HTTPStatus.NOT_FOUND, "Not Found\n")
+            return
+        try:
+            length = int(self.headers.get("Content-Length", "0"))
+        except ValueError:
+            length = -1
+        if not 0 <= length <= MAX_REQUEST_BODY:
+            self.close_connection = True
+            self.send_text(HTTPStatus.BAD_REQUEST, "Bad Request\n")
+            return
+        status = self.webhook(self.rfile.read(length), self.headers)
+        self.send_text(status, f"{status.phrase}\n")
+
+    def route(self, include_body: bool = True) -> None:
+        path = urlsplit(self.path).path
+        if path == self.metrics_path:
+            self.send_metrics(include_body)
+        elif path == "/healthz":
+            self.send_check(self.healthy(), include_body)
+        elif path == "/ready":
+            self.send_check(self.ready(), include_body)
+        elif path == "/":
+            body = (
+                "<html><head><title>Todoist Exporter</title></head><body>"
+                f'<a href="{html.escape(self.metrics_path)}">Metrics</a>'
+                "</body></html>\n"
+            )
+            self.send_text(HTTPStatus.OK, body, include_body, "text/html")
+        else:
+            self.send_text(HTTPStatus.NOT_FOUND, "Not Found\n", include_body)
+
+    def send_text(
+        self,
+        status: HTTPStatus,
+        text: str,
+        include_body: bool = True,
+        content_type: str = "text/plain",
+    ) -> None:
+        body = text.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if include_body:
+            self.wfile.write(body)
+
+    def send_check(self, passed: bool, include_body: bool) -> None:
+        if passed:
+            self.send_text(HTTPStatus.OK, "ok\n", include_body)
+        else:
+            self.send_text(
+                HTTPStatus.SERVICE_UNAVAILABLE, "unavailable\n", include_body
+            )
+
+    def send_metrics(self, include_body: bool = True) -> None:
+        payload = self.exposition.render(
+            openmetrics=accepts_openmetrics(self.headers.get("Accept", "")),
+            compress=accepts_gzip(self.headers.get("Accept-Encoding", "")),
+        )
+        not_modified = self.headers.get("If-None-Match") == payload.etag
+        self.send_response(HTTPStatus.NOT_MODIFIED if not_modified else HTTPStatus.OK)
+        self.send_header("Content-Type", payload.content_type)
+        self.send_header("ETag", payload.etag)
+        self.send_header("Vary", "Accept, Accept-Encoding")
+        if payload.content_encoding:
+            self.send_header("Content-Encoding", payload.content_encoding)
+        if not not_modified:
+            self.send_header("Content-Length", str(len(payload.body)))
+        self.end_headers()
+        if include_body and not not_modified:
+            self.wfile.write(payload.body)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """Threaded server answering every request on its own daemon thread."""
+
+    daemon_threads = True
+    # Accept bursts of concurrent scrapes and probes
+    request_queue_size = 64
+
+
+def start_metrics_server(  # noqa: PLR0913
+    port: int,
+    exposition: Exposition,
+    metrics_path: str = "/metrics",
+    healthy: Callable[[], bool] = _always,
+    ready: Callable[[], bool] = _always,
+    timeout: float = 10,
+    addr: str = "0.0.0.0",  # noqa: S104
+    webhook: WebhookReceiver | None = None,
+    webhook_path: str = "/webhooks/todoist",
+) -> MetricsServer:
+    """
+    Serve the exposition and the health endpoints from a background thread.
+
+    With a webhook receiver, webhook requests are answered as well.
+    """
+    handler = type(
+        "Handler",
+        (MetricsHandler,),
+        {
+            "exposition": exposition,
+            "metrics_path": metrics_path,
+            "healthy": staticmethod(healthy),
+            "ready": staticmethod(ready),
+            "webhook": None if webhook is None else staticmethod(webhook),
+            "webhook_path": webhook_path,
+            "timeout": timeout,
+        },
+    )
+    server = MetricsServer((addr, port), handler)
+    threading.Thread(
+        target=server.serve_forever, name="metrics-server", daemon=True
+    ).start()
+    return server
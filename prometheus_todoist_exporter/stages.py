@@ -0,0 +1,89 @@
+"""Enable flags and refresh intervals of the optional collection stages."""
+
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+# Stages of a collection cycle that can be disabled or refreshed less often
+OPTIONAL_STAGES = ("tasks", "collaborators", "sections", "comments", "completed_tasks")
+
+
+@dataclass(frozen=True)
+class StageSettings:
+    """Whether a stage runs and the minimum seconds between its refreshes."""
+
+    enabled: bool = True
+    # 0 refreshes the stage in every collection cycle
+    interval: int = 0
+
+
+def parse_stage_settings(config: dict[str, dict[str, Any]]) -> dict[str, StageSettings]:
+    """
+    Build stage settings from a mapping of stage name to its options.
+
+    Options are `enabled` and `interval`. Unknown stage names raise a
+    ValueError so that typos do not silently leave a stage enabled.
+    """
+    unknown = sorted(set(config) - set(OPTIONAL_STAGES))
+    if unknown:
+        message = (
+            f"Unknown collection stages {', '.join(unknown)}, "
+            f"expected any of {', '.join(OPTIONAL_STAGES)}"
+        )
+        raise ValueError(message)
+    return {
+        name: StageSettings(
+            enabled=bool(options.get("enabled", True)),
+            interval=int(options.get("interval", 0)),
+        )
+        for name, options in config.items()
+    }
+
+
+def stage_settings_from_env(disabled: str, intervals: str) -> dict[str, StageSettings]:
+    """
+    Build stage settings from environment variable values.
+
+    disabled is a comma separated list of stage names and intervals a comma
+    separated list of `stage=seconds` pairs.
+    """
+    config: dict[str, dict[str, Any]] = {}
+    for name in filter(None, (name.strip() for name in disabled.split(","))):
+        config.setdefault(name, {})["enabled"] = False
+    for pair in filter(None, (pair.strip() for pair in intervals.split(","))):
+        name, _, seconds = pair.partition("=")
+        config.setdefault(name.strip(), {})["interval"] = int(seconds)
+    return parse_stage_settings(config)
+
+
+class StageResults:
+    """
+    Last successful result of every stage of an account.
+
+    A stage with an interval reuses its stored result without any requests
+    until the interval has passed since the result was fetched.
+    """
+
+    def __init__(
+        self,
+        settings: dict[str, StageSettings],
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.settings = settings
+        self._clock = clock
+        self._results: dict[str, tuple[float, Any]] = {}
+
+    def is_enabled(self, name: str) -> bool:
+        return self.settings.get(name, StageSettings()).enabled
+
+    def fresh(self, name: str) -> Any | None:  # noqa: ANN401
+        """The stored result of a stage if it is younger than its interval."""
+        interval = self.settings.get(name, StageSettings()).interval
+        stored = self._results.get(name)
+        if stored is None or self._clock() - stored[0] >= interval:
+            return None
+        return stored[1]
+
+    def store(self, name: str, result: object) -> None:
+        self._results[name] = (self._clock(), result)
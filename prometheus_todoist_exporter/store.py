@@ -0,0 +1,129 @@
+"""Compact in-memory storage of the task fields metrics are computed from."""
+
+import sys
+from collections.abc import Iterator
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from todoist_api_python.models import Task
+
+
+class TaskRecord:
+    """
+    The fields of a task the metrics need, without the rest of the model.
+
+    Records use __slots__ instead of a per-instance dict. Identifiers, due
+    dates and label names repeat across many tasks and are interned, so every
+    distinct value is kept in memory once.
+    """
+
+    __slots__ = (
+        "created_at",
+        "due_date",
+        "id",
+        "is_recurring",
+        "labels",
+        "priority",
+        "project_id",
+        "section_id",
+    )
+
+    def __init__(  # noqa: PLR0913
+        self,
+        id: str,  # noqa: A002
+        project_id: str,
+        section_id: str | None,
+        priority: int,
+        due_date: str | None,
+        is_recurring: bool,
+        labels: tuple[str, ...],
+        created_at: str | None = None,
+    ) -> None:
+        self.id = id
+        self.project_id = project_id
+        self.section_id = section_id
+        self.priority = priority
+        self.due_date = due_date
+        self.is_recurring = is_recurring
+        self.labels = labels
+        self.created_at = created_at
+
+    def __repr__(self) -> str:
+        return f"TaskRecord(id={self.id!r}, project_id={self.project_id!r})"
+
+
+def _intern(value: str | None) -> str | None:
+    return sys.intern(value) if value else None
+
+
+class TaskStore:
+    """
+    Task records of one collection cycle, grouped by project.
+
+    Tasks are added either from REST API models or from raw Sync API items.
+    Label lists are shared between records that carry the same labels.
+    """
+
+    def __init__(self) -> None:
+        self._records: list[TaskRecord] = []
+        self._by_project: dict[str, list[TaskRecord]] = {}
+        self._label_sets: dict[tuple[str, ...], tuple[str, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[TaskRecord]:
+        return iter(self._records)
+
+    def project_tasks(self, project_id: str) -> list[TaskRecord]:
+        """Records of the tasks in a project."""
+        return self._by_project.get(project_id, [])
+
+    def _labels(self, labels: list[str] | None) -> tuple[str, ...]:
+        key = tuple(labels) if labels else ()
+        shared = self._label_sets.get(key)
+        if shared is None:
+            shared = self._label_sets[key] = tuple(map(sys.intern, key))
+        return shared
+
+    def _add(self, record: TaskRecord) -> TaskRecord:
+        self._records.append(record)
+        self._by_project.setdefault(record.project_id, []).append(record)
+        return record
+
+    def add_task(self, task: "Task") -> TaskRecord:
+        """Add a task returned by the REST API."""
+        due = task.due
+        return self._add(
+            TaskRecord(
+                id=task.id,
+                project_id=sys.intern(task.project_id),
+                section_id=_intern(task.section_id),
+                priority=task.priority,
+                due_date=_intern(due.date) if due else None,
+                is_recurring=bool(due and due.is_recurring),
+                labels=self._labels(task.labels),
+                created_at=task.created_at,
+            )
+        )
+
+    def add_item(self, item: dict[str, Any]) -> TaskRecord:
+        """
+        Add a raw item from the Sync API.
+
+        The Sync API includes the time in the due date of timed tasks, so
+        only its date part is kept, as in the REST API.
+        """
+        due = item.get("due")
+        return self._add(
+            TaskRecord(
+                id=item["id"],
+                project_id=sys.intern(item["project_id"]),
+                section_id=_intern(item.get("section_id")),
+                priority=item.get("priority", 1),
+                due_date=_intern(due["date"][:10]) if due else None,
+                is_recurring=bool(due and due.get("is_recurring")),
+                labels=self._labels(item.get("labels")),
+                created_at=item.get("added_at"),
+            )
+        )
@@ -0,0 +1,291 @@
+"""Incremental collection through the Todoist Sync API."""
+
+import json
+import threading
+from collections.abc import Callable
+from functools import partial
+from http import HTTPStatus
+from operator import itemgetter
+from typing import TYPE_CHECKING, Any
+
+import requests
+
+from prometheus_todoist_exporter.scheduler import RequestScheduler
+from prometheus_todoist_exporter.store import TaskStore
+
+if TYPE_CHECKING:
+    from todoist_api_python.models import Section
+
+SYNC_API_URL = "https://api.todoist.com/sync/v9/sync"
+# Sync token that requests a full sync of every resource
+FULL_SYNC_TOKEN = "*"  # noqa: S105
+# Fields of each resource kept when the local state is persisted. Comments
+# and collaborators are only counted, so their text and contact details are
+# not written to disk
+PERSISTED_FIELDS = {
+    "projects": ("id", "name"),
+    "items": (
+        "id",
+        "project_id",
+        "section_id",
+        "priority",
+        "due",
+        "labels",
+        "added_at",
+    ),
+    "sections": ("id", "name", "section_order", "project_id"),
+    "notes": ("id", "project_id"),
+    "collaborators": ("id",),
+    "collaborator_states": ("project_id", "user_id", "state"),
+}
+RESOURCE_TYPES = [
+    "projects",
+    "items",
+    "sections",
+    "project_notes",
+    "collaborators",
+    "collaborator_states",
+    "user",
+]
+
+
+def _is_removed(resource: dict[str, Any]) -> bool:
+    return bool(resource.get("is_deleted") or resource.get("is_archived"))
+
+
+def _merge(
+    store: dict[Any, dict[str, Any]],
+    resources: list[dict[str, Any]],
+    is_removed: Callable[[dict[str, Any]], Any],
+    key: Callable[[dict[str, Any]], Any] = itemgetter("id"),
+) -> None:
+    """Apply a list of changed resources to a local store."""
+    for resource in resources:
+        if is_removed(resource):
+            store.pop(key(resource), None)
+        else:
+            store[key(resource)] = resource
+
+
+class SyncState:
+    """
+    Local copy of the Todoist resources needed by the exporter.
+
+    The first call to sync() performs a full sync. Later calls send the stored
+    sync_token so the API only returns resources that changed since then, and
+    the deltas are applied to the local state. When the API rejects the token
+    the state is dropped and a full sync is performed instead. on_items, if
+    set, is called with the items of every response and whether it was a
+    full sync. Changes are applied under a lock, so changes received from
+    webhooks can be applied while a collection reads the state.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        scheduler: RequestScheduler | None = None,
+        session: requests.Session | None = None,
+    ) -> None:
+        self.token = token
+        self.scheduler = scheduler
+        self.session = session or requests.Session()
+        self.sync_token = FULL_SYNC_TOKEN
+        # ID of the user owning the account, known after the first sync
+        self.user_id: str | None = None
+        self.lock = threading.RLock()
+        self.projects: dict[str, dict[str, Any]] = {}
+        self.items: dict[str, dict[str, Any]] = {}
+        self.sections: dict[str, dict[str, Any]] = {}
+        self.notes: dict[str, dict[str, Any]] = {}
+        self.collaborators: dict[str, dict[str, Any]] = {}
+        self.collaborator_states: dict[tuple[str, str], dict[str, Any]] = {}
+        self.on_items: Callable[[list[dict[str, Any]], bool], None] | None = None
+
+    @property
+    def is_synced(self) -> bool:
+        """Whether at least one sync has completed."""
+        return self.sync_token != FULL_SYNC_TOKEN
+
+    def reset(self) -> None:
+        """Forget all local state so the next sync is a full sync."""
+        with self.lock:
+            self.sync_token = FULL_SYNC_TOKEN
+            self.projects.clear()
+            self.items.clear()
+            self.sections.clear()
+            self.notes.clear()
+            self.collaborators.clear()
+            self.collaborator_states.clear()
+
+    def dump(self) -> dict[str, Any]:
+        """
+        Plain data copy of the local state, for persisting it across restarts.
+
+        Only the resource fields the exporter reads are kept.
+        """
+        with self.lock:
+            data: dict[str, Any] = {
+                "sync_token": self.sync_token,
+                "user_id": self.user_id,
+            }
+            for name, fields in PERSISTED_FIELDS.items():
+                data[name] = [
+                    {field: resource[field] for field in fields if field in resource}
+                    for resource in getattr(self, name).values()
+                ]
+        return data
+
+    def restore(self, data: dict[str, Any]) -> None:
+        """Load state written by dump(), so the next sync is incremental."""
+        with self.lock:
+            self.reset()
+            for name in PERSISTED_FIELDS:
+                key = itemgetter("id")
+                if name == "collaborator_states":
+                    key = itemgetter("project_id", "user_id")
+                store = getattr(self, name)
+                for resource in data.get(name, []):
+                    store[key(resource)] = resource
+            self.sync_token = data.get("sync_token", FULL_SYNC_TOKEN)
+            self.user_id = data.get("user_id")
+
+    def sync(self) -> None:
+        """Fetch changes since the last sync and apply them to the local state."""
+        response = self._request()
+        if response.status_code == HTTPStatus.BAD_REQUEST and self.is_synced:
+            print("Sync token rejected by the Todoist Sync API, running a full sync")
+            self.reset()
+            response = self._request()
+        response.raise_for_status()
+        self.apply(response.json())
+
+    def _request(self) -> requests.Response:
+        request = partial(
+            self.session.post,
+            SYNC_API_URL,
+            headers={"Authorization": f"Bearer {self.token}"},
+            data={
+                "sync_token": self.sync_token,
+                "resource_types": json.dumps(RESOURCE_TYPES),
+            },
+            timeout=60,
+        )
+        if self.scheduler:
+            return self.scheduler.call(request)
+        return request()
+
+    def apply(self, payload: dict[str, Any]) -> None:
+        """
+        Apply a Sync API response to the local state.
+
+        Payloads without a sync_token, such as changes received from webhooks,
+        are applied without moving the token, so the next sync returns them
+        again and they are applied once more.
+        """
+        with self.lock:
+            self._apply(payload)
+
+    def _apply(self, payload: dict[str, Any]) -> None:
+        if payload.get("full_sync"):
+            self.reset()
+
+        _merge(self.projects, payload.get("projects", []), _is_removed)
+        # Only active tasks are tracked, completed ones are dropped
+        items = payload.get("items", [])
+        _merge(
+            self.items,
+            items,
+            lambda item: item.get("is_deleted") or item.get("checked"),
+        )
+        if self.on_items:
+            self.on_items(items, bool(payload.get("full_sync")))
+        _merge(self.sections, payload.get("sections", []), _is_removed)
+        _merge(self.notes, payload.get("project_notes", []), _is_removed)
+        _merge(self.collaborators, payload.get("collaborators", []), _is_removed)
+        _merge(
+            self.collaborator_states,
+            payload.get("collaborator_states", []),
+            lambda state: state.get("is_deleted") or state.get("state") != "active",
+            key=lambda state: (state["project_id"], state["user_id"]),
+        )
+
+        user = payload.get("user")
+        if user and "id" in user:
+            self.user_id = str(user["id"])
+        self.sync_token = payload.get("sync_token", self.sync_token)
+
+    def build_projects(
+        self,
+    ) -> tuple[dict[str, dict[str, Any]], TaskStore, list["Section"]]:
+        """
+        Build the exporter's project dict from the local state.
+
+        Returns the project dict together with the task store and section list,
+        using the same shape as the REST collection functions. Tasks are
+        stored as compact records built directly from the raw items.
+        """
+        with self.lock:
+            return self._build_projects()
+
+    def _build_projects(
+        self,
+    ) -> tuple[dict[str, dict[str, Any]], TaskStore, list["Section"]]:
+        # Imported on first use to keep the client library off the startup path
+        from todoist_api_python.models import Collaborator, Comment, Section
+
+        projects_dict = {
+            project_id: {
+                "id": project_id,
+                "name": project["name"],
+                "tasks": [],
+                "collaborators": [],
+                "sections": [],
+                "comments": [],
+            }
+            for project_id, project in self.projects.items()
+        }
+
+        tasks = TaskStore()
+        for item in self.items.values():
+            tasks.add_item(item)
+        for project_id, project_data in projects_dict.items():
+            project_data["tasks"] = tasks.project_tasks(project_id)
+
+        sections = []
+        for section in self.sections.values():
+            model = Section(
+                id=section["id"],
+                name=section["name"],
+                order=section.get("section_order", 0),
+                project_id=section["project_id"],
+            )
+            sections.append(model)
+            if model.project_id in projects_dict:
+                projects_dict[model.project_id]["sections"].append(model)
+
+        for note in self.notes.values():
+            project_id = note.get("project_id")
+            if project_id in projects_dict:
+                projects_dict[project_id]["comments"].append(
+                    Comment(
+                        attachment=None,
+                        content=note.get("content", ""),
+                        id=note["id"],
+                        posted_at=note.get("posted_at", ""),
+                        project_id=project_id,
+                        task_id=None,
+                    )
+                )
+
+        for project_id, user_id in self.collaborator_states:
+            user = self.collaborators.get(user_id)
+            if project_id in projects_dict and user:
+                projects_dict[project_id]["collaborators"].append(
+                    Collaborator(
+                        id=user_id,
+                        email=user.get("email", ""),
+                        name=user.get("full_name", ""),
+                    )
+                )
+
+        return projects_dict, tasks, sections
@@ -0,0 +1,74 @@
+"""Verification and translation of Todoist webhook events."""
+
+import base64
+import hashlib
+import hmac
+from typing import Any
+
+# Header carrying the base64 encoded HMAC-SHA256 of the request body
+SIGNATURE_HEADER = "X-Todoist-Hmac-SHA256"
+
+# Sync API resource each event changes and the fields it implies
+EVENT_CHANGES: dict[str, tuple[str, dict[str, Any]]] = {
+    "item:added": ("items", {}),
+    "item:updated": ("items", {}),
+    "item:completed": ("items", {"checked": True}),
+    "item:uncompleted": ("items", {"checked": False}),
+    "item:deleted": ("items", {"is_deleted": True}),
+    "note:added": ("project_notes", {}),
+    "note:updated": ("project_notes", {}),
+    "note:deleted": ("project_notes", {"is_deleted": True}),
+    "project:added": ("projects", {}),
+    "project:updated": ("projects", {}),
+    "project:deleted": ("projects", {"is_deleted": True}),
+    "project:archived": ("projects", {"is_archived": True}),
+    "project:unarchived": ("projects", {"is_archived": False}),
+    "section:added": ("sections", {}),
+    "section:updated": ("sections", {}),
+    "section:deleted": ("sections", {"is_deleted": True}),
+    "section:archived": ("sections", {"is_archived": True}),
+    "section:unarchived": ("sections", {"is_archived": False}),
+}
+
+
+def sign(secret: str, body: bytes) -> str:
+    """Signature Todoist sends with a webhook request body."""
+    digest = hmac.new(secret.encode(), body, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode()
+
+
+def verify_signature(secret: str, body: bytes, signature: str | None) -> bool:
+    """Whether a request body was signed with the app's client secret."""
+    if not signature:
+        return False
+    # Headers are decoded as latin-1, and compare_digest only takes ASCII text
+    return hmac.compare_digest(
+        sign(secret, body).encode(), signature.encode("latin-1", "replace")
+    )
+
+
+def event_delta(event: dict[str, Any]) -> dict[str, Any] | None:
+    """
+    The Sync API response equivalent to a webhook event.
+
+    Returns None for events that do not change the resources the exporter
+    keeps, including comments on tasks, which are not tracked. Deleted,
+    archived and completed resources are flagged as the Sync API would.
+    """
+    name = event.get("event_name")
+    change = EVENT_CHANGES.get(name) if isinstance(name, str) else None
+    data = event.get("event_data")
+    if (
+        change is None
+        or not isinstance(data, dict)
+        or not isinstance(data.get("id"), str)
+    ):
+        return None
+    resource, fields = change
+    if resource == "project_notes" and data.get("item_id"):
+        return None
+    # Completing a recurring task moves it to its next date instead
+    due = data.get("due") or {}
+    if resource == "items" and due.get("is_recurring"):
+        fields = {key: value for key, value in fields.items() if key != "checked"}
+    return {resource: [{**data, **fields}]}
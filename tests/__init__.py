@@ -1 +1,14 @@
 # Tests package
+
+
+class FakeClock:
+    """Clock returning a time that tests move forward by hand."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
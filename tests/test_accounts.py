@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pytest
+
+from prometheus_todoist_exporter.accounts import Account, load_accounts
+
+ACCOUNTS_TOML = """
+[[accounts]]
+name = "personal"
+token = "personal_token"
+
+[[accounts]]
+name = "work"
+token_env = "WORK_TODOIST_TOKEN"
+collection_interval = 300
+incremental_sync = true
+
+[accounts.stages.comments]
+enabled = false
+"""
+DEFAULT_INTERVAL = 60
+WORK_INTERVAL = 300
+DEFAULTS = {
+    "collection_interval": DEFAULT_INTERVAL,
+    "incremental_sync": False,
+    "rate_limit_requests": 450,
+    "rate_limit_window": 900,
+    "max_retries": 3,
+    "http_pool_size": 10,
+    "cache_ttl": 300,
+    "cache_max_entries": 1024,
+}
+
+
+class TestAccounts(unittest.TestCase):
+    def write_config(self, content):
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=".toml", delete=False
+        ) as config_file:
+            config_file.write(content)
+        self.addCleanup(os.remove, config_file.name)
+        return config_file.name
+
+    @patch.dict(os.environ, {"WORK_TODOIST_TOKEN": "work_token"})
+    def test_load_accounts(self):
+        path = self.write_config(ACCOUNTS_TOML)
+
+        personal, work = load_accounts(path, DEFAULTS)
+
+        assert personal.name == "personal"
+        assert personal.token == "personal_token"  # noqa: S105
+        assert personal.collection_interval == DEFAULT_INTERVAL
+        assert personal.sync_state is None
+        assert personal.labels == {"account": "personal"}
+
+        assert work.token == "work_token"  # noqa: S105
+        assert work.collection_interval == WORK_INTERVAL
+        assert work.sync_state is not None
+        assert work.sync_state.scheduler is work.scheduler
+        assert work.sync_state.session is work.session
+        assert not work.stage_results.is_enabled("comments")
+        assert personal.stage_results.is_enabled("comments")
+        assert work.api._session is work.session
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_load_accounts_without_token(self):
+        path = self.write_config(ACCOUNTS_TOML)
+
+        with pytest.raises(ValueError, match="work"):
+            load_accounts(path, DEFAULTS)
+
+    def test_load_accounts_with_duplicate_names(self):
+        path = self.write_config(
+            ACCOUNTS_TOML.replace('name = "work"', 'name = "personal"')
+        )
+
+        with pytest.raises(ValueError, match="more than once"):
+            load_accounts(path, DEFAULTS)
+
+    def test_single_account_has_no_labels(self):
+        account = Account(name="default", token="token")  # noqa: S106
+
+        assert account.labels == {}
+
+    def test_api_client_built_on_first_use(self):
+        account = Account(name="default", token="token")  # noqa: S106
+        assert "api" not in vars(account)
+
+        api = account.api
+
+        assert account.api is api
+        assert api._session is account.session
+
+
+if __name__ == "__main__":
+    unittest.main()
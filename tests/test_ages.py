@@ -0,0 +1,103 @@
+import unittest
+from datetime import UTC, datetime
+
+from prometheus_todoist_exporter.ages import TaskAges
+from prometheus_todoist_exporter.store import TaskRecord
+
+HOUR = 3600
+DAY = 24 * HOUR
+BUCKETS = (HOUR, DAY)
+# Noon UTC on 2025-01-02
+NOON = 1735819200.0
+
+
+def timestamp(seconds_ago):
+    return datetime.fromtimestamp(NOON - seconds_ago, UTC).isoformat()
+
+
+def item(task_id, created_ago, project_id="1", **fields):
+    return {
+        "id": task_id,
+        "project_id": project_id,
+        "added_at": timestamp(created_ago),
+        **fields,
+    }
+
+
+def record(task_id, created_ago, project_id="1"):
+    return TaskRecord(
+        id=task_id,
+        project_id=project_id,
+        section_id=None,
+        priority=1,
+        due_date=None,
+        is_recurring=False,
+        labels=(),
+        created_at=timestamp(created_ago),
+    )
+
+
+class TestTaskAges(unittest.TestCase):
+    def setUp(self):
+        self.ages = TaskAges(BUCKETS, clock=lambda: NOON)
+
+    def test_age_histogram_of_open_tasks(self):
+        self.ages.apply_items(
+            [item("a", 10 * 60), item("b", 2 * HOUR), item("c", 3 * DAY)]
+        )
+
+        age = self.ages.age("1")
+
+        assert age.counts == (1, 2, 3)
+        assert age.sum == 10 * 60 + 2 * HOUR + 3 * DAY
+        assert self.ages.age("2").counts == (0, 0, 0)
+
+    def test_moved_and_deleted_tasks_update_projects(self):
+        self.ages.apply_items([item("a", HOUR / 2), item("b", 2 * HOUR)])
+
+        self.ages.apply_items(
+            [item("a", HOUR / 2, project_id="2"), {"id": "b", "is_deleted": True}]
+        )
+
+        assert self.ages.age("1").counts == (0, 0, 0)
+        assert self.ages.age("2").counts == (1, 1, 1)
+        assert self.ages.latency("1").counts == (0, 0, 0)
+
+    def test_checked_items_observe_completion_latency(self):
+        self.ages.apply_items([item("a", 2 * HOUR), item("b", 10 * 60)])
+
+        self.ages.apply_items(
+            [{"id": "a", "checked": True, "completed_at": timestamp(0)}]
+        )
+
+        latency = self.ages.latency("1")
+        assert latency.counts == (0, 1, 1)
+        assert latency.sum == 2 * HOUR
+        assert len(self.ages) == 1
+
+    def test_completion_reported_after_task_left_the_list(self):
+        self.ages.replace([record("a", 30 * 60), record("b", 2 * HOUR)])
+        self.ages.replace([record("b", 2 * HOUR)])
+
+        completed = {"task_id": "a", "completed_at": timestamp(0)}
+        self.ages.record_completions([completed])
+        # A completion fetched again is not observed twice
+        self.ages.record_completions([completed])
+
+        assert self.ages.latency("1").counts == (1, 1, 1)
+        assert self.ages.age("1").counts == (0, 1, 1)
+
+    def test_recurring_task_completions_are_not_observed(self):
+        self.ages.apply_items([item("a", 2 * HOUR, due={"is_recurring": True})])
+
+        self.ages.record_completions([{"task_id": "a", "completed_at": timestamp(0)}])
+
+        assert self.ages.latency("1").counts == (0, 0, 0)
+        assert len(self.ages) == 1
+
+    def test_full_sync_closes_unlisted_tasks(self):
+        self.ages.apply_items([item("a", HOUR / 2), item("b", 2 * HOUR)])
+
+        self.ages.apply_items([item("b", 2 * HOUR)], full=True)
+
+        assert self.ages.age("1").counts == (0, 1, 1)
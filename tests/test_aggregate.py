@@ -0,0 +1,67 @@
+import unittest
+
+from prometheus_todoist_exporter.aggregate import PRIORITIES, aggregate_tasks
+from prometheus_todoist_exporter.store import TaskStore
+
+TODAY = "2025-06-15"
+EXPECTED_TOTAL = 4
+EXPECTED_WITH_DUE_DATE = 3
+
+
+def make_item(task_id, priority=1, due_date=None, is_recurring=False, **fields):
+    due = {"date": due_date, "is_recurring": is_recurring} if due_date else None
+    return {
+        "id": task_id,
+        "project_id": "p1",
+        "priority": priority,
+        "due": due,
+        **fields,
+    }
+
+
+class TestAggregateTasks(unittest.TestCase):
+    def setUp(self):
+        self.tasks = TaskStore()
+        self.tasks.add_item(make_item("1", priority=4, due_date="2025-06-01"))
+        self.tasks.add_item(
+            make_item("2", priority=4, due_date=TODAY, is_recurring=True)
+        )
+        self.tasks.add_item(
+            make_item("3", due_date="2025-07-01", labels=["work"], section_id="s1")
+        )
+        self.tasks.add_item(make_item("4", labels=["work", "urgent"], section_id="s1"))
+
+    def test_project_counts(self):
+        counts = aggregate_tasks(self.tasks, TODAY).project("p1")
+
+        assert counts.total == EXPECTED_TOTAL
+        assert counts.with_due_date == EXPECTED_WITH_DUE_DATE
+        assert counts.overdue == 1
+        assert counts.due_today == 1
+        assert counts.recurring == 1
+        assert counts.priorities == {1: 2, 2: 0, 3: 0, 4: 2}
+
+    def test_timed_task_due_today(self):
+        tasks = TaskStore()
+        tasks.add_item(make_item("1", due_date=f"{TODAY}T15:00:00"))
+
+        counts = aggregate_tasks(tasks, TODAY).project("p1")
+
+        assert counts.due_today == 1
+        assert counts.overdue == 0
+
+    def test_label_and_section_counts(self):
+        counts = aggregate_tasks(self.tasks, TODAY)
+
+        assert counts.labels == {"work": 2, "urgent": 1}
+        assert counts.sections == {"s1": 2}
+
+    def test_project_without_tasks_is_zero(self):
+        counts = aggregate_tasks(self.tasks, TODAY).project("p2")
+
+        assert counts.total == 0
+        assert list(counts.priorities) == list(PRIORITIES)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from http import HTTPStatus
+from http.client import HTTPConnection
+from unittest.mock import patch
+
+from prometheus_todoist_exporter import exporter
+from prometheus_todoist_exporter.accounts import Account
+from prometheus_todoist_exporter.app import Exporter
+
+TEST_API_TOKEN = "test_token"  # noqa: S105
+
+
+class TestExporter(unittest.TestCase):
+    def status(self, server, path):
+        connection = HTTPConnection(*server.server_address[:2], timeout=5)
+        self.addCleanup(connection.close)
+        connection.request("GET", path)
+        return connection.getresponse().status
+
+    def test_serves_before_accounts_are_configured(self):
+        account = Account(name="default", token=TEST_API_TOKEN)
+        app = Exporter(port=0, addr="127.0.0.1")
+        self.addCleanup(app.stop)
+
+        with patch.object(
+            exporter, "configured_accounts", return_value=[account]
+        ) as configured:
+            server = app.serve()
+
+            assert self.status(server, "/metrics") == HTTPStatus.OK
+            assert self.status(server, "/healthz") == HTTPStatus.OK
+            assert self.status(server, "/ready") == HTTPStatus.SERVICE_UNAVAILABLE
+            assert not configured.called
+
+            assert app.accounts == [account]
+            assert configured.call_count == 1
+
+    def test_ready_once_accounts_published(self):
+        account = Account(name="default", token=TEST_API_TOKEN)
+        app = Exporter(accounts=[account], port=0)
+        assert not app.is_ready()
+
+        account.progress.published = True
+
+        assert app.is_ready()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import io
+import unittest
+from functools import partial
+from http import HTTPStatus
+from unittest.mock import patch
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from prometheus_todoist_exporter.cache import CachingAdapter, ResponseCache
+from prometheus_todoist_exporter.scheduler import RequestScheduler, TokenBucket
+from tests import FakeClock
+
+PROJECTS_URL = "https://api.todoist.com/rest/v2/projects"
+TASKS_URL = "https://api.todoist.com/rest/v2/tasks"
+LABELS_URL = "https://api.todoist.com/rest/v2/labels"
+COMMENTS_URL = "https://api.todoist.com/rest/v2/comments?project_id=1"
+TTL = 300
+MAX_ENTRIES = 2
+POST_REQUESTS = 2
+BUDGET = 10
+
+
+def make_response(status_code=HTTPStatus.OK, content=b"[]", headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.raw = io.BytesIO(content)
+    response.headers.update(headers or {})
+    return response
+
+
+class TestCachingAdapter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.lookups = []
+        self.cache = ResponseCache(
+            MAX_ENTRIES,
+            ttls={"projects": TTL},
+            clock=self.clock,
+            on_lookup=lambda endpoint, result: self.lookups.append((endpoint, result)),
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", CachingAdapter(self.cache))
+        patcher = patch.object(HTTPAdapter, "send")
+        self.mock_send = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_fresh_response_served_without_request(self):
+        self.mock_send.return_value = make_response(content=b'[{"id": "1"}]')
+
+        self.session.get(PROJECTS_URL)
+        response = self.session.get(PROJECTS_URL)
+
+        self.mock_send.assert_called_once()
+        assert response.json() == [{"id": "1"}]
+        assert self.lookups == [("projects", "miss"), ("projects", "hit")]
+
+    def test_only_sent_requests_take_a_rate_limit_token(self):
+        scheduler = RequestScheduler(
+            TokenBucket(BUDGET, refill_rate=0), acquire_on_send=True
+        )
+        adapter = CachingAdapter(self.cache, before_send=scheduler.acquire_sending)
+        self.session.mount("https://", adapter)
+        self.mock_send.return_value = make_response()
+
+        for _ in range(3):
+            scheduler.call(partial(self.session.get, PROJECTS_URL))
+
+        self.mock_send.assert_called_once()
+        assert scheduler.bucket.remaining == BUDGET - 1
+
+    def test_expired_response_is_revalidated(self):
+        self.mock_send.side_effect = [
+            make_response(content=b'[{"id": "1"}]', headers={"ETag": '"v1"'}),
+            make_response(HTTPStatus.NOT_MODIFIED, content=b""),
+        ]
+
+        self.session.get(PROJECTS_URL)
+        self.clock.now += TTL
+        response = self.session.get(PROJECTS_URL)
+
+        request = self.mock_send.call_args.args[0]
+        assert request.headers["If-None-Match"] == '"v1"'
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == [{"id": "1"}]
+        assert self.lookups[-1] == ("projects", "revalidated")
+
+    def test_responses_without_ttl_or_validators_are_not_stored(self):
+        self.mock_send.return_value = make_response()
+
+        self.session.get(TASKS_URL)
+
+        assert len(self.cache) == 0
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.mock_send.side_effect = lambda *_args, **_kwargs: make_response()
+        urls = [f"{PROJECTS_URL}/{project_id}/collaborators" for project_id in "123"]
+        self.cache.ttls["collaborators"] = TTL
+
+        self.session.get(urls[0])
+        self.session.get(urls[1])
+        self.session.get(urls[0])
+        self.session.get(urls[2])
+
+        assert len(self.cache) == MAX_ENTRIES
+        assert self.cache.get(urls[0]) is not None
+        assert self.cache.get(urls[1]) is None
+
+    def test_other_methods_bypass_cache(self):
+        self.mock_send.return_value = make_response()
+
+        for _ in range(POST_REQUESTS):
+            self.session.post(PROJECTS_URL)
+
+        assert self.mock_send.call_count == POST_REQUESTS
+        assert not self.lookups
+
+    def test_restored_entries_are_revalidated(self):
+        self.mock_send.side_effect = [
+            make_response(content=b'[{"id": "1"}]', headers={"ETag": '"v1"'}),
+            make_response(),
+            make_response(HTTPStatus.NOT_MODIFIED, content=b""),
+        ]
+        self.cache.ttls["labels"] = TTL
+        self.session.get(PROJECTS_URL)
+        self.session.get(LABELS_URL)
+        assert len(self.cache) == MAX_ENTRIES
+
+        restored = ResponseCache(MAX_ENTRIES, ttls={"projects": TTL})
+        restored.restore(self.cache.dump())
+        self.session.mount("https://", CachingAdapter(restored))
+        response = self.session.get(PROJECTS_URL)
+
+        # Only the entry with a validator is kept, and it is not trusted blindly
+        assert len(restored) == 1
+        request = self.mock_send.call_args.args[0]
+        assert request.headers["If-None-Match"] == '"v1"'
+        assert response.json() == [{"id": "1"}]
+
+    def test_comments_and_collaborators_are_not_persisted(self):
+        self.mock_send.return_value = make_response(headers={"ETag": '"v1"'})
+
+        self.session.get(COMMENTS_URL)
+
+        assert len(self.cache) == 1
+        assert self.cache.dump() == []
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import re
+import unittest
+from collections import Counter
+
+from prometheus_todoist_exporter.cardinality import (
+    OTHER,
+    DimensionLimit,
+    cap_series,
+    limit_dimension,
+)
+from prometheus_todoist_exporter.metrics import MetricSet, MetricSpec
+
+TASKS = MetricSpec("tasks", "Tasks", ("project_name", "project_id", "priority"))
+PROJECT_LABELS = ("project_name", "project_id")
+WEIGHTS = {("Work", "1"): 10, ("Home", "2"): 5, ("Misc", "3"): 1, ("Secret", "4"): 7}
+MAX_SERIES = 2
+
+
+class TestDimensionLimit(unittest.TestCase):
+    def test_top_k_of_allowed_values(self):
+        limit = DimensionLimit(top_k=2, deny=re.compile("Secret"))
+
+        assert limit.select(WEIGHTS) == {("Work", "1"), ("Home", "2")}
+
+    def test_allow_list_must_match_whole_name(self):
+        limit = DimensionLimit(allow=re.compile("Wor"))
+
+        assert limit.select(WEIGHTS) == set()
+
+
+class TestLimitDimension(unittest.TestCase):
+    def setUp(self):
+        self.metrics = MetricSet((TASKS,))
+        for (name, project_id), count in WEIGHTS.items():
+            self.metrics.set(
+                TASKS, count, project_name=name, project_id=project_id, priority="1"
+            )
+            self.metrics.set(
+                TASKS, 1, project_name=name, project_id=project_id, priority="4"
+            )
+        self.dropped = Counter()
+
+    def test_other_values_are_summed_and_denied_values_removed(self):
+        limit = DimensionLimit(top_k=1, deny=re.compile("Secret"))
+
+        limit_dimension(
+            self.metrics,
+            TASKS,
+            PROJECT_LABELS,
+            limit,
+            limit.select(WEIGHTS),
+            self.dropped,
+        )
+
+        assert self.metrics.series(TASKS) == {
+            ("Work", "1", "1"): 10,
+            ("Work", "1", "4"): 1,
+            (OTHER, OTHER, "1"): 6,
+            (OTHER, OTHER, "4"): 2,
+        }
+        assert self.dropped == {("tasks", "other"): 4, ("tasks", "denied"): 2}
+
+    def test_cap_keeps_largest_series(self):
+        cap_series(self.metrics, TASKS, MAX_SERIES, self.dropped)
+
+        assert set(self.metrics.series(TASKS)) == {
+            ("Work", "1", "1"),
+            ("Secret", "4", "1"),
+        }
+        assert self.dropped == {("tasks", "max_series"): len(WEIGHTS) * 2 - MAX_SERIES}
+
+
+if __name__ == "__main__":
+    unittest.main()
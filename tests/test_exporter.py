@@ -1,16 +1,28 @@
+import asyncio
+import io
+import tempfile
+import threading
+import time
 import unittest
-from datetime import UTC, datetime
+from datetime import UTC, datetime, timedelta
 from http import HTTPStatus
 from unittest.mock import MagicMock, patch
 
+import pytest
+import requests
 from prometheus_client import REGISTRY
 
 from prometheus_todoist_exporter import exporter
+from prometheus_todoist_exporter.accounts import Account
+from prometheus_todoist_exporter.retention import Retention
+from prometheus_todoist_exporter.stages import StageSettings
+from prometheus_todoist_exporter.store import TaskStore
 
 # Constants for tests
 # Using a placeholder value for testing, not a real token
 TEST_API_TOKEN = "test_token"  # noqa: S105
-EXPECTED_API_CALLS = 3
+EXPECTED_API_CALLS = 1
+EXPECTED_PAGED_API_CALLS = 2
 EXPECTED_TASK_COUNT_WORK = 2
 EXPECTED_TASK_COUNT_URGENT = 2
 EXPECTED_TASK_COUNT_PERSONAL = 1
@@ -19,6 +31,15 @@ EXPECTED_SECTION2_TASKS = 1
 EXPECTED_TASKS_WITH_DUE_DATE = 1
 EXPECTED_RECURRING_TASKS = 1
 EXPECTED_OVERDUE_TASKS = 0
+EXPECTED_LABELS_IN_OTHER = 2
+TODAY = "2025-01-01"
+RESPONSE_PAIRS = 50
+WORKER_CYCLES = 2
+SYNC_OUTAGE_SECONDS = 30
+
+
+class StoppedError(Exception):
+    """Raised to leave the endless collection loop of a worker in tests."""
 
 
 class TestTodoistExporter(unittest.TestCase):
@@ -51,8 +72,14 @@ class TestTodoistExporter(unittest.TestCase):
         self.recurring_tasks = exporter.TODOIST_RECURRING_TASKS
         self.sync_api_completed_tasks = exporter.TODOIST_SYNC_API_COMPLETED_TASKS
 
-    @patch("prometheus_todoist_exporter.exporter.api")
-    def test_collect_projects(self, mock_api):
+        # Account with a mocked API client
+        self.account = Account(name="default", token=TEST_API_TOKEN)
+        self.account.api = MagicMock()
+        self.account.session = MagicMock()
+
+    def test_collect_projects(self):
+        mock_api = self.account.api
+
         # Mock data
         mock_project = MagicMock()
         mock_project.id = "123456"
@@ -60,33 +87,38 @@ class TestTodoistExporter(unittest.TestCase):
         mock_api.get_projects.return_value = [mock_project]
 
         # Test function
-        result = exporter.collect_projects()
+        result = exporter.collect_projects(self.account)
 
         # Verify results
         assert len(result) == 1
         assert result["123456"]["name"] == "Test Project"
         mock_api.get_projects.assert_called_once()
 
-    @patch("prometheus_todoist_exporter.exporter.api")
-    def test_collect_projects_with_error(self, mock_api):
+    def test_collect_projects_with_error(self):
+        mock_api = self.account.api
+
         # Mock error
         mock_api.get_projects.side_effect = Exception("API Error")
 
         # Test function
-        result = exporter.collect_projects()
+        result = exporter.collect_projects(self.account)
 
         # Verify results
         assert len(result) == 0
         mock_api.get_projects.assert_called_once()
         assert self.api_errors.labels(endpoint="get_projects")._value.get() == 1
 
-    @patch("prometheus_todoist_exporter.exporter.api")
-    def test_collect_tasks(self, mock_api):
+    def test_collect_tasks(self):
+        mock_api = self.account.api
+
         # Mock data
         mock_task = MagicMock()
         mock_task.id = "789"
         mock_task.project_id = "123456"
+        mock_task.section_id = None
         mock_task.priority = 4
+        mock_task.labels = ["work"]
+        mock_task.created_at = "2025-01-01T00:00:00Z"
         mock_task.due = MagicMock()
         mock_task.due.date = datetime.now(UTC).strftime("%Y-%m-%d")
 
@@ -105,15 +137,17 @@ class TestTodoistExporter(unittest.TestCase):
         }
 
         # Test function
-        exporter.collect_tasks(projects_dict)
+        exporter.collect_tasks(self.account, projects_dict)
 
         # Verify results
         assert len(projects_dict["123456"]["tasks"]) == 1
         assert projects_dict["123456"]["tasks"][0].id == "789"
+        assert projects_dict["123456"]["tasks"][0].labels == ("work",)
         mock_api.get_tasks.assert_called_once()
 
-    @patch("prometheus_todoist_exporter.exporter.api")
-    def test_collect_tasks_with_error(self, mock_api):
+    def test_collect_tasks_with_error(self):
+        mock_api = self.account.api
+
         # Mock error
         mock_api.get_tasks.side_effect = Exception("API Error")
 
@@ -130,15 +164,16 @@ class TestTodoistExporter(unittest.TestCase):
         }
 
         # Test function
-        exporter.collect_tasks(projects_dict)
+        exporter.collect_tasks(self.account, projects_dict)
 
         # Verify results
         assert len(projects_dict["123456"]["tasks"]) == 0
         mock_api.get_tasks.assert_called_once()
         assert self.api_errors.labels(endpoint="get_tasks")._value.get() == 1
 
-    @patch("prometheus_todoist_exporter.exporter.api")
-    def test_collect_collaborators(self, mock_api):
+    def test_collect_collaborators(self):
+        mock_api = self.account.api
+
         # Mock data
         mock_collaborator = MagicMock()
         mock_collaborator.id = "user1"
@@ -159,14 +194,60 @@ class TestTodoistExporter(unittest.TestCase):
         }
 
         # Test function
-        exporter.collect_collaborators(projects_dict)
+        exporter.collect_collaborators(self.account, projects_dict)
 
         # Verify results
         assert len(projects_dict["123456"]["collaborators"]) == 1
         mock_api.get_collaborators.assert_called_once_with(project_id="123456")
 
-    @patch("prometheus_todoist_exporter.exporter.requests.post")
-    def test_collect_completed_tasks_sync_api(self, mock_post):
+    def test_collect_comments_with_partial_error(self):
+        mock_api = self.account.api
+
+        # Mock one failing project among several
+        api_error = Exception("API Error")
+
+        def get_comments(project_id):
+            if project_id == "789012":
+                raise api_error
+            return [MagicMock()]
+
+        mock_api.get_comments.side_effect = get_comments
+
+        # Test data
+        projects_dict = {
+            project_id: {
+                "id": project_id,
+                "name": name,
+                "tasks": [],
+                "collaborators": [],
+                "sections": [],
+                "comments": [],
+            }
+            for project_id, name in [
+                ("123456", "Test Project"),
+                ("789012", "Another Project"),
+                ("345678", "Third Project"),
+            ]
+        }
+
+        # Test function
+        exporter.collect_comments(self.account, projects_dict)
+
+        # Verify results
+        assert len(projects_dict["123456"]["comments"]) == 1
+        assert len(projects_dict["345678"]["comments"]) == 1
+        assert projects_dict["789012"]["comments"] == []
+        assert self.api_errors.labels(endpoint="get_comments")._value.get() == 1
+        assert (
+            exporter.TODOIST_API_REQUEST_DURATION.labels(
+                endpoint="get_comments"
+            )._sum.get()
+            > 0
+        )
+
+    def test_collect_completed_tasks_sync_api(self):
+        mock_post = self.account.session.post
+
         # Mock the requests response
         mock_response = MagicMock()
         mock_response.status_code = HTTPStatus.OK
@@ -199,70 +280,159 @@ class TestTodoistExporter(unittest.TestCase):
             },
         }
 
-        # Set API token for test
-        original_token = exporter.TODOIST_API_TOKEN
-        exporter.TODOIST_API_TOKEN = TEST_API_TOKEN
+        # Test function
+        metrics = exporter.MetricSet(exporter.SNAPSHOT_METRICS)
+        exporter.collect_completed_tasks_sync_api(self.account, projects_dict, metrics)
 
-        try:
-            # Test function
-            exporter.collect_completed_tasks_sync_api(projects_dict)
+        # Verify results for today, last N days, and last N hours
+        assert mock_post.call_count == EXPECTED_API_CALLS
 
-            # Verify results for today, last N days, and last N hours
-            assert mock_post.call_count == EXPECTED_API_CALLS
+        # Check that metrics were set
+        assert (
+            metrics.get(
+                self.sync_api_completed_tasks,
+                project_name="Test Project",
+                project_id="123456",
+                timeframe="today",
+            )
+            == EXPECTED_TASK_COUNT_WORK
+        )
 
-            # Check that metrics were set
-            assert (
-                self.sync_api_completed_tasks.labels(
-                    project_name="Test Project", project_id="123456", timeframe="today"
-                )._value.get()
-                == EXPECTED_TASK_COUNT_WORK
+        assert (
+            metrics.get(
+                self.sync_api_completed_tasks,
+                project_name="Another Project",
+                project_id="789012",
+                timeframe="today",
             )
+            == 1
+        )
+
+    def test_collect_completed_tasks_sync_api_pagination(self):
+        mock_post = self.account.session.post
+
+        now = datetime.now(UTC)
+        old = (now - timedelta(days=exporter.COMPLETED_TASKS_DAYS - 1)).isoformat()
+
+        # First page is full, second page is short and ends pagination
+        full_page = MagicMock()
+        full_page.status_code = HTTPStatus.OK
+        full_page.json.return_value = {
+            "items": [{"project_id": "123456", "completed_at": old}]
+            * exporter.COMPLETED_TASKS_PAGE_SIZE
+        }
+        last_page = MagicMock()
+        last_page.status_code = HTTPStatus.OK
+        last_page.json.return_value = {
+            "items": [{"project_id": "123456", "completed_at": now.isoformat()}]
+        }
+        mock_post.side_effect = [full_page, last_page]
+
+        # Test data
+        projects_dict = {
+            "123456": {
+                "id": "123456",
+                "name": "Test Project",
+                "tasks": [],
+                "collaborators": [],
+                "sections": [],
+                "comments": [],
+            }
+        }
+
+        metrics = exporter.MetricSet(exporter.SNAPSHOT_METRICS)
+        exporter.collect_completed_tasks_sync_api(self.account, projects_dict, metrics)
+
+        assert mock_post.call_count == EXPECTED_PAGED_API_CALLS
+        assert (
+            mock_post.call_args.kwargs["json"]["offset"]
+            == exporter.COMPLETED_TASKS_PAGE_SIZE
+        )
 
-            assert (
-                self.sync_api_completed_tasks.labels(
-                    project_name="Another Project",
-                    project_id="789012",
-                    timeframe="today",
-                )._value.get()
-                == 1
+        # Older completions only count towards the N days window
+        assert (
+            metrics.get(
+                self.sync_api_completed_tasks,
+                project_name="Test Project",
+                project_id="123456",
+                timeframe="today",
+            )
+            == 1
+        )
+        assert (
+            metrics.get(
+                self.sync_api_completed_tasks,
+                project_name="Test Project",
+                project_id="123456",
+                timeframe=f"{exporter.COMPLETED_TASKS_DAYS}_days",
             )
-        finally:
-            # Restore original token
-            exporter.TODOIST_API_TOKEN = original_token
+            == exporter.COMPLETED_TASKS_PAGE_SIZE + 1
+        )
 
-    @patch("prometheus_todoist_exporter.exporter.api")
-    def test_collect_label_metrics(self, mock_api):
-        # Mock data
-        mock_task1 = MagicMock()
-        mock_task1.labels = ["work", "urgent"]
+    def test_completed_tasks_fetched_since_high_water_mark(self):
+        mock_post = self.account.session.post
+        completed_at = datetime.now(UTC).replace(microsecond=0)
+        first_page = MagicMock(status_code=HTTPStatus.OK)
+        first_page.json.return_value = {
+            "items": [
+                {
+                    "id": "1",
+                    "project_id": "123456",
+                    "completed_at": completed_at.isoformat(),
+                }
+            ]
+        }
+        mock_post.return_value = first_page
+        projects_dict = {"123456": {"id": "123456", "name": "Test Project"}}
+        labels = {"project_name": "Test Project", "project_id": "123456"}
 
-        mock_task2 = MagicMock()
-        mock_task2.labels = ["personal", "urgent"]
+        exporter.collect_completed_tasks_sync_api(
+            self.account, projects_dict, exporter.MetricSet(exporter.SNAPSHOT_METRICS)
+        )
+        metrics = exporter.MetricSet(exporter.SNAPSHOT_METRICS)
+        exporter.collect_completed_tasks_sync_api(self.account, projects_dict, metrics)
 
-        mock_task3 = MagicMock()
-        mock_task3.labels = ["work"]
+        since = mock_post.call_args.kwargs["json"]["since"]
+        assert since == completed_at.strftime("%Y-%m-%dT%H:%M:%S")
+        assert (
+            metrics.get(self.sync_api_completed_tasks, timeframe="today", **labels) == 1
+        )
+        assert (
+            metrics.get(exporter.TODOIST_TASKS_COMPLETED_WINDOW, window="1h", **labels)
+            == 1
+        )
+        assert metrics.get(exporter.TODOIST_TASKS_COMPLETED_RATE, window="1h") == 1
 
-        mock_api.get_tasks.return_value = [mock_task1, mock_task2, mock_task3]
+    def test_collect_label_metrics(self):
+        # Mock data
+        tasks = TaskStore()
+        tasks.add_item(
+            {"id": "1", "project_id": "123456", "labels": ["work", "urgent"]}
+        )
+        tasks.add_item(
+            {"id": "2", "project_id": "123456", "labels": ["personal", "urgent"]}
+        )
+        tasks.add_item({"id": "3", "project_id": "123456", "labels": ["work"]})
 
         # Test function
-        exporter.collect_label_metrics()
+        metrics = exporter.MetricSet(exporter.SNAPSHOT_METRICS)
+        counts = exporter.aggregate_tasks(tasks, TODAY)
+        exporter.collect_label_metrics(counts, metrics)
 
         # Verify results
         assert (
-            self.label_tasks.labels(label_name="work")._value.get()
-            == EXPECTED_TASK_COUNT_WORK
+            metrics.get(self.label_tasks, label_name="work") == EXPECTED_TASK_COUNT_WORK
         )
         assert (
-            self.label_tasks.labels(label_name="urgent")._value.get()
+            metrics.get(self.label_tasks, label_name="urgent")
             == EXPECTED_TASK_COUNT_URGENT
         )
         assert (
-            self.label_tasks.labels(label_name="personal")._value.get()
+            metrics.get(self.label_tasks, label_name="personal")
             == EXPECTED_TASK_COUNT_PERSONAL
         )
 
-    @patch("prometheus_todoist_exporter.exporter.api")
-    def test_collect_section_tasks(self, mock_api):
+    def test_collect_section_tasks(self):
         # Mock section data
         mock_section1 = MagicMock()
         mock_section1.id = "section1"
@@ -275,24 +445,12 @@ class TestTodoistExporter(unittest.TestCase):
         mock_section2.project_id = "123456"
 
         # Mock task data
-        mock_task1 = MagicMock()
-        mock_task1.section_id = "section1"
-
-        mock_task2 = MagicMock()
-        mock_task2.section_id = "section1"
-
-        mock_task3 = MagicMock()
-        mock_task3.section_id = "section2"
-
-        mock_task4 = MagicMock()
-        mock_task4.section_id = None
-
-        mock_api.get_tasks.return_value = [
-            mock_task1,
-            mock_task2,
-            mock_task3,
-            mock_task4,
-        ]
+        tasks = TaskStore()
+        for task_id, section_id in enumerate(["section1", "section1", "section2"]):
+            tasks.add_item(
+                {"id": str(task_id), "project_id": "123456", "section_id": section_id}
+            )
+        tasks.add_item({"id": "4", "project_id": "123456", "section_id": None})
 
         # Test data
         projects_dict = {
@@ -307,31 +465,36 @@ class TestTodoistExporter(unittest.TestCase):
         }
 
         # Test function
-        exporter.collect_section_tasks(projects_dict)
+        metrics = exporter.MetricSet(exporter.SNAPSHOT_METRICS)
+        counts = exporter.aggregate_tasks(tasks, TODAY)
+        exporter.collect_section_tasks(projects_dict, counts, metrics)
 
         # Verify results
         assert (
-            self.section_tasks.labels(
+            metrics.get(
+                self.section_tasks,
                 project_name="Test Project",
                 project_id="123456",
                 section_name="To Do",
                 section_id="section1",
-            )._value.get()
+            )
             == EXPECTED_SECTION1_TASKS
         )
 
         assert (
-            self.section_tasks.labels(
+            metrics.get(
+                self.section_tasks,
                 project_name="Test Project",
                 project_id="123456",
                 section_name="In Progress",
                 section_id="section2",
-            )._value.get()
+            )
             == EXPECTED_SECTION2_TASKS
         )
 
-    @patch("prometheus_todoist_exporter.exporter.api")
-    def test_collect_metrics_complete(self, mock_api):
+    def test_collect_metrics_complete(self):
+        mock_api = self.account.api
+
         # Mock projects
         mock_project = MagicMock()
         mock_project.id = "123456"
@@ -344,6 +507,7 @@ class TestTodoistExporter(unittest.TestCase):
         mock_task.project_id = "123456"
         mock_task.priority = 4
         mock_task.labels = ["work", "urgent"]
+        mock_task.created_at = "2025-01-01T00:00:00Z"
         mock_task.due = MagicMock()
         today = datetime.now(UTC).strftime("%Y-%m-%d")
         mock_task.due.date = today
@@ -368,62 +532,430 @@ class TestTodoistExporter(unittest.TestCase):
         mock_api.get_comments.return_value = [mock_comment, mock_comment]
 
         # Mock requests
-        with patch("prometheus_todoist_exporter.exporter.requests.post") as mock_post:
-            mock_response = MagicMock()
-            mock_response.status_code = HTTPStatus.OK
-            mock_response.json.return_value = {
-                "items": [
-                    {
-                        "project_id": "123456",
-                        "completed_at": datetime.now(UTC).isoformat(),
-                    },
-                    {
-                        "project_id": "123456",
-                        "completed_at": datetime.now(UTC).isoformat(),
-                    },
-                ]
+        mock_post = self.account.session.post
+        mock_response = MagicMock()
+        mock_response.status_code = HTTPStatus.OK
+        mock_response.json.return_value = {
+            "items": [
+                {
+                    "project_id": "123456",
+                    "completed_at": datetime.now(UTC).isoformat(),
+                },
+                {
+                    "project_id": "123456",
+                    "completed_at": datetime.now(UTC).isoformat(),
+                },
+            ]
+        }
+        mock_post.return_value = mock_response
+
+        # Run collection
+        exporter.collect_metrics(self.account)
+        metrics = exporter.COLLECTOR.published(self.account.name)
+
+        # Verify metrics
+        assert (
+            metrics.get(
+                self.tasks_total,
+                project_name="Test Project",
+                project_id="123456",
+            )
+            == 1
+        )
+
+        assert (
+            metrics.get(
+                self.tasks_with_due_date,
+                project_name="Test Project",
+                project_id="123456",
+            )
+            == EXPECTED_TASKS_WITH_DUE_DATE
+        )
+
+        assert (
+            metrics.get(
+                self.recurring_tasks,
+                project_name="Test Project",
+                project_id="123456",
+            )
+            == EXPECTED_RECURRING_TASKS
+        )
+
+        assert (
+            metrics.get(
+                self.tasks_overdue,
+                project_name="Test Project",
+                project_id="123456",
+            )
+            == EXPECTED_OVERDUE_TASKS
+        )
+
+        # Label and section counts come from the same task listing
+        mock_api.get_tasks.assert_called_once()
+        assert metrics.get(self.label_tasks, label_name="work") == 1
+        assert (
+            metrics.get(
+                self.section_tasks,
+                project_name="Test Project",
+                project_id="123456",
+                section_name="To Do",
+                section_id="section1",
+            )
+            == 1
+        )
+        # The task was created long ago, so it is only in the +Inf age bucket
+        age = metrics.get(
+            exporter.TODOIST_TASK_AGE, project_name="Test Project", project_id="123456"
+        )
+        assert age.counts[-2:] == (0, 1)
+
+    def test_collect_snapshot_incremental(self):
+        mock_api = self.account.api
+        mock_sync_state = self.account.sync_state = MagicMock()
+        mock_task = MagicMock()
+        mock_sync_state.build_projects.return_value = (
+            {"123456": {"id": "123456", "name": "Test Project", "tasks": [mock_task]}},
+            [mock_task],
+            [],
+        )
+
+        snapshot = exporter.collect_snapshot(self.account)
+
+        mock_sync_state.sync.assert_called_once()
+        mock_api.get_tasks.assert_not_called()
+        assert snapshot.tasks == [mock_task]
+
+    def test_collect_snapshot_incremental_with_error(self):
+        mock_sync_state = self.account.sync_state = MagicMock()
+        mock_sync_state.sync.side_effect = Exception("API Error")
+        mock_sync_state.is_synced = False
+
+        assert exporter.collect_snapshot(self.account) is None
+        assert self.api_errors.labels(endpoint="sync")._value.get() == 1
+
+    def test_failed_sync_ages_synced_families(self):
+        now = [1000.0]
+        account = Account(
+            name="sync-failure", token=TEST_API_TOKEN, incremental_sync=True
+        )
+        account.session = self.account.session
+        account.retention = Retention(60, clock=lambda: now[0])
+        self.mock_rest_api()
+        account.sync_state.apply(
+            {
+                "full_sync": True,
+                "sync_token": "token-1",
+                "projects": [{"id": "123456", "name": "Test Project"}],
+                "items": [{"id": "1", "project_id": "123456"}],
             }
-            mock_post.return_value = mock_response
-
-            # Set API token for test
-            original_token = exporter.TODOIST_API_TOKEN
-            exporter.TODOIST_API_TOKEN = TEST_API_TOKEN
-
-            try:
-                # Run collection
-                exporter.collect_metrics()
-
-                # Verify metrics
-                assert (
-                    self.tasks_total.labels(
-                        project_name="Test Project", project_id="123456"
-                    )._value.get()
-                    == 1
-                )
-
-                assert (
-                    self.tasks_with_due_date.labels(
-                        project_name="Test Project", project_id="123456"
-                    )._value.get()
-                    == EXPECTED_TASKS_WITH_DUE_DATE
-                )
-
-                assert (
-                    self.recurring_tasks.labels(
-                        project_name="Test Project", project_id="123456"
-                    )._value.get()
-                    == EXPECTED_RECURRING_TASKS
-                )
-
-                assert (
-                    self.tasks_overdue.labels(
-                        project_name="Test Project", project_id="123456"
-                    )._value.get()
-                    == EXPECTED_OVERDUE_TASKS
-                )
-            finally:
-                # Restore original token
-                exporter.TODOIST_API_TOKEN = original_token
+        )
+
+        with patch.object(account.sync_state, "sync"):
+            exporter.collect_metrics(account)
+        now[0] += SYNC_OUTAGE_SECONDS
+        with patch.object(account.sync_state, "sync", side_effect=Exception("down")):
+            exporter.collect_metrics(account)
+
+        assert account.retention.age(self.tasks_total.name) == SYNC_OUTAGE_SECONDS
+
+    def test_collect_metrics_keeps_published_metrics_on_error(self):
+        now = [1000.0]
+        self.account.retention = Retention(60, clock=lambda: now[0])
+        labels = {"project_name": "Test Project", "project_id": "123456"}
+        published = exporter.MetricSet(exporter.SNAPSHOT_METRICS)
+        published.set(self.tasks_total, 1, **labels)
+        exporter.COLLECTOR.publish(published, source=self.account.name)
+        self.account.retention.mark_refreshed([self.tasks_total.name], now[0])
+
+        with patch.object(exporter, "collect_snapshot", return_value=None):
+            exporter.collect_metrics(self.account)
+            kept = exporter.COLLECTOR.published(self.account.name)
+            # Series older than the staleness bound are dropped
+            now[0] += 61
+            exporter.collect_metrics(self.account)
+
+        assert kept.get(self.tasks_total, **labels) == 1
+        published = exporter.COLLECTOR.published(self.account.name)
+        assert published.get(self.tasks_total, **labels) is None
+
+    def test_collection_stages_are_instrumented(self):
+        mock_api = self.account.api
+        mock_project = MagicMock()
+        mock_project.id = "123456"
+        mock_project.name = "Test Project"
+        mock_api.get_projects.return_value = [mock_project]
+        mock_api.get_tasks.return_value = []
+        mock_api.get_collaborators.return_value = []
+        mock_api.get_sections.return_value = []
+        mock_api.get_comments.side_effect = Exception("API Error")
+        self.account.session.post.return_value.status_code = HTTPStatus.OK
+        self.account.session.post.return_value.json.return_value = {"items": []}
+        last_success = exporter.TODOIST_COLLECTION_STAGE_LAST_SUCCESS
+        last_success.clear()
+
+        exporter.collect_metrics(self.account)
+
+        succeeded = {
+            sample.labels["stage"] for sample in last_success.collect()[0].samples
+        }
+        assert succeeded == {
+            "projects",
+            "tasks",
+            "collaborators",
+            "sections",
+            "completed_tasks",
+            "aggregation",
+            "publish",
+        }
+        assert (
+            exporter.TODOIST_COLLECTED_ITEMS.labels(resource="projects")._value.get()
+            == 1
+        )
+
+    def test_response_sizes_exclude_cached_responses(self):
+        account = Account(name="sizes", token=TEST_API_TOKEN)
+        exporter.instrument_account(account)
+        record_response_size = account.session.hooks["response"][-1]
+        response_size = exporter.TODOIST_API_RESPONSE_SIZE
+        response_size.clear()
+
+        response = requests.Response()
+        response.url = "https://api.todoist.com/rest/v2/projects"
+        response.raw = io.BytesIO(b"[]" * RESPONSE_PAIRS)
+        record_response_size(response)
+        cached = requests.Response()
+        cached.url = response.url
+        cached.from_cache = True
+        record_response_size(cached)
+
+        histogram = response_size.labels(endpoint="projects")
+        assert histogram._sum.get() == RESPONSE_PAIRS * 2
+
+    def test_state_restored_after_restart(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = patch.object(exporter, "STATE_DIR", directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        saved = Account(name="default", token=TEST_API_TOKEN, incremental_sync=True)
+        saved.sync_state.sync_token = "token-1"  # noqa: S105
+        metrics = exporter.MetricSet(exporter.SNAPSHOT_METRICS)
+        metrics.set(
+            self.tasks_total, 3, project_name="Test Project", project_id="123456"
+        )
+        exporter.save_account_state(saved, metrics)
+
+        account = Account(name="default", token=TEST_API_TOKEN, incremental_sync=True)
+        assert exporter.restore_account_state(account)
+
+        restored = exporter.COLLECTOR.published(account.name)
+        assert (
+            restored.get(
+                self.tasks_total, project_name="Test Project", project_id="123456"
+            )
+            == 3  # noqa: PLR2004
+        )
+        assert exporter.TODOIST_METRICS_STALE._value.get() == 1
+        assert account.sync_state.sync_token == "token-1"  # noqa: S105
+
+    def test_ready_once_metrics_published(self):
+        accounts = [self.account]
+        assert not exporter.is_ready(accounts)
+
+        with patch.object(
+            exporter, "collect_snapshot", return_value=exporter.TodoistSnapshot()
+        ):
+            exporter.collect_metrics(self.account)
+
+        assert exporter.is_ready(accounts)
+        assert exporter.is_ready([])
+
+    def test_ready_before_first_scrape_when_collecting_on_scrape(self):
+        with patch.object(exporter, "COLLECT_ON_SCRAPE", new=True):
+            assert exporter.is_ready([self.account])
+
+    def test_unhealthy_when_cycle_stalls(self):
+        accounts = [self.account]
+        assert exporter.is_healthy(accounts)
+
+        self.account.progress.running_since = (
+            time.monotonic() - exporter.COLLECTION_STALL_TIMEOUT - 1
+        )
+
+        assert not exporter.is_healthy(accounts)
+
+    def test_worker_keeps_collecting_after_errors(self):
+        with (
+            patch.object(
+                exporter, "collect_metrics", side_effect=[Exception("boom"), None]
+            ) as collect_metrics,
+            patch.object(exporter.time, "sleep", side_effect=[None, StoppedError]),
+            pytest.raises(StoppedError),
+        ):
+            exporter.run_account_worker(self.account)
+
+        assert collect_metrics.call_count == WORKER_CYCLES
+
+    def test_missing_state_is_not_restored(self):
+        with (
+            tempfile.TemporaryDirectory() as directory,
+            patch.object(exporter, "STATE_DIR", directory),
+        ):
+            assert not exporter.restore_account_state(self.account)
+
+    def test_collect_metrics_async_fetches_independent_stages_concurrently(self):
+        mock_api = self.account.api
+        tasks_requested = threading.Event()
+        mock_project = MagicMock()
+        mock_project.id = "123456"
+        mock_project.name = "Test Project"
+        mock_task = MagicMock(
+            project_id="123456",
+            section_id=None,
+            labels=[],
+            created_at="2025-01-01T00:00:00Z",
+        )
+        mock_task.due = None
+
+        def get_projects():
+            # Only returns if tasks are listed while projects are fetched
+            assert tasks_requested.wait(timeout=5)
+            return [mock_project]
+
+        def get_tasks():
+            tasks_requested.set()
+            return [mock_task]
+
+        mock_api.get_projects.side_effect = get_projects
+        mock_api.get_tasks.side_effect = get_tasks
+        mock_api.get_collaborators.return_value = []
+        mock_api.get_sections.return_value = []
+        mock_api.get_comments.return_value = []
+        self.account.session.post.return_value.status_code = HTTPStatus.OK
+        self.account.session.post.return_value.json.return_value = {"items": []}
+
+        asyncio.run(exporter.collect_metrics_async(self.account))
+
+        published = exporter.COLLECTOR.published(self.account.name)
+        assert (
+            published.get(
+                self.tasks_total, project_name="Test Project", project_id="123456"
+            )
+            == 1
+        )
+
+    def mock_rest_api(self):
+        mock_api = self.account.api
+        mock_project = MagicMock()
+        mock_project.id = "123456"
+        mock_project.name = "Test Project"
+        mock_api.get_projects.return_value = [mock_project]
+        mock_api.get_tasks.return_value = []
+        mock_api.get_collaborators.return_value = []
+        mock_api.get_sections.return_value = []
+        mock_api.get_comments.return_value = []
+        self.account.session.post.return_value.status_code = HTTPStatus.OK
+        self.account.session.post.return_value.json.return_value = {"items": []}
+        return mock_api
+
+    def test_disabled_stages_are_skipped(self):
+        account = Account(
+            name="stages",
+            token=TEST_API_TOKEN,
+            stages={"comments": StageSettings(enabled=False)},
+        )
+        account.api = self.account.api
+        account.session = self.account.session
+        mock_api = self.mock_rest_api()
+
+        exporter.collect_metrics(account)
+
+        mock_api.get_comments.assert_not_called()
+        published = exporter.COLLECTOR.published(account.name)
+        labels = {"project_name": "Test Project", "project_id": "123456"}
+        assert published.get(self.comments_total, **labels) is None
+        assert published.get(self.sections_total, **labels) == 0
+
+    def test_stage_results_reused_within_interval(self):
+        account = Account(
+            name="intervals",
+            token=TEST_API_TOKEN,
+            stages={"collaborators": StageSettings(interval=3600)},
+        )
+        account.api = self.account.api
+        account.session = self.account.session
+        mock_api = self.mock_rest_api()
+
+        exporter.collect_metrics(account)
+        exporter.collect_metrics(account)
+
+        mock_api.get_collaborators.assert_called_once()
+        assert mock_api.get_comments.call_count == EXPECTED_PAGED_API_CALLS
+
+    def test_failed_project_keeps_last_good_series(self):
+        account = Account(name="retention", token=TEST_API_TOKEN)
+        account.api = self.account.api
+        account.session = self.account.session
+        mock_api = self.mock_rest_api()
+        mock_api.get_collaborators.return_value = [MagicMock(), MagicMock()]
+        labels = {"project_name": "Test Project", "project_id": "123456"}
+
+        exporter.collect_metrics(account)
+        mock_api.get_collaborators.side_effect = Exception("API Error")
+        mock_api.get_comments.return_value = [MagicMock()]
+        exporter.collect_metrics(account)
+
+        published = exporter.COLLECTOR.published(account.name)
+        assert published.get(self.project_collaborators, **labels) == len(
+            mock_api.get_collaborators.return_value
+        )
+        assert published.get(self.comments_total, **labels) == 1
+
+    def test_failed_stage_series_dropped_past_max_staleness(self):
+        now = [1000.0]
+        account = Account(name="staleness", token=TEST_API_TOKEN)
+        account.api = self.account.api
+        account.session = self.account.session
+        account.retention = Retention(60, clock=lambda: now[0])
+        mock_api = self.mock_rest_api()
+        labels = {"project_name": "Test Project", "project_id": "123456"}
+
+        exporter.collect_metrics(account)
+        mock_api.get_tasks.side_effect = Exception("API Error")
+        now[0] += 61
+        exporter.collect_metrics(account)
+
+        published = exporter.COLLECTOR.published(account.name)
+        assert published.get(self.tasks_total, **labels) is None
+        assert not published.series(self.priority_tasks)
+        assert published.get(self.sections_total, **labels) == 0
+
+    def test_label_cardinality_limited_to_top_labels(self):
+        tasks = TaskStore()
+        tasks.add_item(
+            {"id": "1", "project_id": "123456", "labels": ["work", "urgent"]}
+        )
+        tasks.add_item(
+            {"id": "2", "project_id": "123456", "labels": ["personal", "urgent"]}
+        )
+        tasks.add_item({"id": "3", "project_id": "123456", "labels": ["work"]})
+        metrics = exporter.MetricSet(exporter.SNAPSHOT_METRICS)
+        counts = exporter.aggregate_tasks(tasks, TODAY)
+        exporter.collect_label_metrics(counts, metrics)
+
+        with patch.object(exporter, "LABEL_LIMIT", exporter.DimensionLimit(top_k=1)):
+            exporter.limit_cardinality({}, counts, metrics)
+
+        assert metrics.series(self.label_tasks) == {
+            ("urgent",): EXPECTED_TASK_COUNT_URGENT,
+            ("other",): EXPECTED_TASK_COUNT_WORK + EXPECTED_TASK_COUNT_PERSONAL,
+        }
+        dropped = metrics.get(
+            exporter.TODOIST_DROPPED_SERIES,
+            family="todoist_label_tasks",
+            reason="other",
+        )
+        assert dropped == EXPECTED_LABELS_IN_OTHER
 
 
 if __name__ == "__main__":
@@ -0,0 +1,74 @@
+import gzip
+import unittest
+from unittest.mock import patch
+
+from prometheus_client import CollectorRegistry, Counter
+
+from prometheus_todoist_exporter.exposition import OPENMETRICS_EOF, Exposition
+from prometheus_todoist_exporter.metrics import MetricSet, MetricSpec, SnapshotCollector
+
+TASKS = MetricSpec("test_tasks", "Number of tasks", ("project_name",))
+EXPECTED_TASKS = 3
+SCRAPES = 3
+
+
+class TestExposition(unittest.TestCase):
+    def setUp(self):
+        self.collector = SnapshotCollector((TASKS,))
+        self.registry = CollectorRegistry()
+        self.requests = Counter("test_requests", "Requests", registry=self.registry)
+        self.exposition = Exposition(self.collector, self.registry)
+        self.publish(EXPECTED_TASKS)
+
+    def publish(self, value):
+        metrics = MetricSet((TASKS,))
+        metrics.set(TASKS, value, project_name="Inbox")
+        self.collector.publish(metrics)
+
+    def test_snapshot_rendered_once_per_publish(self):
+        with patch.object(
+            self.exposition,
+            "_render_snapshot",
+            wraps=self.exposition._render_snapshot,
+        ) as render_snapshot:
+            for _ in range(SCRAPES):
+                payload = self.exposition.render()
+            assert render_snapshot.call_count == 1
+
+            self.publish(EXPECTED_TASKS + 1)
+            self.exposition.render()
+            assert render_snapshot.call_count == SCRAPES - 1
+
+        body = payload.body.decode()
+        assert f'test_tasks{{project_name="Inbox"}} {EXPECTED_TASKS}.0' in body
+        assert "test_requests_total 0.0" in body
+
+    def test_gzip_payload_matches_plain_payload(self):
+        plain = self.exposition.render()
+        compressed = self.exposition.render(compress=True)
+
+        assert compressed.content_encoding == "gzip"
+        assert gzip.decompress(compressed.body) == plain.body
+        assert compressed.etag != plain.etag
+
+    def test_openmetrics_payload_ends_once(self):
+        payload = self.exposition.render(openmetrics=True)
+
+        assert payload.content_type.startswith("application/openmetrics-text")
+        assert payload.body.endswith(OPENMETRICS_EOF)
+        assert payload.body.count(OPENMETRICS_EOF) == 1
+
+    def test_etag_changes_with_body(self):
+        etag = self.exposition.render().etag
+        assert self.exposition.render().etag == etag
+
+        self.requests.inc()
+        live_etag = self.exposition.render().etag
+        assert live_etag != etag
+
+        self.publish(EXPECTED_TASKS + 1)
+        assert self.exposition.render().etag != live_etag
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+from datetime import UTC, datetime
+
+import pytest
+
+from prometheus_todoist_exporter.history import (
+    DAY_SECONDS,
+    CompletionHistory,
+    parse_duration,
+    rolling,
+    since_midnight,
+)
+from tests import FakeClock
+
+HOUR = 3600
+# Noon UTC on 2025-01-02
+NOON = 1735819200.0
+EXPECTED_DAY_COMPLETIONS = 2
+
+
+def completion(seconds_ago, project_id="1", item_id=None):
+    completed_at = datetime.fromtimestamp(NOON - seconds_ago, UTC).isoformat()
+    item = {"project_id": project_id, "completed_at": completed_at}
+    if item_id:
+        item["id"] = item_id
+    return item
+
+
+class TestCompletionHistory(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(NOON)
+        self.history = CompletionHistory(
+            {
+                "1h": rolling(HOUR),
+                "24h": rolling(DAY_SECONDS),
+                "today": since_midnight(),
+            },
+            span=DAY_SECONDS,
+            clock=self.clock,
+        )
+
+    def test_windows_count_recorded_completions(self):
+        self.history.record(
+            [completion(10 * 60), completion(3 * HOUR), completion(20 * HOUR, "2")]
+        )
+
+        assert self.history.count("1h", "1") == 1
+        assert self.history.count("today", "1") == EXPECTED_DAY_COMPLETIONS
+        assert self.history.counts("24h") == {"1": EXPECTED_DAY_COMPLETIONS, "2": 1}
+        assert self.history.count("today", "2") == 0
+
+    def test_completions_leave_windows_as_time_passes(self):
+        self.history.record([completion(10 * 60), completion(3 * HOUR)])
+
+        self.clock.now += HOUR
+        self.history.advance()
+
+        assert self.history.count("1h", "1") == 0
+        assert self.history.count("24h", "1") == EXPECTED_DAY_COMPLETIONS
+
+        self.clock.now += DAY_SECONDS
+        self.history.advance()
+
+        assert self.history.counts("24h") == {}
+        assert self.history.counts("today") == {}
+
+    def test_fetching_again_skips_recorded_completions(self):
+        assert self.history.fetch_since().timestamp() == NOON - DAY_SECONDS
+        latest = completion(60, item_id="b")
+        items = [completion(HOUR, item_id="a"), latest]
+        assert self.history.record(items) == len(items)
+
+        assert self.history.fetch_since() == datetime.fromtimestamp(NOON - 60, UTC)
+        assert self.history.record([latest, completion(30, item_id="c")]) == 1
+        assert self.history.count("1h", "1") == len(items) + 1
+
+    def test_dump_and_restore(self):
+        self.history.record([completion(10 * 60, item_id="a"), completion(3 * HOUR)])
+        restored = CompletionHistory(
+            self.history.windows, span=DAY_SECONDS, clock=self.clock
+        )
+
+        restored.restore(self.history.dump())
+
+        assert restored.counts("today") == self.history.counts("today")
+        assert restored.counts("1h") == self.history.counts("1h")
+        assert restored.high_water == self.history.high_water
+        assert restored.record([completion(10 * 60, item_id="a")]) == 0
+
+    def test_parse_duration(self):
+        assert parse_duration("30m") == HOUR / 2
+        assert parse_duration("7d") == 7 * DAY_SECONDS
+        with pytest.raises(ValueError, match="Invalid duration"):
+            parse_duration("1w")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from prometheus_client import CollectorRegistry, generate_latest
+
+from prometheus_todoist_exporter.metrics import (
+    CoalescingRefresh,
+    HistogramValue,
+    MetricSet,
+    MetricSpec,
+    SnapshotCollector,
+)
+
+TASKS = MetricSpec("test_tasks", "Number of tasks", ("project_name",))
+LABELS = MetricSpec("test_labels", "Number of labels")
+AGES = MetricSpec(
+    "test_age_seconds", "Task ages", ("project_name",), buckets=(60, 3600)
+)
+EXPECTED_TASKS = 3
+CONCURRENT_SCRAPES = 5
+EXPECTED_REFRESHES = 2
+
+
+class TestSnapshotCollector(unittest.TestCase):
+    def setUp(self):
+        self.collector = SnapshotCollector((TASKS, LABELS))
+        self.registry = CollectorRegistry()
+        self.registry.register(self.collector)
+
+    def test_metric_set_get(self):
+        metrics = MetricSet((TASKS, LABELS))
+        metrics.set(TASKS, EXPECTED_TASKS, project_name="Inbox")
+
+        assert metrics.get(TASKS, project_name="Inbox") == EXPECTED_TASKS
+        assert metrics.get(TASKS, project_name="Work") is None
+
+    def test_values_hidden_until_published(self):
+        metrics = MetricSet((TASKS, LABELS))
+        metrics.set(TASKS, EXPECTED_TASKS, project_name="Inbox")
+
+        assert (
+            self.registry.get_sample_value("test_tasks", {"project_name": "Inbox"})
+            is None
+        )
+
+        self.collector.publish(metrics)
+
+        assert (
+            self.registry.get_sample_value("test_tasks", {"project_name": "Inbox"})
+            == EXPECTED_TASKS
+        )
+
+    def test_publish_replaces_previous_series(self):
+        first = MetricSet((TASKS, LABELS))
+        first.set(TASKS, 1, project_name="Old")
+        self.collector.publish(first)
+
+        second = MetricSet((TASKS, LABELS))
+        second.set(TASKS, 2, project_name="New")
+        self.collector.publish(second)
+
+        output = generate_latest(self.registry).decode()
+        assert 'project_name="New"' in output
+        assert 'project_name="Old"' not in output
+
+    def test_published_set_is_not_changed_by_later_writes(self):
+        metrics = MetricSet((TASKS, LABELS))
+        metrics.set(TASKS, 1, project_name="Inbox")
+        self.collector.publish(metrics)
+
+        metrics.set(TASKS, EXPECTED_TASKS, project_name="Inbox")
+
+        assert (
+            self.registry.get_sample_value("test_tasks", {"project_name": "Inbox"}) == 1
+        )
+
+    def test_sources_published_independently(self):
+        personal = MetricSet((TASKS, LABELS), const_labels={"account": "personal"})
+        personal.set(TASKS, 1, project_name="Inbox")
+        work = MetricSet((TASKS, LABELS), const_labels={"account": "work"})
+        work.set(TASKS, EXPECTED_TASKS, project_name="Inbox")
+
+        self.collector.publish(personal, source="personal")
+        self.collector.publish(work, source="work")
+
+        assert self.collector.published("work") is work
+        assert (
+            self.registry.get_sample_value(
+                "test_tasks", {"account": "personal", "project_name": "Inbox"}
+            )
+            == 1
+        )
+        assert (
+            self.registry.get_sample_value(
+                "test_tasks", {"account": "work", "project_name": "Inbox"}
+            )
+            == EXPECTED_TASKS
+        )
+
+    def test_histogram_families(self):
+        collector = SnapshotCollector((AGES,))
+        registry = CollectorRegistry()
+        registry.register(collector)
+        metrics = MetricSet((AGES,))
+        metrics.set(AGES, HistogramValue((1, 2, 3), 4000), project_name="Inbox")
+
+        # Round trip through persistence before publishing
+        collector.publish(MetricSet.from_dict((AGES,), metrics.to_dict()))
+
+        labels = {"project_name": "Inbox"}
+        assert (
+            registry.get_sample_value(
+                "test_age_seconds_bucket", {**labels, "le": "3600.0"}
+            )
+            == EXPECTED_REFRESHES
+        )
+        assert registry.get_sample_value("test_age_seconds_count", labels) == (
+            EXPECTED_TASKS
+        )
+        assert registry.get_sample_value("test_age_seconds_sum", labels) == 4000  # noqa: PLR2004
+
+    def test_histogram_values_add_per_bucket(self):
+        total = sum([HistogramValue((1, 2), 5), HistogramValue((0, 1), 1)])
+
+        assert total == HistogramValue((1, 3), 6)
+        assert float(total) == EXPECTED_TASKS
+
+    def test_before_collect_runs_on_scrape(self):
+        metrics = MetricSet((TASKS, LABELS))
+        metrics.set(TASKS, EXPECTED_TASKS, project_name="Inbox")
+        self.collector.before_collect = lambda: self.collector.publish(metrics)
+
+        assert (
+            self.registry.get_sample_value("test_tasks", {"project_name": "Inbox"})
+            == EXPECTED_TASKS
+        )
+
+
+class TestCoalescingRefresh(unittest.TestCase):
+    def test_refresh_reused_within_ttl(self):
+        refresh = MagicMock()
+        cached = CoalescingRefresh(refresh, ttl=60)
+
+        cached()
+        cached()
+
+        refresh.assert_called_once()
+
+    def test_refresh_repeated_after_ttl(self):
+        refresh = MagicMock()
+        cached = CoalescingRefresh(refresh, ttl=0)
+
+        cached()
+        cached()
+
+        assert refresh.call_count == EXPECTED_REFRESHES
+
+    def test_concurrent_callers_share_refresh(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def refresh():
+            calls.append(1)
+            started.set()
+            release.wait(timeout=5)
+
+        cached = CoalescingRefresh(refresh, ttl=60)
+        threads = [threading.Thread(target=cached) for _ in range(CONCURRENT_SCRAPES)]
+        threads[0].start()
+        started.wait(timeout=5)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert len(calls) == 1
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+
+from prometheus_todoist_exporter.persistence import STATE_MAGIC, load_state, save_state
+
+STATE = {"saved_at": 1.5, "metrics": {"values": {"todoist_tasks_total": []}}}
+
+
+class TestStatePersistence(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.path = os.path.join(self.directory, "default.state")
+
+    def test_round_trip(self):
+        save_state(self.path, STATE)
+
+        assert load_state(self.path) == STATE
+        # The temporary file was renamed over the target
+        assert os.listdir(self.directory) == ["default.state"]
+
+    def test_save_replaces_previous_state(self):
+        save_state(self.path, {"saved_at": 0})
+        save_state(self.path, STATE)
+
+        assert load_state(self.path) == STATE
+
+    def test_missing_file(self):
+        assert load_state(self.path) is None
+
+    def test_unreadable_files_are_ignored(self):
+        with open(self.path, "wb") as state_file:
+            state_file.write(b"not a state file")
+        assert load_state(self.path) is None
+
+        with open(self.path, "wb") as state_file:
+            state_file.write(STATE_MAGIC + b"truncated")
+        assert load_state(self.path) is None
+
+        os.remove(self.path)
+        os.mkdir(self.path)
+        assert load_state(self.path) is None
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import math
+import unittest
+
+from prometheus_todoist_exporter.metrics import MetricSet, MetricSpec
+from prometheus_todoist_exporter.retention import Retention
+from tests import FakeClock
+
+TASKS = MetricSpec("test_tasks", "Number of tasks", ("project_name", "project_id"))
+LABELS = MetricSpec("test_label_tasks", "Number of tasks by label", ("label_name",))
+MAX_STALENESS = 600
+PREVIOUS_INBOX_TASKS = 3
+PREVIOUS_WORK_TASKS = 5
+CURRENT_INBOX_TASKS = 4
+
+
+def metric_set(inbox, work, urgent=1):
+    metrics = MetricSet((TASKS, LABELS))
+    if inbox is not None:
+        metrics.set(TASKS, inbox, project_name="Inbox", project_id="1")
+    if work is not None:
+        metrics.set(TASKS, work, project_name="Work", project_id="2")
+    metrics.set(LABELS, urgent, label_name="urgent")
+    return metrics
+
+
+class TestRetention(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(1000.0)
+        self.retention = Retention(MAX_STALENESS, clock=self.clock)
+        self.previous = metric_set(PREVIOUS_INBOX_TASKS, PREVIOUS_WORK_TASKS)
+        self.retention.retain(None, self.previous, {})
+
+    def test_failed_family_keeps_previous_series(self):
+        metrics = metric_set(None, None, urgent=0)
+
+        self.retention.retain(self.previous, metrics, {TASKS: None})
+
+        assert metrics.series(TASKS) == self.previous.series(TASKS)
+        assert metrics.get(LABELS, label_name="urgent") == 0
+
+    def test_failed_project_keeps_only_its_series(self):
+        metrics = metric_set(CURRENT_INBOX_TASKS, None)
+
+        self.retention.retain(self.previous, metrics, {TASKS: {"2"}})
+
+        assert metrics.get(TASKS, project_name="Inbox", project_id="1") == (
+            CURRENT_INBOX_TASKS
+        )
+        assert metrics.get(TASKS, project_name="Work", project_id="2") == (
+            PREVIOUS_WORK_TASKS
+        )
+
+    def test_series_older_than_max_staleness_dropped(self):
+        self.clock.now += MAX_STALENESS / 2
+        metrics = metric_set(CURRENT_INBOX_TASKS, None)
+        self.retention.retain(self.previous, metrics, {TASKS: {"2"}})
+        assert metrics.get(TASKS, project_name="Work", project_id="2") is not None
+
+        self.clock.now += MAX_STALENESS
+        latest = metric_set(CURRENT_INBOX_TASKS, None)
+        self.retention.retain(metrics, latest, {TASKS: {"2"}})
+
+        assert latest.get(TASKS, project_name="Work", project_id="2") is None
+
+    def test_age_of_oldest_data(self):
+        assert math.isnan(self.retention.age("unknown"))
+        self.clock.now += MAX_STALENESS / 2
+        self.retention.retain(
+            self.previous, metric_set(CURRENT_INBOX_TASKS, None), {TASKS: {"2"}}
+        )
+
+        assert self.retention.age(TASKS.name) == MAX_STALENESS / 2
+        assert self.retention.age(LABELS.name) == 0
+
+        self.retention.retain(None, metric_set(CURRENT_INBOX_TASKS, 1), {})
+
+        assert self.retention.age(TASKS.name) == 0
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+from http import HTTPStatus
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+
+from prometheus_todoist_exporter.scheduler import (
+    Priority,
+    RequestScheduler,
+    TokenBucket,
+)
+from tests import FakeClock
+
+BUCKET_CAPACITY = 10
+REFILL_RATE = 1.0
+RETRY_AFTER_SECONDS = 7
+MAX_RETRIES = 2
+CALLS_WITH_ONE_RETRY = 2
+
+
+def make_response(status_code, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    return response
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_refills_over_time(self):
+        clock = FakeClock()
+        bucket = TokenBucket(BUCKET_CAPACITY, REFILL_RATE, clock=clock)
+
+        for _ in range(BUCKET_CAPACITY):
+            assert bucket.try_acquire() == 0
+
+        assert bucket.try_acquire() == pytest.approx(1 / REFILL_RATE)
+        clock.sleep(1)
+        assert bucket.try_acquire() == 0
+
+    def test_reserve_is_kept(self):
+        bucket = TokenBucket(BUCKET_CAPACITY, REFILL_RATE, clock=FakeClock())
+
+        assert bucket.try_acquire(reserve=BUCKET_CAPACITY - 1) == 0
+        assert bucket.try_acquire(reserve=BUCKET_CAPACITY - 1) > 0
+        assert bucket.remaining == BUCKET_CAPACITY - 1
+
+
+class TestRequestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.throttled = []
+        self.scheduler = RequestScheduler(
+            TokenBucket(BUCKET_CAPACITY, REFILL_RATE, clock=self.clock),
+            max_retries=MAX_RETRIES,
+            sleep=self.clock.sleep,
+            on_throttle=self.throttled.append,
+        )
+
+    def test_low_priority_waits_for_reserve(self):
+        # Leave less than the low priority reserve in the bucket
+        for _ in range(BUCKET_CAPACITY - 1):
+            self.scheduler.acquire(Priority.HIGH)
+
+        self.scheduler.acquire(Priority.HIGH)
+        assert not self.throttled
+
+        self.scheduler.acquire(Priority.LOW)
+        assert sum(self.throttled) > 0
+
+    def test_retry_after_is_honored(self):
+        request = MagicMock(
+            side_effect=[
+                make_response(
+                    HTTPStatus.TOO_MANY_REQUESTS,
+                    {"Retry-After": str(RETRY_AFTER_SECONDS)},
+                ),
+                make_response(HTTPStatus.OK),
+            ]
+        )
+
+        response = self.scheduler.call(request)
+
+        assert response.status_code == HTTPStatus.OK
+        assert RETRY_AFTER_SECONDS in self.throttled
+
+    def test_server_errors_are_retried(self):
+        error = requests.HTTPError(
+            response=make_response(HTTPStatus.SERVICE_UNAVAILABLE)
+        )
+        request = MagicMock(side_effect=[error, ["task"]])
+
+        assert self.scheduler.call(request) == ["task"]
+        assert request.call_count == CALLS_WITH_ONE_RETRY
+
+    def test_gives_up_after_max_retries(self):
+        request = MagicMock(return_value=make_response(HTTPStatus.BAD_GATEWAY))
+
+        response = self.scheduler.call(request)
+
+        assert response.status_code == HTTPStatus.BAD_GATEWAY
+        assert request.call_count == MAX_RETRIES + 1
+
+    def test_client_errors_are_not_retried(self):
+        error = requests.HTTPError(response=make_response(HTTPStatus.FORBIDDEN))
+        request = MagicMock(side_effect=error)
+
+        with pytest.raises(requests.HTTPError):
+            self.scheduler.call(request)
+        request.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
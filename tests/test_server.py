@@ -0,0 +1,129 @@
+import gzip
+import unittest
+from http import HTTPStatus
+from http.client import HTTPConnection
+
+from prometheus_client import CollectorRegistry, Counter
+
+from prometheus_todoist_exporter.exposition import Exposition
+from prometheus_todoist_exporter.metrics import MetricSet, MetricSpec, SnapshotCollector
+from prometheus_todoist_exporter.server import start_metrics_server
+
+TASKS = MetricSpec("test_tasks", "Number of tasks", ("project_name",))
+
+
+class TestMetricsServer(unittest.TestCase):
+    def setUp(self):
+        collector = SnapshotCollector((TASKS,))
+        metrics = MetricSet((TASKS,))
+        metrics.set(TASKS, 1, project_name="Inbox")
+        collector.publish(metrics)
+        registry = CollectorRegistry()
+        self.requests = Counter("test_requests", "Requests", registry=registry)
+        self.server = start_metrics_server(
+            0, Exposition(collector, registry), addr="127.0.0.1"
+        )
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def get(self, path="/metrics", headers=None, method="GET"):
+        connection = HTTPConnection(*self.server.server_address[:2], timeout=5)
+        self.addCleanup(connection.close)
+        connection.request(method, path, headers=headers or {})
+        response = connection.getresponse()
+        return response, response.read()
+
+    def test_gzip_and_conditional_requests(self):
+        response, body = self.get(headers={"Accept-Encoding": "gzip"})
+
+        assert response.status == HTTPStatus.OK
+        assert response.getheader("Content-Encoding") == "gzip"
+        assert b'test_tasks{project_name="Inbox"} 1.0' in gzip.decompress(body)
+
+        response, body = self.get(
+            headers={
+                "Accept-Encoding": "gzip",
+                "If-None-Match": response.getheader("ETag"),
+            }
+        )
+        assert response.status == HTTPStatus.NOT_MODIFIED
+        assert body == b""
+
+        # A changed live metric is served in full
+        self.requests.inc()
+        response, body = self.get(
+            headers={
+                "Accept-Encoding": "gzip",
+                "If-None-Match": response.getheader("ETag"),
+            }
+        )
+        assert response.status == HTTPStatus.OK
+        assert b"test_requests_total 1.0" in gzip.decompress(body)
+
+    def test_openmetrics_negotiated(self):
+        response, body = self.get(
+            headers={"Accept": "application/openmetrics-text; version=1.0.0"}
+        )
+
+        assert response.getheader("Content-Type").startswith(
+            "application/openmetrics-text"
+        )
+        assert body.endswith(b"# EOF\n")
+
+    def test_unknown_path_not_found(self):
+        response, _ = self.get("/unknown")
+
+        assert response.status == HTTPStatus.NOT_FOUND
+        # Webhooks are only received when a receiver is configured
+        response, _ = self.get("/webhooks/todoist", method="POST")
+        assert response.status == HTTPStatus.NOT_FOUND
+
+    def test_head_has_no_body(self):
+        response, body = self.get(method="HEAD")
+
+        assert response.status == HTTPStatus.OK
+        assert int(response.getheader("Content-Length")) > 0
+        assert body == b""
+
+
+class TestHealthEndpoints(unittest.TestCase):
+    def start(self, metrics_path="/metrics", healthy=True, ready=True):
+        server = start_metrics_server(
+            0,
+            Exposition(SnapshotCollector(()), CollectorRegistry()),
+            metrics_path=metrics_path,
+            healthy=lambda: healthy,
+            ready=lambda: ready,
+            addr="127.0.0.1",
+        )
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def status(self, server, path):
+        connection = HTTPConnection(*server.server_address[:2], timeout=5)
+        self.addCleanup(connection.close)
+        connection.request("GET", path)
+        return connection.getresponse().status
+
+    def test_checks_answer_ok(self):
+        server = self.start()
+
+        assert self.status(server, "/healthz") == HTTPStatus.OK
+        assert self.status(server, "/ready") == HTTPStatus.OK
+
+    def test_failing_checks_unavailable(self):
+        server = self.start(healthy=False, ready=False)
+
+        assert self.status(server, "/healthz") == HTTPStatus.SERVICE_UNAVAILABLE
+        assert self.status(server, "/ready") == HTTPStatus.SERVICE_UNAVAILABLE
+
+    def test_custom_metrics_path(self):
+        server = self.start(metrics_path="/custom")
+
+        assert self.status(server, "/custom?debug=1") == HTTPStatus.OK
+        assert self.status(server, "/metrics") == HTTPStatus.NOT_FOUND
+
+
+if __name__ == "__main__":
+    unittest.main()
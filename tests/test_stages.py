@@ -0,0 +1,56 @@
+import unittest
+
+import pytest
+
+from prometheus_todoist_exporter.stages import (
+    StageResults,
+    StageSettings,
+    stage_settings_from_env,
+)
+from tests import FakeClock
+
+INTERVAL = 3600
+
+
+class TestStageSettings(unittest.TestCase):
+    def test_settings_from_env(self):
+        settings = stage_settings_from_env(
+            "comments, collaborators", f"comments={INTERVAL},sections=600"
+        )
+
+        assert settings == {
+            "comments": StageSettings(enabled=False, interval=INTERVAL),
+            "collaborators": StageSettings(enabled=False),
+            "sections": StageSettings(interval=600),
+        }
+
+    def test_unknown_stage_is_rejected(self):
+        with pytest.raises(ValueError, match="comment"):
+            stage_settings_from_env("comment", "")
+
+
+class TestStageResults(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.results = StageResults(
+            {"comments": StageSettings(interval=INTERVAL)}, clock=self.clock
+        )
+
+    def test_result_reused_within_interval(self):
+        self.results.store("comments", {"p1": []})
+        self.clock.now += INTERVAL - 1
+
+        assert self.results.fresh("comments") == {"p1": []}
+
+        self.clock.now += 1
+        assert self.results.fresh("comments") is None
+
+    def test_stages_without_interval_always_refresh(self):
+        self.results.store("tasks", [])
+
+        assert self.results.fresh("tasks") is None
+        assert self.results.is_enabled("tasks")
+
+
+if __name__ == "__main__":
+    unittest.main()
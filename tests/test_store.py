@@ -0,0 +1,71 @@
+import unittest
+
+from todoist_api_python.models import Task
+
+from prometheus_todoist_exporter.store import TaskStore
+
+PRIORITY = 4
+
+
+def make_task(task_id, labels, due=None):
+    return Task.from_dict(
+        {
+            "id": task_id,
+            "assignee_id": None,
+            "assigner_id": None,
+            "comment_count": 0,
+            "is_completed": False,
+            "content": "Task",
+            "created_at": "2025-01-01T00:00:00Z",
+            "creator_id": "u1",
+            "description": "",
+            "due": due,
+            "labels": labels,
+            "order": 1,
+            "parent_id": None,
+            "priority": PRIORITY,
+            "project_id": "p1",
+            "section_id": "s1",
+            "url": "https://todoist.com/showTask?id=" + task_id,
+        }
+    )
+
+
+class TestTaskStore(unittest.TestCase):
+    def test_add_task_keeps_metric_fields(self):
+        store = TaskStore()
+
+        record = store.add_task(
+            make_task(
+                "t1",
+                ["work"],
+                due={"date": "2025-01-01", "is_recurring": True, "string": "daily"},
+            )
+        )
+
+        assert record.project_id == "p1"
+        assert record.section_id == "s1"
+        assert record.priority == PRIORITY
+        assert record.due_date == "2025-01-01"
+        assert record.is_recurring
+        assert record.labels == ("work",)
+        assert store.project_tasks("p1") == [record]
+        assert not hasattr(record, "__dict__")
+
+    def test_repeated_values_are_shared(self):
+        store = TaskStore()
+
+        first = store.add_task(make_task("t1", ["work", "urgent"]))
+        second = store.add_item(
+            {"id": "t2", "project_id": "p1", "labels": ["work", "urgent"]}
+        )
+
+        assert first.labels is second.labels
+        assert first.project_id is second.project_id
+        assert second.due_date is None
+        assert not second.is_recurring
+        assert len(store) == len(list(store))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+import unittest
+from http import HTTPStatus
+from unittest.mock import MagicMock
+
+from prometheus_todoist_exporter.sync import FULL_SYNC_TOKEN, SyncState
+
+# Using a placeholder value for testing, not a real token
+TEST_API_TOKEN = "test_token"  # noqa: S105
+FIRST_SYNC_TOKEN = "token-1"  # noqa: S105
+SECOND_SYNC_TOKEN = "token-2"  # noqa: S105
+EXPECTED_SYNC_CALLS = 2
+
+
+def make_response(payload, status_code=HTTPStatus.OK):
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = payload
+    return response
+
+
+def make_item(**fields):
+    item = {
+        "user_id": "u1",
+        "content": "Task",
+        "description": "",
+        "child_order": 1,
+        "collapsed": False,
+        "checked": False,
+        "is_deleted": False,
+        "added_at": "2025-01-01T00:00:00Z",
+        "section_id": None,
+        "labels": [],
+        "due": None,
+    }
+    item.update(fields)
+    return item
+
+
+FULL_SYNC_PAYLOAD = {
+    "full_sync": True,
+    "sync_token": FIRST_SYNC_TOKEN,
+    "projects": [{"id": "p1", "name": "Work"}],
+    "items": [
+        make_item(
+            id="t1", project_id="p1", section_id="s1", priority=4, labels=["work"]
+        ),
+        make_item(
+            id="t2",
+            project_id="p1",
+            priority=1,
+            due={"date": "2025-01-01", "is_recurring": False, "string": "jan 1"},
+        ),
+    ],
+    "sections": [{"id": "s1", "name": "To Do", "project_id": "p1"}],
+    "project_notes": [{"id": "n1", "project_id": "p1", "content": "hello"}],
+    "collaborators": [{"id": "u1", "email": "a@example.com", "full_name": "A"}],
+    "collaborator_states": [{"project_id": "p1", "user_id": "u1", "state": "active"}],
+}
+
+
+class TestSyncState(unittest.TestCase):
+    def setUp(self):
+        self.session = MagicMock()
+
+    def test_full_sync_builds_projects(self):
+        mock_post = self.session.post
+        mock_post.return_value = make_response(FULL_SYNC_PAYLOAD)
+
+        state = SyncState(TEST_API_TOKEN, session=self.session)
+        state.sync()
+
+        assert state.sync_token == FIRST_SYNC_TOKEN
+        assert mock_post.call_args.kwargs["data"]["sync_token"] == FULL_SYNC_TOKEN
+
+        projects_dict, tasks, sections = state.build_projects()
+        assert len(tasks) == len(FULL_SYNC_PAYLOAD["items"])
+        assert len(sections) == 1
+        assert len(projects_dict["p1"]["tasks"]) == len(FULL_SYNC_PAYLOAD["items"])
+        assert len(projects_dict["p1"]["comments"]) == 1
+        assert len(projects_dict["p1"]["collaborators"]) == 1
+        assert projects_dict["p1"]["tasks"][1].due_date == "2025-01-01"
+
+    def test_incremental_sync_applies_deltas(self):
+        mock_post = self.session.post
+        mock_post.side_effect = [
+            make_response(FULL_SYNC_PAYLOAD),
+            make_response(
+                {
+                    "full_sync": False,
+                    "sync_token": SECOND_SYNC_TOKEN,
+                    "items": [
+                        {"id": "t1", "checked": True},
+                        make_item(id="t3", project_id="p1", priority=2),
+                    ],
+                    "project_notes": [{"id": "n1", "is_deleted": True}],
+                }
+            ),
+        ]
+
+        state = SyncState(TEST_API_TOKEN, session=self.session)
+        state.sync()
+        state.sync()
+
+        assert mock_post.call_args.kwargs["data"]["sync_token"] == FIRST_SYNC_TOKEN
+        assert set(state.items) == {"t2", "t3"}
+        assert not state.notes
+        assert state.sync_token == SECOND_SYNC_TOKEN
+
+    def test_item_changes_reported(self):
+        delta = {"sync_token": SECOND_SYNC_TOKEN, "items": [{"id": "t1"}]}
+        self.session.post.side_effect = [
+            make_response(FULL_SYNC_PAYLOAD),
+            make_response(delta),
+        ]
+        on_items = MagicMock()
+
+        state = SyncState(TEST_API_TOKEN, session=self.session)
+        state.on_items = on_items
+        state.sync()
+        state.sync()
+
+        assert on_items.call_args_list[0].args == (FULL_SYNC_PAYLOAD["items"], True)
+        assert on_items.call_args_list[1].args == (delta["items"], False)
+
+    def test_rejected_token_falls_back_to_full_sync(self):
+        mock_post = self.session.post
+        mock_post.side_effect = [
+            make_response({}, status_code=HTTPStatus.BAD_REQUEST),
+            make_response(FULL_SYNC_PAYLOAD),
+        ]
+
+        state = SyncState(TEST_API_TOKEN, session=self.session)
+        state.sync_token = "stale-token"  # noqa: S105
+        state.items["old"] = {"id": "old"}
+        state.sync()
+
+        assert mock_post.call_count == EXPECTED_SYNC_CALLS
+        assert mock_post.call_args.kwargs["data"]["sync_token"] == FULL_SYNC_TOKEN
+        assert "old" not in state.items
+        assert state.sync_token == FIRST_SYNC_TOKEN
+
+    def test_restored_state_syncs_incrementally(self):
+        self.session.post.return_value = make_response(FULL_SYNC_PAYLOAD)
+        state = SyncState(TEST_API_TOKEN, session=self.session)
+        state.sync()
+
+        restored = SyncState(TEST_API_TOKEN, session=self.session)
+        restored.restore(state.dump())
+
+        assert restored.sync_token == FIRST_SYNC_TOKEN
+        assert set(restored.collaborator_states) == {("p1", "u1")}
+        assert "content" not in restored.items["t1"]
+        assert "content" not in restored.notes["n1"]
+        assert "email" not in restored.collaborators["u1"]
+        projects_dict, tasks, _ = restored.build_projects()
+        assert len(tasks) == len(FULL_SYNC_PAYLOAD["items"])
+        assert len(projects_dict["p1"]["collaborators"]) == 1
+        assert len(projects_dict["p1"]["comments"]) == 1
+
+
+if __name__ == "__main__":
+    unittest.main()
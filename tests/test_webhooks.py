@@ -0,0 +1,133 @@
+import json
+import unittest
+from http import HTTPStatus
+from http.client import HTTPConnection
+
+from prometheus_todoist_exporter import exporter
+from prometheus_todoist_exporter.accounts import Account
+from prometheus_todoist_exporter.app import Exporter
+from prometheus_todoist_exporter.webhooks import (
+    SIGNATURE_HEADER,
+    event_delta,
+    sign,
+    verify_signature,
+)
+
+TEST_API_TOKEN = "test_token"  # noqa: S105
+WEBHOOK_SECRET = "test_secret"  # noqa: S105
+FULL_SYNC_PAYLOAD = {
+    "full_sync": True,
+    "sync_token": "token-1",
+    "user": {"id": "u1"},
+    "projects": [{"id": "p1", "name": "Work"}],
+    "items": [{"id": "t1", "project_id": "p1", "added_at": "2025-01-01T00:00:00Z"}],
+}
+
+
+def item_event(name, **data):
+    return {"event_name": name, "user_id": "u1", "event_data": data}
+
+
+class TestWebhookEvents(unittest.TestCase):
+    def test_signature(self):
+        body = b'{"event_name": "item:added"}'
+
+        assert verify_signature(WEBHOOK_SECRET, body, sign(WEBHOOK_SECRET, body))
+        assert not verify_signature(WEBHOOK_SECRET, body, sign("other", body))
+        assert not verify_signature(WEBHOOK_SECRET, body, None)
+        assert not verify_signature(WEBHOOK_SECRET, body, "sïgnature")
+
+    def test_events_become_sync_deltas(self):
+        assert event_delta(item_event("item:deleted", id="t1")) == {
+            "items": [{"id": "t1", "is_deleted": True}]
+        }
+        assert event_delta(item_event("project:archived", id="p1")) == {
+            "projects": [{"id": "p1", "is_archived": True}]
+        }
+        # Recurring tasks stay open when completed
+        recurring = item_event("item:completed", id="t1", due={"is_recurring": True})
+        assert event_delta(recurring) == {"items": [recurring["event_data"]]}
+        # Comments on tasks and unknown events are not applied
+        assert event_delta(item_event("note:added", id="n1", item_id="t1")) is None
+        assert event_delta(item_event("reminder:fired", id="r1")) is None
+        assert event_delta({**item_event("", id="t1"), "event_name": []}) is None
+
+
+class TestWebhookReceiver(unittest.TestCase):
+    def setUp(self):
+        self.account = Account(
+            name="default", token=TEST_API_TOKEN, incremental_sync=True
+        )
+        self.account.sync_state.apply(FULL_SYNC_PAYLOAD)
+        self.account.webhooks = True
+        app = Exporter(
+            accounts=[self.account],
+            port=0,
+            addr="127.0.0.1",
+            webhook_secret=WEBHOOK_SECRET,
+        )
+        self.addCleanup(app.stop)
+        self.server = app.serve()
+
+    def post(self, event, secret=WEBHOOK_SECRET, signature=None):
+        body = json.dumps(event).encode()
+        connection = HTTPConnection(*self.server.server_address[:2], timeout=5)
+        self.addCleanup(connection.close)
+        connection.request(
+            "POST",
+            "/webhooks/todoist",
+            body=body,
+            headers={SIGNATURE_HEADER: signature or sign(secret, body)},
+        )
+        return connection.getresponse().status
+
+    def test_event_applied_and_published_from_state(self):
+        event = item_event(
+            "item:added", id="t2", project_id="p1", added_at="2025-01-02T00:00:00Z"
+        )
+
+        assert self.post(event) == HTTPStatus.OK
+        assert set(self.account.sync_state.items) == {"t1", "t2"}
+        assert self.account.state_changed.is_set()
+
+        exporter.publish_local_state(self.account)
+        metrics = exporter.COLLECTOR.published(self.account.name)
+        assert metrics.get(
+            exporter.TODOIST_TASKS_TOTAL, project_name="Work", project_id="p1"
+        ) == len(self.account.sync_state.items)
+
+    def test_completed_item_observes_latency(self):
+        completed = item_event(
+            "item:completed",
+            id="t1",
+            project_id="p1",
+            completed_at="2025-01-01T02:00:00Z",
+        )
+
+        assert self.post(completed) == HTTPStatus.OK
+
+        assert not self.account.sync_state.items
+        assert self.account.task_ages.latency("p1").sum == 2 * 3600
+
+    def test_unsigned_and_foreign_events_not_applied(self):
+        event = item_event("item:deleted", id="t1")
+
+        assert self.post(event, secret="other") == HTTPStatus.UNAUTHORIZED  # noqa: S106
+        assert self.post(event, signature="sïgnature") == HTTPStatus.UNAUTHORIZED
+        assert self.post({**event, "user_id": "u2"}) == HTTPStatus.OK
+        assert self.post({**event, "event_name": {}}) == HTTPStatus.OK
+        assert set(self.account.sync_state.items) == {"t1"}
+        assert not self.account.state_changed.is_set()
+
+    def test_polling_slows_down_with_webhooks(self):
+        assert exporter.collection_delay(self.account) == (
+            10 * self.account.collection_interval
+        )
+        self.account.webhooks = False
+        assert exporter.collection_delay(self.account) == (
+            self.account.collection_interval
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()